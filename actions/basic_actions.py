@@ -2,10 +2,17 @@
 基础AW - 优化版本
 """
 import requests
+import itertools
 import subprocess
+from typing import Optional
+from urllib.parse import urlparse
 from utils.logger import get_logger
 from utils.config_manager import config_manager
 from utils.connection_pool import connection_pool
+from utils.restart_pipeline import RestartPipeline
+from utils.load_generator import LoadGenerator
+from utils.circuit_breaker import breakers
+from utils.watchdog import watchdog
 
 logger = get_logger()
 
@@ -121,41 +128,56 @@ def clear_database_table(db_name, tables):
 
 # ==================== 3. Docker操作 ====================
 
-def restart_adn_containers(server_name="adn_server"):
-    """重启ADN服务容器"""
-    validate_params(locals(), ['server_name'])
+def restart_adn_containers(server_name=None, servers=None, rolling=None, return_report=False):
+    """
+    重启ADN服务容器
+    
+    无依赖关系的容器并发重启，depends_on声明的容器等依赖就绪后再重启，
+    每个容器以docker inspect健康状态或配置的ready_probe判断就绪
+    
+    Args:
+        server_name: 服务器名称，未指定servers时使用
+        servers: 服务器名称列表，与server_name都未指定时读取adn_restart.servers，未配置时为adn_server
+        rolling: 是否滚动重启，默认读取adn_restart.rolling
+        return_report: 成功时是否返回包含每个容器重启/就绪耗时的详细报告，失败时仍返回False
+    """
     
     try:
-        config = config_manager.get_config()
-        containers = config.get('adn_services', [])
+        containers = config_manager.get_config('adn_services') or []
         
         if not containers:
             logger.error("✗ 未配置ADN服务容器")
             return False
         
-        ssh = connection_pool.get_ssh_connection(server_name)
-        success_count = 0
+        settings = config_manager.get_config('adn_restart') or {}
+        # 调用方指定的服务器优先于配置的服务器列表
+        if servers is None:
+            servers = [server_name] if server_name else settings.get('servers') or ['adn_server']
+        elif isinstance(servers, str):
+            servers = [s.strip() for s in servers.split(',') if s.strip()]
+        if rolling is None:
+            rolling = settings.get('rolling', False)
         
-        for container in containers:
-            container_name = container['container_name']
-            logger.info(f"重启容器: {container_name}")
-            
-            stdin, stdout, stderr = ssh.exec_command(f"docker restart {container_name}")
-            exit_code = stdout.channel.recv_exit_status()
-            
-            if exit_code == 0:
-                logger.info(f"✓ 容器 {container_name} 重启成功")
-                success_count += 1
-            else:
-                error = stderr.read().decode()
-                logger.error(f"✗ 容器 {container_name} 重启失败: {error}")
+        pipeline = RestartPipeline(containers, settings)
+        reports = pipeline.run(servers, rolling=rolling)
+        
+        for report in reports:
+            restart_time = f"{report['restart_time']:.2f}秒" if report['restart_time'] is not None else "-"
+            ready_time = f"{report['ready_time']:.2f}秒" if report['ready_time'] is not None else "-"
+            status = "✓" if report['success'] else "✗"
+            logger.info(f"{status} [{report['server']}] {report['container']}: 重启 {restart_time}, 就绪 {ready_time}")
         
-        result = success_count == len(containers)
+        expected = len(containers) * len(servers)
+        success_count = sum(1 for r in reports if r['success'])
+        result = success_count == expected
         if result:
-            logger.info(f"✓ 所有ADN容器重启成功")
+            logger.info(f"✓ 所有ADN容器重启成功并已就绪")
         else:
-            logger.error(f"✗ 部分容器重启失败 ({success_count}/{len(containers)})")
+            logger.error(f"✗ 部分容器重启失败 ({success_count}/{expected})")
         
+        # 失败时返回False，步骤按失败处理；各容器的结果已记录在日志中
+        if return_report and result:
+            return {"success": result, "containers": reports}
         return result
         
     except Exception as e:
@@ -169,8 +191,7 @@ def call_api(endpoint, method="GET", json_data=None):
     validate_params(locals(), ['endpoint'])
     
     try:
-        config = config_manager.get_config()
-        base_url = config.get('apis', {}).get('base_url', '')
+        base_url = (config_manager.get_config('apis') or {}).get('base_url', '')
         
         if not base_url:
             logger.error("✗ 未配置API基础URL")
@@ -179,14 +200,17 @@ def call_api(endpoint, method="GET", json_data=None):
         url = f"{base_url}{endpoint}"
         logger.info(f"调用API: {method} {endpoint}")
         
-        if method.upper() == "GET":
-            response = requests.get(url, timeout=30)
-        elif method.upper() == "POST":
-            response = requests.post(url, json=json_data, timeout=30)
-        else:
+        if method.upper() not in ("GET", "POST"):
             logger.error(f"✗ 不支持的HTTP方法: {method}")
             return None
         
+        # 只有连接失败和超时计入熔断，HTTP错误状态码说明主机可达
+        with breakers.guard('api', urlparse(base_url).netloc, failures=(requests.ConnectionError, requests.Timeout)):
+            if method.upper() == "GET":
+                response = requests.get(url, timeout=30)
+            else:
+                response = requests.post(url, json=json_data, timeout=30)
+        
         logger.info(f"✓ API调用成功: 状态码 {response.status_code}")
         return response.json() if response.content else {}
         
@@ -194,6 +218,125 @@ def call_api(endpoint, method="GET", json_data=None):
         logger.error(f"✗ API调用失败: {e}")
         return None
 
+# 后台运行中的压测: {压测ID: (LoadGenerator, 允许的最大错误率)}
+_load_tests = {}
+# 压测ID序号，单调递增，已结束的压测被移除后也不会复用ID
+_load_ids = itertools.count(1)
+
+def _log_load_report(report):
+    latency = report['latency_ms']
+    logger.info(f"API压测结果: {report['requests']} 次请求, 吞吐量 {report['throughput']}次/秒, "
+                f"失败 {report['failed']} ({report['error_rate']:.2%})")
+    if latency:
+        logger.info(f"延迟(ms): p50 {latency['p50']}, p90 {latency['p90']}, p99 {latency['p99']}, "
+                    f"p99.9 {latency['p99.9']}, max {latency['max']}")
+    if report['errors']:
+        logger.info(f"错误分布: {report['errors']}")
+
+def run_api_load(endpoint, method="GET", json_data=None, rate: Optional[float] = None, concurrency: int = 10,
+                 duration: Optional[float] = None, max_requests: Optional[int] = None, timeout: float = 30,
+                 background: bool = False, load_id=None, max_error_rate: Optional[float] = None):
+    """
+    API压测
+    
+    指定rate时按令牌桶限速发送，否则以concurrency个并发尽可能快地发送；
+    endpoint和json_data中的 {{seq}} 会替换为请求序号
+    
+    Args:
+        endpoint: API路径，拼接在apis.base_url之后
+        method: HTTP方法
+        json_data: 请求体模板
+        rate: 目标速率(次/秒)
+        concurrency: 并发数，指定rate时为最大在途请求数
+        duration: 持续时间(秒)，与max_requests都未指定时默认10秒
+        max_requests: 请求总数
+        timeout: 单个请求超时(秒)
+        background: 是否后台运行，后台运行时返回压测ID，用"等待API压测"获取结果
+        load_id: 后台压测ID，默认自动生成
+        max_error_rate: 允许的最大错误率，超过时压测步骤失败
+    
+    Returns:
+        压测报告: 请求数、吞吐量、状态码分布、错误分布、延迟百分位和直方图
+    """
+    validate_params(locals(), ['endpoint'])
+    
+    try:
+        base_url = (config_manager.get_config('apis') or {}).get('base_url', '')
+        
+        if not base_url:
+            logger.error("✗ 未配置API基础URL")
+            return None
+        
+        if duration is None and max_requests is None:
+            duration = 10
+        generator = LoadGenerator(f"{base_url}{endpoint}", method, json_data, rate=rate, concurrency=concurrency,
+                                  duration=duration, max_requests=max_requests, timeout=timeout)
+        
+        if background:
+            load_id = load_id or f"load-{next(_load_ids)}"
+            if load_id in _load_tests and _load_tests[load_id][0].running:
+                logger.error(f"✗ 压测 {load_id} 仍在运行")
+                return None
+            _load_tests[load_id] = (generator.start(), max_error_rate)
+            # 启动压测的步骤超时被放弃时，调用方拿不到压测ID，压测随之结束
+            watchdog.on_abandon(lambda: _abandon_load(load_id, generator))
+            logger.info(f"✓ API压测已在后台启动: {load_id}")
+            return load_id
+        
+        watchdog.on_abandon(generator.stop)
+        return _finish_load(generator.run(), max_error_rate)
+        
+    except Exception as e:
+        logger.error(f"✗ API压测失败: {e}")
+        return None
+
+def _abandon_load(load_id, generator):
+    generator.stop()
+    if _load_tests.get(load_id, (None,))[0] is generator:
+        del _load_tests[load_id]
+    logger.warning(f"API压测 {load_id} 已随超时步骤停止")
+
+def _finish_load(report, max_error_rate):
+    _log_load_report(report)
+    if not report['requests']:
+        logger.error("✗ API压测没有发出任何请求")
+        return None
+    if max_error_rate is not None and report['error_rate'] > max_error_rate:
+        logger.error(f"✗ 错误率 {report['error_rate']:.2%} 超过上限 {max_error_rate:.2%}")
+        return None
+    logger.info("✓ API压测完成")
+    return report
+
+def wait_api_load(load_id=None, timeout=None, stop=False):
+    """
+    等待后台API压测结束并返回报告
+    
+    Args:
+        load_id: 压测ID，默认为最近启动的压测
+        timeout: 最长等待时间(秒)
+        stop: 是否立即结束压测
+    """
+    if not _load_tests:
+        logger.error("✗ 没有后台运行的API压测")
+        return None
+    load_id = load_id or list(_load_tests)[-1]
+    if load_id not in _load_tests:
+        logger.error(f"✗ 未找到API压测: {load_id}")
+        return None
+    generator, max_error_rate = _load_tests[load_id]
+    
+    if stop:
+        generator.stop()
+    if not generator.wait(timeout):
+        logger.error(f"✗ 等待API压测 {load_id} 超时")
+        return None
+    del _load_tests[load_id]
+    return _finish_load(generator.report(), max_error_rate)
+
+def stop_api_load(load_id=None):
+    """立即结束后台API压测并返回报告"""
+    return wait_api_load(load_id, stop=True)
+
 # ==================== 5. rtnctl工具 ====================
 
 def execute_rtnctl_query(query_params, server_name="adn_server"):
@@ -201,8 +344,7 @@ def execute_rtnctl_query(query_params, server_name="adn_server"):
     validate_params(locals(), ['query_params'])
     
     try:
-        config = config_manager.get_config()
-        rtnctl_path = config.get('tools', {}).get('rtnctl_path', '/usr/local/bin/rtnctl')
+        rtnctl_path = (config_manager.get_config('tools') or {}).get('rtnctl_path', '/usr/local/bin/rtnctl')
         
         ssh = connection_pool.get_ssh_connection(server_name)
         command = f"{rtnctl_path} {query_params}"
@@ -248,4 +390,159 @@ def execute_iperf_test(server_ip, port=5201, duration=10):
         return None
     except Exception as e:
         logger.error(f"✗ iperf测试失败: {e}")
-        return None
\ No newline at end of file
+        return None
+
+def analyze_iperf_results(results, topology=None, record=True):
+    """
+    分析iperf结果并与组网基线比较
+    
+    Args:
+        results: "执行iperf测试" 的结果，或多次结果组成的列表
+        topology: 组网名称，基线和历史按组网区分，默认读取 iperf_analytics.topology
+        record: 是否记录到历史，用于趋势分析和生成基线
+    
+    Returns:
+        dict: 各指标统计和基线比较结论，低于基线容差时返回None
+    """
+    validate_params(locals(), ['results'])
+    from utils.iperf_analytics import IperfRuns, IperfHistory, evaluate, load_baseline, log_verdict
+    
+    if not isinstance(results, (list, tuple)):
+        results = [results]
+    topology = topology or (config_manager.get_config('iperf_analytics') or {}).get('topology') or 'default'
+    runs, errors = IperfRuns.from_results(results)
+    for error in errors:
+        logger.warning(f"iperf结果无法解析: {error}")
+    
+    if record and len(runs):
+        history = IperfHistory()
+        try:
+            history.record(topology, runs)
+        finally:
+            history.close()
+    
+    verdict = evaluate(runs, load_baseline(topology))
+    log_verdict(topology, verdict)
+    if not verdict['passed']:
+        logger.error(f"✗ iperf结果低于基线: {topology}")
+        return None
+    logger.info("✓ iperf结果分析通过")
+    return verdict
+
+# ==================== 日志收集 ====================
+
+def collect_remote_logs(servers=None, label=None):
+    """
+    并发收集各服务器的容器日志和系统日志，同一运行内只传输上次收集之后的新增部分
+    
+    Args:
+        servers: 服务器名称列表，默认读取 log_collection.servers 或 adn_restart.servers
+        label: 本次收集的标识，日志保存在 reports/artifacts/runs/<运行ID>/logs/<label>/
+    
+    Returns:
+        list: 每个日志源的收集结果，全部失败时返回False
+    """
+    from utils.log_collector import get_log_collector
+    
+    if isinstance(servers, str):
+        servers = [s.strip() for s in servers.split(',') if s.strip()]
+    reports = get_log_collector().collect(servers, label)
+    if reports and all(r['error'] for r in reports):
+        logger.error("✗ 日志收集全部失败")
+        return False
+    return reports
+
+# ==================== 资源采样 ====================
+
+# 后台运行中的资源采样: {采样ID: ResourceSampler}
+_samplers = {}
+# 采样ID序号，单调递增，已停止的采样被移除后也不会复用ID
+_sampler_ids = itertools.count(1)
+
+def start_resource_sampler(servers=None, interval=None, containers=None, sampler_id=None):
+    """
+    启动后台资源采样，采样期间执行的步骤在停止时按各自的时间窗口汇总
+    
+    Args:
+        servers: 服务器名称列表，默认读取 resource_sampler.servers 或 adn_restart.servers
+        interval: 采样间隔(秒)
+        containers: 采集docker stats的容器列表，默认为 adn_services 中的容器
+        sampler_id: 采样ID，默认自动生成
+    
+    Returns:
+        采样ID，所有服务器都无法建立采样通道时返回None
+    """
+    from utils.resource_sampler import ResourceSampler
+    
+    if isinstance(servers, str):
+        servers = [s.strip() for s in servers.split(',') if s.strip()]
+    if isinstance(containers, str):
+        containers = [c.strip() for c in containers.split(',') if c.strip()]
+    sampler_id = sampler_id or f"sampler-{next(_sampler_ids)}"
+    if sampler_id in _samplers and _samplers[sampler_id].running:
+        logger.error(f"✗ 资源采样 {sampler_id} 仍在运行")
+        return None
+    
+    sampler = ResourceSampler(servers, interval, containers).start()
+    if all(host.error for host in sampler.hosts.values()):
+        sampler.stop()
+        logger.error("✗ 资源采样启动失败: 所有服务器都无法建立采样通道")
+        return None
+    _samplers[sampler_id] = sampler
+    watchdog.on_abandon(lambda: _abandon_sampler(sampler_id, sampler))
+    logger.info(f"✓ 资源采样已启动: {sampler_id}")
+    return sampler_id
+
+def _abandon_sampler(sampler_id, sampler):
+    sampler.stop()
+    if _samplers.get(sampler_id) is sampler:
+        del _samplers[sampler_id]
+    logger.warning(f"资源采样 {sampler_id} 已随超时步骤停止")
+
+def stop_resource_sampler(sampler_id=None):
+    """
+    停止资源采样并返回汇总
+    
+    Args:
+        sampler_id: 采样ID，默认为最近启动的采样
+    
+    Returns:
+        dict: hosts为各服务器整体的均值/p99/峰值，steps为采样期间每个步骤时间窗口内的汇总，
+              网卡计数为每秒速率(mean_rate/p99_rate/peak_rate)
+    """
+    if not _samplers:
+        logger.error("✗ 没有运行中的资源采样")
+        return None
+    sampler_id = sampler_id or list(_samplers)[-1]
+    if sampler_id not in _samplers:
+        logger.error(f"✗ 未找到资源采样: {sampler_id}")
+        return None
+    
+    summary = _samplers.pop(sampler_id).stop()
+    for server, host in summary['hosts'].items():
+        metrics = host['metrics']
+        cpu = metrics.get('cpu.util') or {}
+        mem = metrics.get('mem.used_pct') or {}
+        logger.info(f"资源采样 {server}: {host['samples']} 个采样, CPU均值 {cpu.get('mean')}% 峰值 {cpu.get('max')}%, "
+                    f"内存峰值 {mem.get('max')}%" + (f", 错误: {host['error']}" if host['error'] else ""))
+    logger.info(f"✓ 资源采样已停止: {sampler_id}, {len(summary['steps'])} 个步骤窗口")
+    return summary
+
+# ==================== AW注册 ====================
+
+def register_basic_actions(runner):
+    """将基础AW注册到TestRunner"""
+    runner.register_action("检查服务器连通性", check_server_connectivity)
+    runner.register_action("检查数据库连通性", check_database_connectivity)
+    runner.register_action("清理数据库表", clear_database_table)
+    runner.register_action("重启ADN容器", restart_adn_containers)
+    runner.register_action("调用API", call_api)
+    runner.register_action("API压测", run_api_load)
+    runner.register_action("等待API压测", wait_api_load)
+    runner.register_action("停止API压测", stop_api_load)
+    runner.register_action("执行rtnctl查询", execute_rtnctl_query)
+    runner.register_action("执行iperf测试", execute_iperf_test)
+    runner.register_action("分析iperf结果", analyze_iperf_results)
+    runner.register_action("收集远程日志", collect_remote_logs)
+    runner.register_action("启动资源采样", start_resource_sampler)
+    runner.register_action("停止资源采样", stop_resource_sampler)
@@ -4,8 +4,10 @@
 import subprocess
 import socket
 import requests
+from urllib.parse import urlparse
 from framework.aw_manager import aw_register
 from utils.logger import get_logger
+from utils.circuit_breaker import breakers
 
 logger = get_logger(__name__)
 
@@ -83,7 +85,8 @@ def check_http_service(url: str, expected_status: int = 200, timeout: int = 10)
         dict: 检查结果
     """
     try:
-        response = requests.get(url, timeout=timeout)
+        with breakers.guard('api', urlparse(url).netloc, failures=(requests.ConnectionError, requests.Timeout)):
+            response = requests.get(url, timeout=timeout)
         
         result = {
             "success": response.status_code == expected_status,
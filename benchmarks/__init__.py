@@ -0,0 +1,3 @@
+"""
+框架性能基准测试
+"""
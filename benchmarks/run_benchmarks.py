@@ -0,0 +1,273 @@
+"""
+框架开销基准测试
+使用本地替身服务测量框架自身的吞吐量，并与保存的基线比较
+
+用法:
+    python benchmarks/run_benchmarks.py                 # 运行并与基线比较
+    python benchmarks/run_benchmarks.py --save-baseline # 运行并保存为新基线
+    python benchmarks/run_benchmarks.py -k aw_dispatch  # 只运行名称包含关键字的项
+"""
+import sys
+import os
+import json
+import time
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yaml
+from simulator.ssh_server import LocalSSHServer
+from simulator.api_server import LocalHTTPServer
+from simulator.db_server import LocalMySQLServer
+from framework.aw_manager import AWManager
+from core.test_runner import TestRunner
+from actions.basic_actions import register_basic_actions
+from utils.config_manager import config_manager
+from utils.connection_pool import connection_pool
+from utils.logger import get_logger
+
+BASELINE_FILE = Path(__file__).parent / "baseline.json"
+DEFAULT_THRESHOLD = 0.2
+
+BENCH_CASE = {
+    'test_case': {
+        'id': 'BENCH_E2E_001',
+        'name': '基准测试端到端用例',
+        'steps': [
+            {'action': '检查服务器连通性', 'params': {'server_name': 'bench_server'}},
+            {'action': '检查数据库连通性', 'params': {'db_name': 'bench_db'}},
+            {'action': '调用API', 'params': {'endpoint': '/api/v1/nodes', 'method': 'GET'}},
+            {'action': '执行rtnctl查询', 'params': {'query_params': 'show route table'}},
+        ]
+    }
+}
+
+class BenchmarkEnvironment:
+    """基准测试环境: 启动替身服务并切换配置"""
+
+    def __init__(self):
+        self.ssh = LocalSSHServer().start()
+        self.http = LocalHTTPServer().start()
+        self.db = LocalMySQLServer().start()
+        self.work_dir = tempfile.TemporaryDirectory(prefix="netautotest_bench_")
+        self.case_file = Path(self.work_dir.name) / "bench_case.yaml"
+        with open(self.case_file, 'w', encoding='utf-8') as f:
+            yaml.safe_dump(BENCH_CASE, f, allow_unicode=True)
+
+        self._original_config = config_manager.load_config()
+        config_manager.use_config({
+            'servers': {
+                'bench_server': {'ip': self.ssh.host, 'port': self.ssh.port, 'username': 'bench', 'password': 'bench'},
+            },
+            'databases': {
+                'bench_db': {'host': self.db.host, 'port': self.db.port, 'username': 'bench',
+                             'password': 'bench', 'database': 'bench'},
+            },
+            'apis': {'base_url': self.http.base_url},
+            'tools': {'rtnctl_path': 'rtnctl'},
+            # 保留实际的时限配置，步骤时限决定AW是否经看门狗线程执行
+            'timeouts': self._original_config.get('timeouts') or {},
+        })
+
+        # 日志写入临时文件，保留格式化和写文件的开销，但不刷屏、不污染 logs/test.log
+        self._root = logging.getLogger()
+        self._handlers = self._root.handlers[:]
+        formatter = self._handlers[0].formatter if self._handlers else None
+        self._log_handler = logging.FileHandler(Path(self.work_dir.name) / "bench.log", encoding='utf-8')
+        self._log_handler.setFormatter(formatter)
+        self._root.handlers = [self._log_handler]
+
+    def close(self):
+        self._root.handlers = self._handlers
+        self._log_handler.close()
+        connection_pool.close_all()
+        config_manager.use_config(self._original_config)
+        self.ssh.stop()
+        self.http.stop()
+        self.db.stop()
+        self.work_dir.cleanup()
+
+# ==================== 基准测试项 ====================
+# 每项接收环境并返回一个函数，该函数执行一批操作并返回操作次数
+
+def bench_aw_dispatch(env):
+    """AWManager.call_aw 分发开销（空AW）"""
+    manager = AWManager()
+    manager.register_aw("空操作", lambda value=0: value)
+
+    def run():
+        for i in range(1000):
+            manager.call_aw("空操作", value=i)
+        return 1000
+    return run
+
+def bench_replace_variables(env):
+    """TestRunner.replace_variables 变量替换"""
+    runner = TestRunner()
+    runner.context = {f"var{i}": f"value{i}" for i in range(20)}
+    params = {
+        'server_name': '${var1}',
+        'query_params': 'show route ${var2} table ${var3}',
+        'tables': [{'name': '${var4}', 'condition': "status='${var5}'"}, '${var6}'],
+        'json_data': {'node_id': '${var7}', 'nested': {'key': '${var8}', 'list': ['${var9}', 'plain']}},
+    }
+
+    def run():
+        for _ in range(1000):
+            runner.replace_variables(params)
+        return 1000
+    return run
+
+def bench_yaml_case_load(env):
+    """YAML用例加载"""
+    runner = TestRunner()
+    case_file = Path(__file__).parent.parent / "testcases" / "adn_demo.yaml"
+
+    def run():
+        for _ in range(50):
+            runner.load_case(case_file)
+        return 50
+    return run
+
+def bench_pool_checkout(env):
+    """ConnectionPool 已建立连接的获取"""
+    connection_pool.get_ssh_connection('bench_server')
+    connection_pool.get_db_connection('bench_db')
+
+    def run():
+        for _ in range(1000):
+            connection_pool.get_ssh_connection('bench_server')
+            connection_pool.get_db_connection('bench_db')
+        return 2000
+    return run
+
+def bench_ssh_connect(env):
+    """SSH建连和认证（本地替身，不含网络延迟）"""
+    def run():
+        connection_pool.close_all()
+        for _ in range(5):
+            connection_pool.get_ssh_connection('bench_server')
+            connection_pool.close_all()
+        return 5
+    return run
+
+def bench_logging(env):
+    """日志吞吐量"""
+    logger = get_logger()
+
+    def run():
+        for i in range(1000):
+            logger.info(f"基准测试日志 {i}: 执行AW 检查服务器连通性, 参数: {{'server_name': 'bench_server'}}")
+        return 1000
+    return run
+
+def bench_end_to_end(env):
+    """端到端YAML用例（SSH、数据库、API各一次往返）"""
+    runner = TestRunner()
+    register_basic_actions(runner)
+    runner.run_case(env.case_file)
+
+    def run():
+        for _ in range(5):
+            runner.context = {}
+            runner.run_case(env.case_file)
+        return 5
+    return run
+
+BENCHMARKS = [
+    ('aw_dispatch', bench_aw_dispatch),
+    ('replace_variables', bench_replace_variables),
+    ('yaml_case_load', bench_yaml_case_load),
+    ('pool_checkout', bench_pool_checkout),
+    ('ssh_connect', bench_ssh_connect),
+    ('logging', bench_logging),
+    ('end_to_end_cases', bench_end_to_end),
+]
+
+# ==================== 执行和比较 ====================
+
+def measure(run, min_time=1.0, rounds=3):
+    """多轮测量，每轮至少运行min_time秒，取最高吞吐量（次/秒）"""
+    best = 0.0
+    for _ in range(rounds):
+        count = 0
+        start = time.perf_counter()
+        while True:
+            count += run()
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        best = max(best, count / elapsed)
+    return best
+
+def run_benchmarks(keyword=None, min_time=1.0, rounds=3):
+    """运行基准测试，返回 {名称: 次/秒}"""
+    env = BenchmarkEnvironment()
+    results = {}
+    try:
+        for name, factory in BENCHMARKS:
+            if keyword and keyword not in name:
+                continue
+            results[name] = measure(factory(env), min_time, rounds)
+    finally:
+        env.close()
+    return results
+
+def load_baseline(path=BASELINE_FILE):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def save_baseline(results, path=BASELINE_FILE):
+    baseline = load_baseline(path)
+    baseline.update({name: round(value, 3) for name, value in results.items()})
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """与基线比较，返回退化项列表"""
+    regressions = []
+    print(f"{'基准项':<20}{'当前(次/秒)':>16}{'基线(次/秒)':>16}{'变化':>10}")
+    for name, value in results.items():
+        base = baseline.get(name)
+        if base:
+            change = (value - base) / base
+            flag = "  ✗ 退化" if change < -threshold else ""
+            print(f"{name:<20}{value:>16.1f}{base:>16.1f}{change:>+10.1%}{flag}")
+            if change < -threshold:
+                regressions.append(name)
+        else:
+            print(f"{name:<20}{value:>16.1f}{'-':>16}{'-':>10}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='框架开销基准测试')
+    parser.add_argument('-k', '--keyword', help='只运行名称包含关键字的基准项')
+    parser.add_argument('--save-baseline', action='store_true', help='将本次结果保存为基线')
+    parser.add_argument('--baseline', default=str(BASELINE_FILE), help='基线文件路径')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='允许的吞吐量下降比例，默认0.2')
+    parser.add_argument('--min-time', type=float, default=1.0, help='每轮最短运行时间(秒)')
+    parser.add_argument('--rounds', type=int, default=3, help='测量轮数')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.keyword, args.min_time, args.rounds)
+    regressions = compare(results, load_baseline(args.baseline), args.threshold)
+
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+        print(f"基线已保存: {args.baseline}")
+        sys.exit(0)
+
+    if regressions:
+        print(f"吞吐量退化超过 {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    sys.exit(0)
+
+if __name__ == '__main__':
+    main()
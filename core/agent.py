@@ -0,0 +1,154 @@
+"""
+分布式执行节点(Agent) - 向协调器注册，拉取用例执行并回传日志和结果
+"""
+import os
+import time
+import socket
+import logging
+import threading
+from utils.logger import get_logger
+from core.protocol import MessageChannel, parse_address, auth_token
+from core.case_executor import run_case_file
+from utils.parametrize import split_case_ref
+from utils.change_tracker import change_tracker
+from utils.result_store import result_sink
+from utils.watchdog import watchdog
+from utils.circuit_breaker import breakers
+
+logger = get_logger()
+
+class _StreamLogHandler(logging.Handler):
+    """将用例执行期间的日志实时回传给协调器"""
+
+    def __init__(self, channel, lease_id):
+        super().__init__(level=logging.INFO)
+        self.channel = channel
+        self.lease_id = lease_id
+
+    def emit(self, record):
+        try:
+            self.channel.send('log', lease_id=self.lease_id, time=record.created,
+                              level=record.levelname, message=record.getMessage())
+        except Exception:
+            self.handleError(record)
+
+class _ForwardWriter:
+    """结果写入器: 将用例和步骤事件连同所属租约转发给协调器统一写入"""
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.lease_id = None
+
+    def write(self, event):
+        if event['event'] not in ('run_start', 'run_end'):
+            self.channel.send('event', lease_id=self.lease_id, event=event)
+
+    def close(self):
+        pass
+
+class Agent:
+    """分布式执行节点"""
+
+    def __init__(self, address, agent_id=None, connect_retries=30):
+        self.host, self.port = parse_address(address)
+        self.agent_id = agent_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.connect_retries = connect_retries
+        self.heartbeat_interval = 10
+        self._yaml_runner = None
+        self._writer = None
+        self.token = auth_token()
+
+    def _connect(self):
+        """连接协调器，协调器尚未启动时重试"""
+        for attempt in range(1, self.connect_retries + 1):
+            try:
+                return socket.create_connection((self.host, self.port), timeout=10)
+            except OSError as e:
+                if attempt == self.connect_retries:
+                    raise
+                logger.warning(f"连接协调器失败({attempt}/{self.connect_retries}): {e}")
+                time.sleep(1)
+
+    def run(self):
+        """注册并循环拉取用例，直到协调器通知结束，返回已执行的用例数"""
+        sock = self._connect()
+        sock.settimeout(None)
+        channel = MessageChannel(sock)
+        executed = 0
+        try:
+            channel.send('register', agent_id=self.agent_id, host=socket.gethostname(), pid=os.getpid(),
+                         token=self.token)
+            msg = channel.receive()
+            if not msg or msg.get('type') != 'registered':
+                logger.error(f"✗ Agent注册失败: {msg}")
+                return executed
+            self.heartbeat_interval = msg.get('heartbeat_interval', self.heartbeat_interval)
+            if msg.get('run_id'):
+                self._writer = _ForwardWriter(channel)
+                result_sink.start_run(msg['run_id'], writers=[self._writer])
+            watchdog.start_run()
+            logger.info(f"Agent已注册: {self.agent_id} -> {self.host}:{self.port}")
+
+            while True:
+                channel.send('request')
+                msg = channel.receive()
+                if msg is None or msg.get('type') == 'shutdown':
+                    break
+                if msg.get('type') == 'wait':
+                    time.sleep(msg.get('retry', 1))
+                    continue
+                if msg.get('type') == 'assign':
+                    self._execute(channel, msg['case'], msg['lease_id'])
+                    executed += 1
+        except OSError as e:
+            logger.error(f"✗ 与协调器的连接中断: {e}")
+        finally:
+            watchdog.end_run()
+            result_sink.end_run(metrics={'circuit_breakers': breakers.metrics()})
+            channel.close()
+            logger.info(f"Agent退出: {self.agent_id}, 共执行 {executed} 个用例")
+        return executed
+
+    def _heartbeat(self, channel, stop_event):
+        while not stop_event.wait(self.heartbeat_interval):
+            try:
+                channel.send('heartbeat')
+            except OSError:
+                return
+
+    def _execute(self, channel, case, lease_id):
+        """执行单个用例，执行期间保持心跳并回传日志"""
+        stop_event = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(channel, stop_event), daemon=True)
+        handler = _StreamLogHandler(channel, lease_id)
+        root_logger = logging.getLogger()
+
+        if self._writer is not None:
+            self._writer.lease_id = lease_id
+        heartbeat.start()
+        root_logger.addHandler(handler)
+        start = time.monotonic()
+        error = None
+        try:
+            success = self._run_case(case)
+        except Exception as e:
+            success = False
+            error = str(e)
+            logger.error(f"✗ 用例执行异常: {case}, {e}")
+        finally:
+            root_logger.removeHandler(handler)
+            stop_event.set()
+            heartbeat.join()
+
+        channel.send('result', case=case, lease_id=lease_id, success=bool(success),
+                     duration=round(time.monotonic() - start, 3), error=error,
+                     trace=change_tracker.pop_trace(case))
+
+    def _run_case(self, case):
+        # 参数化实例的引用为 文件#实例键，按文件部分判断用例类型，所有实例共用同一个runner
+        if split_case_ref(case)[0].endswith(('.yaml', '.yml')) and self._yaml_runner is None:
+            from core.test_runner import TestRunner
+            from actions.basic_actions import register_basic_actions
+            self._yaml_runner = TestRunner()
+            register_basic_actions(self._yaml_runner)
+        return run_case_file(case, runner=self._yaml_runner)
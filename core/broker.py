@@ -0,0 +1,537 @@
+"""
+连接代理 - 常驻本机的代理进程保持到各目标的SSH和数据库连接，
+测试进程通过Unix socket请求代理执行远程命令和SQL，省去每次运行的连接建立和认证
+
+启用方式: config.yaml 中 broker.enabled: true，或环境变量 NETAUTOTEST_BROKER=1，或 run_tests.py --broker
+代理进程在首次使用时自动启动，空闲超过 broker.idle_timeout 秒后自动退出
+
+    python -m core.broker --status    查看代理进程状态
+    python -m core.broker --stop      停止代理进程
+"""
+import io
+import os
+import sys
+import json
+import time
+import base64
+import socket
+import getpass
+import hashlib
+import argparse
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from core.protocol import MessageChannel
+from utils.logger import get_logger
+from utils.circuit_breaker import HostUnavailableError
+
+logger = get_logger()
+
+PROJECT_ROOT = Path(__file__).parent.parent
+# 每个目标保留的空闲数据库连接数
+MAX_IDLE_DB = 4
+START_TIMEOUT = 10
+
+def default_socket_path():
+    """默认socket路径，按用户和项目目录区分，避免多个工作目录共用同一个代理"""
+    digest = hashlib.sha1(str(PROJECT_ROOT.resolve()).encode('utf-8')).hexdigest()[:8]
+    return os.path.join(tempfile.gettempdir(), f"netautotest-broker-{getpass.getuser()}-{digest}.sock")
+
+def _target_key(name, config):
+    # 配置变化(如切换到模拟实验室)时使用新的连接
+    return name, json.dumps(config, sort_keys=True, default=str)
+
+class BrokerError(RuntimeError):
+    """代理进程不可用或请求失败"""
+
+# ==================== 代理进程 ====================
+
+class BrokerServer:
+    """代理进程，每个客户端连接一个线程，数据库连接在客户端连接期间独占以保证事务语义"""
+
+    def __init__(self, path=None, idle_timeout=1800):
+        self.path = path or default_socket_path()
+        self.idle_timeout = idle_timeout
+        self.requests = 0
+        self._ssh = {}
+        self._ssh_locks = {}
+        self._db_idle = {}
+        self._clients = 0
+        self._last_active = time.monotonic()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _bind(self):
+        if os.path.exists(self.path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+                raise BrokerError(f"代理进程已在运行: {self.path}")
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.unlink(self.path)
+            finally:
+                probe.close()
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.path)
+        # 请求中包含目标的登录信息，只允许当前用户访问
+        os.chmod(self.path, 0o600)
+        listener.listen(64)
+        return listener
+
+    def serve_forever(self):
+        listener = self._bind()
+        listener.settimeout(1)
+        logger.info(f"连接代理已启动: {self.path}, 进程号 {os.getpid()}, 空闲 {self.idle_timeout} 秒后退出")
+        try:
+            while not self._stop.is_set():
+                try:
+                    sock, _ = listener.accept()
+                except socket.timeout:
+                    if self._idle():
+                        logger.info("连接代理空闲超时，退出")
+                        break
+                    continue
+                with self._lock:
+                    self._clients += 1
+                threading.Thread(target=self._serve_client, args=(sock,), daemon=True).start()
+        finally:
+            listener.close()
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+            self.close_all()
+            logger.info(f"连接代理已退出, 共处理 {self.requests} 个请求")
+
+    def _idle(self):
+        with self._lock:
+            return self._clients == 0 and time.monotonic() - self._last_active >= self.idle_timeout
+
+    def _serve_client(self, sock):
+        channel = MessageChannel(sock)
+        session = {}
+        try:
+            while True:
+                msg = channel.receive()
+                if msg is None:
+                    break
+                with self._lock:
+                    self.requests += 1
+                    self._last_active = time.monotonic()
+                try:
+                    channel.send('result', **self._dispatch(msg, session))
+                except Exception as e:
+                    channel.send('error', error=str(e), kind=type(e).__name__)
+                if msg.get('type') == 'shutdown':
+                    self._stop.set()
+        except (OSError, ValueError):
+            pass
+        finally:
+            for key, conn in session.items():
+                self._release_db(key, conn)
+            with self._lock:
+                self._clients -= 1
+                self._last_active = time.monotonic()
+            channel.close()
+
+    def _dispatch(self, msg, session):
+        msg_type = msg.get('type')
+        if msg_type == 'ssh_exec':
+            return self._ssh_exec(msg)
+        if msg_type in ('db_execute', 'db_commit', 'db_rollback'):
+            return self._db_call(msg, session)
+        if msg_type == 'stats':
+            return self.stats()
+        if msg_type == 'shutdown':
+            return {'stopping': True}
+        raise BrokerError(f"未知请求: {msg_type}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'clients': self._clients,
+                'requests': self.requests,
+                'ssh': sorted({name for name, _ in self._ssh}),
+                'db_idle': {name: len(conns) for (name, _), conns in self._db_idle.items()},
+            }
+
+    def _get_ssh(self, name, config):
+        from utils.connection_pool import connection_pool
+
+        key = _target_key(name, config)
+        with self._lock:
+            lock = self._ssh_locks.setdefault(key, threading.Lock())
+        # 同一目标的连接只建立一次，不同目标并发建立
+        with lock:
+            ssh = self._ssh.get(key)
+            transport = ssh.get_transport() if ssh else None
+            if transport is None or not transport.is_active():
+                if ssh is not None:
+                    logger.info(f"SSH连接已断开，重新建立: {name}")
+                    ssh.close()
+                ssh = connection_pool.connect_ssh(name, config)
+                transport = ssh.get_transport()
+                if transport is not None and transport.sock is not None:
+                    transport.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with self._lock:
+                    self._ssh[key] = ssh
+                logger.info(f"SSH连接已建立: {name}")
+            return ssh
+
+    def _ssh_exec(self, msg):
+        ssh = self._get_ssh(msg['name'], msg['config'])
+        stdin, stdout, stderr = ssh.exec_command(msg['command'], timeout=msg.get('timeout'))
+        stdin.close()
+        out = stdout.read()
+        err = stderr.read()
+        return {
+            'exit_code': stdout.channel.recv_exit_status(),
+            'stdout': base64.b64encode(out).decode('ascii'),
+            'stderr': base64.b64encode(err).decode('ascii'),
+        }
+
+    def _lease_db(self, name, config):
+        from utils.connection_pool import connection_pool
+
+        key = _target_key(name, config)
+        while True:
+            with self._lock:
+                idle = self._db_idle.get(key)
+                conn = idle.pop() if idle else None
+            if conn is None:
+                conn = connection_pool.connect_db(name, config)
+                logger.info(f"数据库连接已建立: {name}")
+                return key, conn
+            try:
+                conn.ping(reconnect=False)
+                return key, conn
+            except Exception:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+    def _release_db(self, key, conn):
+        try:
+            conn.rollback()
+        except Exception:
+            try:
+                conn.close()
+            except Exception:
+                pass
+            return
+        with self._lock:
+            idle = self._db_idle.setdefault(key, [])
+            if len(idle) < MAX_IDLE_DB:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def _db_call(self, msg, session):
+        key = _target_key(msg['name'], msg['config'])
+        conn = session.get(key)
+        if msg['type'] != 'db_execute':
+            if conn is not None:
+                conn.commit() if msg['type'] == 'db_commit' else conn.rollback()
+            return {}
+        if conn is None:
+            key, conn = self._lease_db(msg['name'], msg['config'])
+            session[key] = conn
+        with conn.cursor() as cursor:
+            rowcount = cursor.execute(msg['sql'], msg.get('args'))
+            rows = [list(row) for row in cursor.fetchall()] if cursor.description else []
+            return {
+                'rowcount': rowcount,
+                'rows': rows,
+                'description': [list(d) for d in cursor.description] if cursor.description else None,
+                'lastrowid': cursor.lastrowid,
+            }
+
+    def close_all(self):
+        with self._lock:
+            connections = list(self._ssh.values()) + [c for conns in self._db_idle.values() for c in conns]
+            self._ssh.clear()
+            self._db_idle.clear()
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+# ==================== 客户端 ====================
+
+def start_broker(path, idle_timeout):
+    """在后台启动代理进程，脱离当前进程的会话，测试进程退出后继续运行"""
+    subprocess.Popen(
+        [sys.executable, '-m', 'core.broker', '--socket', path, '--idle-timeout', str(idle_timeout)],
+        cwd=str(PROJECT_ROOT),
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True
+    )
+
+class BrokerClient:
+    """代理客户端，SSH请求复用通道池，数据库连接各自独占一个通道"""
+
+    def __init__(self, path=None, auto_start=True, idle_timeout=1800):
+        self.path = path or default_socket_path()
+        self.auto_start = auto_start
+        self.idle_timeout = idle_timeout
+        self._idle = []
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+
+    def _try_connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.path)
+            return MessageChannel(sock)
+        except OSError:
+            sock.close()
+            return None
+
+    def connect(self):
+        """建立到代理进程的通道，代理未运行时按配置自动启动"""
+        channel = self._try_connect()
+        if channel is not None:
+            return channel
+        if not self.auto_start:
+            raise BrokerError(f"连接代理未运行: {self.path}")
+        with self._start_lock:
+            channel = self._try_connect()
+            if channel is not None:
+                return channel
+            logger.info(f"启动连接代理: {self.path}")
+            start_broker(self.path, self.idle_timeout)
+            deadline = time.monotonic() + START_TIMEOUT
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                channel = self._try_connect()
+                if channel is not None:
+                    return channel
+        raise BrokerError(f"连接代理启动失败: {self.path}")
+
+    def acquire(self):
+        """从通道池取出一个通道，没有空闲通道时新建"""
+        with self._lock:
+            channel = self._idle.pop() if self._idle else None
+        return channel or self.connect()
+
+    def release(self, channel):
+        with self._lock:
+            self._idle.append(channel)
+
+    def request(self, msg_type, channel=None, **fields):
+        """发送请求并等待结果，channel为None时使用通道池中的通道"""
+        pooled = channel is None
+        if pooled:
+            channel = self.acquire()
+        try:
+            channel.send(msg_type, **fields)
+            response = channel.receive()
+        except (OSError, ValueError) as e:
+            channel.close()
+            raise BrokerError(f"与连接代理的通信中断: {e}") from None
+        if response is None:
+            channel.close()
+            raise BrokerError("与连接代理的通信中断")
+        if pooled:
+            self.release(channel)
+        if response.get('type') == 'error':
+            if response.get('kind') == 'HostUnavailableError':
+                raise HostUnavailableError(response['error'])
+            raise BrokerError(f"{response.get('kind')}: {response.get('error')}")
+        return response
+
+    def ssh_client(self, name, config):
+        return BrokerSSHClient(self, name, config)
+
+    def db_connection(self, name, config):
+        return BrokerDBConnection(self, name, config)
+
+    def stats(self):
+        return self.request('stats')
+
+    def shutdown(self):
+        return self.request('shutdown')
+
+    def close(self):
+        """关闭通道池中的通道，代理进程中的连接不受影响"""
+        with self._lock:
+            channels, self._idle = self._idle, []
+        for channel in channels:
+            channel.close()
+
+class _ExitStatus:
+    """对应paramiko Channel，命令已在代理进程中执行完成"""
+
+    def __init__(self, exit_code):
+        self.exit_code = exit_code
+
+    def recv_exit_status(self):
+        return self.exit_code
+
+    def exit_status_ready(self):
+        return True
+
+class _RemoteFile(io.BytesIO):
+    """对应paramiko的stdout/stderr，内容已完整读取"""
+
+    def __init__(self, data, channel):
+        super().__init__(data)
+        self.channel = channel
+
+class BrokerSSHClient:
+    """SSH连接代理对象，兼容AW中 exec_command 的用法"""
+
+    def __init__(self, client, name, config):
+        self.client = client
+        self.name = name
+        self.config = config
+        self._inflight = set()
+        self._lock = threading.Lock()
+
+    def exec_command(self, command, bufsize=-1, timeout=None, get_pty=False, environment=None):
+        channel = self.client.acquire()
+        with self._lock:
+            self._inflight.add(channel)
+        try:
+            result = self.client.request('ssh_exec', channel=channel, name=self.name, config=self.config,
+                                         command=command, timeout=timeout)
+        except BaseException:
+            channel.close()
+            raise
+        finally:
+            with self._lock:
+                self._inflight.discard(channel)
+        self.client.release(channel)
+        status = _ExitStatus(result['exit_code'])
+        return (_RemoteFile(b'', status),
+                _RemoteFile(base64.b64decode(result['stdout']), status),
+                _RemoteFile(base64.b64decode(result['stderr']), status))
+
+    def close(self):
+        """中断进行中的请求(如执行超时)，代理进程中的SSH连接保持可用"""
+        with self._lock:
+            channels = list(self._inflight)
+        for channel in channels:
+            channel.close()
+
+class BrokerCursor:
+    """游标代理对象，查询结果在execute时一次取回"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = -1
+        self.description = None
+        self.lastrowid = None
+        self._rows = []
+        self._position = 0
+
+    def execute(self, query, args=None):
+        result = self.connection._request('db_execute', sql=query, args=args)
+        self.rowcount = result['rowcount']
+        self.description = [tuple(d) for d in result['description']] if result['description'] else None
+        self.lastrowid = result['lastrowid']
+        self._rows = [tuple(row) for row in result['rows']]
+        self._position = 0
+        return self.rowcount
+
+    def fetchone(self):
+        if self._position >= len(self._rows):
+            return None
+        self._position += 1
+        return self._rows[self._position - 1]
+
+    def fetchmany(self, size=1):
+        rows = self._rows[self._position:self._position + size]
+        self._position += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._rows[self._position:]
+        self._position = len(self._rows)
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class BrokerDBConnection:
+    """数据库连接代理对象，兼容AW中 cursor/commit 的用法，独占一个通道以保持事务"""
+
+    def __init__(self, client, name, config):
+        self.client = client
+        self.name = name
+        self.config = config
+        self._channel = None
+        self._lock = threading.Lock()
+
+    def _request(self, msg_type, **fields):
+        with self._lock:
+            if self._channel is None:
+                self._channel = self.client.connect()
+            try:
+                return self.client.request(msg_type, channel=self._channel, name=self.name,
+                                           config=self.config, **fields)
+            except BrokerError:
+                self._channel = None
+                raise
+
+    def cursor(self):
+        return BrokerCursor(self)
+
+    def commit(self):
+        self._request('db_commit')
+
+    def rollback(self):
+        self._request('db_rollback')
+
+    def ping(self, reconnect=True):
+        self.cursor().execute("SELECT 1")
+
+    def close(self):
+        """断开通道，代理进程回滚未提交的事务并保留连接"""
+        channel, self._channel = self._channel, None
+        if channel is not None:
+            channel.close()
+
+def main():
+    from utils.connection_pool import broker_settings
+
+    settings = broker_settings()
+    parser = argparse.ArgumentParser(description='连接代理进程')
+    parser.add_argument('--socket', default=settings['socket'] or default_socket_path(), help='Unix socket路径')
+    parser.add_argument('--idle-timeout', type=float, default=settings['idle_timeout'], help='空闲多少秒后退出')
+    parser.add_argument('--status', action='store_true', help='查看代理进程状态')
+    parser.add_argument('--stop', action='store_true', help='停止代理进程')
+    args = parser.parse_args()
+
+    if args.status or args.stop:
+        client = BrokerClient(args.socket, auto_start=False)
+        try:
+            result = client.shutdown() if args.stop else client.stats()
+        except BrokerError as e:
+            print(e)
+            sys.exit(1)
+        print(json.dumps({k: v for k, v in result.items() if k != 'type'}, ensure_ascii=False, indent=2))
+        return
+
+    try:
+        BrokerServer(args.socket, args.idle_timeout).serve_forever()
+    except BrokerError as e:
+        logger.info(str(e))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+用例执行器 - 按文件类型执行单个用例（YAML关键字用例 / unittest用例）
+"""
+import unittest
+import importlib.util
+from pathlib import Path
+import yaml
+from utils.logger import get_logger
+from utils.parametrize import ParamSource, case_ref, split_case_ref
+
+logger = get_logger()
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# 已加载的unittest用例模块 {(路径, 修改时间): 模块}，参数化实例逐个执行时复用
+_modules = {}
+
+def resolve_case_path(case_file):
+    """将用例路径解析为绝对路径，相对路径以项目根目录为基准"""
+    path = Path(case_file)
+    if not path.is_absolute() and not path.exists():
+        path = PROJECT_ROOT / path
+    return path
+
+def discover_cases(pattern="TC_*.py", directory="testcases"):
+    """按文件模式查找用例，返回相对项目根目录的路径列表"""
+    case_dir = PROJECT_ROOT / directory
+    return sorted(p.relative_to(PROJECT_ROOT).as_posix() for p in case_dir.glob(pattern))
+
+def run_yaml_case(case_file, runner=None, instance=None):
+    """执行YAML关键字用例"""
+    from core.test_runner import TestRunner
+    from actions.basic_actions import register_basic_actions
+
+    if runner is None:
+        runner = TestRunner()
+        register_basic_actions(runner)
+    runner.context = {}
+    return runner.run_case(str(case_file), instance)
+
+def load_python_module(case_file):
+    """加载unittest用例模块，文件未修改时复用"""
+    path = Path(case_file).resolve()
+    key = (path, path.stat().st_mtime_ns)
+    if key not in _modules:
+        spec = importlib.util.spec_from_file_location(path.stem, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _modules[key] = module
+    return _modules[key]
+
+def load_python_suite(case_file):
+    """加载unittest用例文件中的所有测试，参数化测试方法展开为逐个实例"""
+    from framework.base_test import ParametrizedTestLoader
+    return ParametrizedTestLoader().loadTestsFromModule(load_python_module(case_file))
+
+def load_python_test(case_file, key):
+    """按实例键加载单个测试，键形如 类名.方法名 或 类名.方法名:序号"""
+    name, _, index = key.partition(':')
+    class_name, _, method_name = name.partition('.')
+    test_class = getattr(load_python_module(case_file), class_name)
+    if not index:
+        return test_class(method_name)
+    source = getattr(test_class, method_name).param_source
+    params = source.get(int(index))
+    return test_class(method_name, params=params, instance_id=source.instance_id(int(index), params))
+
+def run_python_case(case_file, verbosity=2, instance=None):
+    """执行unittest用例文件，指定instance时只执行该测试"""
+    suite = load_python_test(case_file, instance) if instance else load_python_suite(case_file)
+    result = unittest.TextTestRunner(verbosity=verbosity).run(suite)
+    return result.wasSuccessful()
+
+def run_case_file(case_file, runner=None):
+    """执行单个用例文件或参数化实例(文件路径#实例键)，返回是否成功"""
+    case_file, instance = split_case_ref(case_file)
+    path = resolve_case_path(case_file)
+    if not path.exists():
+        logger.error(f"✗ 用例文件不存在: {case_file}")
+        return False
+
+    if path.suffix in ('.yaml', '.yml'):
+        return run_yaml_case(path, runner, instance)
+    return run_python_case(path, instance=instance)
+
+def _python_instance_keys(suite):
+    """遍历测试套件，生成每个测试的实例键"""
+    from framework.base_test import _ParametrizedSuite
+
+    for test in suite:
+        if isinstance(test, _ParametrizedSuite):
+            prefix = f"{test.test_class.__name__}.{test.method_name}"
+            for index, _ in enumerate(test.source):
+                yield f"{prefix}:{index}"
+        elif isinstance(test, unittest.TestSuite):
+            yield from _python_instance_keys(test)
+        else:
+            yield f"{type(test).__name__}.{test._testMethodName}"
+
+def expand_cases(cases):
+    """将参数化用例展开为逐个实例的用例引用，按需生成，未参数化的用例保持文件路径"""
+    from framework.base_test import _ParametrizedSuite
+
+    for case in cases:
+        path = resolve_case_path(case)
+        expanded = False
+        try:
+            if path.suffix in ('.yaml', '.yml'):
+                with open(path, 'r', encoding='utf-8') as f:
+                    source = ParamSource.from_case(yaml.safe_load(f)['test_case'], path.parent)
+                if source is None:
+                    yield case
+                    continue
+                keys = (str(index) for index, _ in enumerate(source))
+            else:
+                suite = load_python_suite(path)
+                if not any(isinstance(t, _ParametrizedSuite) for s in suite for t in s):
+                    yield case
+                    continue
+                keys = _python_instance_keys(suite)
+            for key in keys:
+                expanded = True
+                yield case_ref(case, key)
+        except Exception as e:
+            logger.error(f"✗ 参数化用例展开失败: {case}, {e}")
+            if not expanded:
+                # 按整个文件分发，由执行端报告错误
+                yield case
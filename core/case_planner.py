@@ -0,0 +1,204 @@
+"""
+用例规划 - 执行前静态扫描选中用例引用的服务器、数据库和API，并行预建连接，在任何用例开始前报告不可达的目标
+
+YAML用例扫描步骤参数，unittest用例用ast扫描 call_aw 调用中的字面量参数；参数值(含逗号分隔和列表元素)
+与配置中的服务器名、数据库名匹配，未传的参数取AW的默认值。引用 apis 配置的AW和URL参数计入API目标。
+含 ${变量} 的参数在执行时才能确定，不参与规划
+"""
+import ast
+import socket
+import inspect
+import textwrap
+from functools import lru_cache
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+import yaml
+from utils.logger import get_logger
+from utils.config_manager import config_manager
+from utils.connection_pool import connection_pool
+from utils.circuit_breaker import breakers
+from utils.parametrize import split_case_ref
+from core.case_executor import resolve_case_path
+from framework.call_plan import find_aw_calls
+
+logger = get_logger()
+
+DEFAULT_MAX_WORKERS = 32
+API_CONNECT_TIMEOUT = 5
+
+class _ActionCollector:
+    """收集YAML用例可用的AW，与TestRunner.register_action接口一致"""
+
+    def __init__(self):
+        self.actions = {}
+
+    def register_action(self, name, func, timeout=None):
+        self.actions[name] = func
+
+def _yaml_actions():
+    from actions.basic_actions import register_basic_actions
+    collector = _ActionCollector()
+    register_basic_actions(collector)
+    return collector.actions
+
+def _python_actions():
+    from framework.aw_manager import aw_manager
+    return {name: aw_manager.get_plan(name).func for name in aw_manager.get_aw_list()}
+
+@lru_cache(maxsize=None)
+def _defaults(func):
+    try:
+        return {name: p.default for name, p in inspect.signature(func).parameters.items()
+                if p.default is not inspect.Parameter.empty}
+    except (TypeError, ValueError):
+        return {}
+
+@lru_cache(maxsize=None)
+def _uses_api_config(func):
+    """AW源码中是否读取 apis 配置(如 apis.base_url)"""
+    try:
+        tree = ast.parse(textwrap.dedent(inspect.getsource(func)))
+    except (OSError, TypeError, SyntaxError):
+        return False
+    return any(isinstance(node, ast.Constant) and node.value == 'apis' for node in ast.walk(tree))
+
+def _api_target(url):
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        return None
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+class CasePlan:
+    """选中用例引用的连接目标: {类型: {名称: 引用该目标的用例集合}}，类型为 ssh/db/api"""
+
+    def __init__(self):
+        self.targets = {'ssh': {}, 'db': {}, 'api': {}}
+        self.errors = []
+
+    def add(self, kind, name, case):
+        self.targets[kind].setdefault(name, set()).add(case)
+
+    def names(self, kind):
+        return sorted(self.targets[kind])
+
+    def __len__(self):
+        return sum(len(names) for names in self.targets.values())
+
+class CasePlanner:
+    """静态扫描用例，得到需要预建的连接"""
+
+    def __init__(self):
+        config = config_manager.load_config()
+        self.servers = set(config.get('servers') or {})
+        self.databases = set(config.get('databases') or {})
+        self.api_base = _api_target((config.get('apis') or {}).get('base_url') or '')
+        self._yaml_actions = None
+        self._python_actions = None
+
+    def _values(self, value):
+        """展开参数值中可能的名称: 字符串(含逗号分隔)、列表和字典的值"""
+        if isinstance(value, str):
+            if '${' in value:
+                return
+            yield value.strip()
+            if ',' in value:
+                yield from (part.strip() for part in value.split(','))
+        elif isinstance(value, (list, tuple, set)):
+            for item in value:
+                yield from self._values(item)
+        elif isinstance(value, dict):
+            for item in value.values():
+                yield from self._values(item)
+
+    def add_step(self, plan, case, func, params):
+        """按AW默认参数和步骤参数登记连接目标"""
+        values = dict(_defaults(func)) if func is not None else {}
+        values.update(params or {})
+        for value in self._values(list(values.values())):
+            if value in self.servers:
+                plan.add('ssh', value, case)
+            if value in self.databases:
+                plan.add('db', value, case)
+            target = _api_target(value)
+            if target:
+                plan.add('api', target, case)
+        if func is not None and self.api_base and _uses_api_config(func):
+            plan.add('api', self.api_base, case)
+
+    def scan_yaml(self, plan, case, path):
+        if self._yaml_actions is None:
+            self._yaml_actions = _yaml_actions()
+        with open(path, 'r', encoding='utf-8') as f:
+            test_case = (yaml.safe_load(f) or {}).get('test_case') or {}
+        for step in test_case.get('steps') or []:
+            if isinstance(step, dict):
+                self.add_step(plan, case, self._yaml_actions.get(step.get('action')), step.get('params'))
+
+    def scan_python(self, plan, case, path):
+        if self._python_actions is None:
+            self._python_actions = _python_actions()
+        tree = ast.parse(path.read_text(encoding='utf-8'), filename=str(path))
+        for _, name, params, _ in find_aw_calls(tree):
+            self.add_step(plan, case, self._python_actions.get(name), params)
+
+    def plan(self, cases):
+        """扫描用例文件，返回CasePlan，无法解析的用例记录到errors"""
+        plan = CasePlan()
+        for case in dict.fromkeys(split_case_ref(c)[0] for c in cases):
+            path = resolve_case_path(case)
+            try:
+                if path.suffix in ('.yaml', '.yml'):
+                    self.scan_yaml(plan, case, path)
+                else:
+                    self.scan_python(plan, case, path)
+            except Exception as e:
+                plan.errors.append(f"{case}: {e}")
+        return plan
+
+def check_api(target, timeout=API_CONNECT_TIMEOUT):
+    """检查API地址的TCP端口是否可连接"""
+    parsed = urlparse(target)
+    port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+    with breakers.guard('api', parsed.netloc, failures=(OSError,)):
+        socket.create_connection((parsed.hostname, port), timeout=timeout).close()
+
+def prewarm(plan, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    并行建立计划中的SSH/数据库连接并检查API端口
+
+    Returns:
+        list: 不可达的目标 [{'kind', 'name', 'error', 'cases'}]
+    """
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # API检查与连接池预热同时进行
+        api_checks = {name: executor.submit(check_api, name) for name in plan.names('api')}
+        results.update(connection_pool.prewarm(plan.names('ssh'), plan.names('db'), max_workers))
+        for name, future in api_checks.items():
+            try:
+                future.result()
+                results[('api', name)] = None
+            except Exception as e:
+                results[('api', name)] = str(e) or type(e).__name__
+    return [{'kind': kind, 'name': name, 'error': error, 'cases': sorted(plan.targets[kind][name])}
+            for (kind, name), error in results.items() if error is not None]
+
+def prewarm_cases(cases, max_workers=None):
+    """规划并预热选中用例的连接，返回不可达的目标列表"""
+    settings = config_manager.load_config().get('prewarm') or {}
+    max_workers = max_workers or settings.get('max_workers', DEFAULT_MAX_WORKERS)
+    plan = CasePlanner().plan(cases)
+    for error in plan.errors:
+        logger.warning(f"用例规划失败: {error}")
+    if not len(plan):
+        return []
+
+    logger.info(f"预建连接: SSH {len(plan.targets['ssh'])} 个, 数据库 {len(plan.targets['db'])} 个, "
+                f"API {len(plan.targets['api'])} 个")
+    unreachable = prewarm(plan, max_workers)
+    for target in unreachable:
+        cases_text = ', '.join(target['cases'][:5]) + (' ...' if len(target['cases']) > 5 else '')
+        logger.error(f"✗ 不可达: {target['kind']} {target['name']}, {target['error']} (影响用例: {cases_text})")
+    if not unreachable:
+        logger.info(f"✓ {len(plan)} 个目标均已就绪")
+    return unreachable
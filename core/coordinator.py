@@ -0,0 +1,320 @@
+"""
+分布式执行协调器 - 向各执行节点(Agent)分发用例、管理租约并汇总结果
+"""
+import json
+import time
+import logging
+import uuid
+import threading
+import socketserver
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from utils.logger import get_logger
+from core.protocol import MessageChannel, DEFAULT_PORT, DEFAULT_HOST, auth_token, check_token, is_loopback
+from utils.change_tracker import change_tracker
+from utils.result_store import result_sink
+
+logger = get_logger()
+
+REPORT_DIR = Path(__file__).parent.parent / "reports"
+
+class _AgentHandler(socketserver.BaseRequestHandler):
+    """每个Agent连接一个处理线程"""
+
+    def handle(self):
+        self.server.coordinator.serve_agent(self.request, self.client_address)
+
+class _CoordinatorServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class Coordinator:
+    """
+    分布式执行协调器
+
+    Agent主动拉取用例，每个分配出去的用例带有租约，Agent执行期间定期心跳续约。
+    Agent断开或租约超时后，用例重新放回队列分配给其他Agent。
+    默认只监听本机地址；监听其他地址时必须设置令牌(token，默认读取 NETAUTOTEST_COORDINATOR_TOKEN 或 distributed.token)，
+    Agent注册时提交相同的令牌
+    """
+
+    def __init__(self, cases, host=DEFAULT_HOST, port=DEFAULT_PORT, lease_timeout=60, max_attempts=2,
+                 report_file=None, run_id=None, token=None):
+        self.host = host
+        self.token = token if token is not None else auth_token()
+        if self.token is None and not is_loopback(host):
+            raise ValueError(f"协调器监听 {host} 时必须设置令牌: 环境变量 NETAUTOTEST_COORDINATOR_TOKEN 或 distributed.token")
+        self.run_id = run_id
+        self.port = port
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+
+        # 用例按需从迭代器中取出，支持惰性生成的大规模用例集
+        self._cases = iter(cases)
+        self._exhausted = False
+        self._retry = deque()
+        self._attempts = {}
+
+        self.leases = {}    # lease_id -> 租约信息
+        self.agents = {}    # agent_id -> Agent信息
+        self.results = []
+        self._logs = {}     # lease_id -> 执行期间收到的日志
+        self._events = {}   # lease_id -> 执行期间收到的结果事件，用例完成时写入结果存储
+
+        self._cond = threading.Condition()
+        self._server = None
+        self._reaper = None
+        self._stopped = threading.Event()
+
+        if report_file is None:
+            REPORT_DIR.mkdir(exist_ok=True)
+            report_file = REPORT_DIR / f"distributed_{datetime.now():%Y%m%d_%H%M%S}.jsonl"
+        self.report_file = Path(report_file)
+        self._report = None
+
+    # ==================== 生命周期 ====================
+
+    def start(self):
+        """启动监听和租约检查线程"""
+        self._report = open(self.report_file, 'a', encoding='utf-8')
+        self._server = _CoordinatorServer((self.host, self.port), _AgentHandler)
+        self._server.coordinator = self
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self._reaper = threading.Thread(target=self._reap_leases, daemon=True)
+        self._reaper.start()
+        logger.info(f"协调器已启动: {self.host}:{self.port}, 租约超时 {self.lease_timeout}秒")
+
+    def wait(self, timeout=None):
+        """等待所有用例执行完成，返回是否全部成功"""
+        deadline = time.monotonic() + timeout if timeout else None
+        with self._cond:
+            while not self._finished():
+                if deadline and time.monotonic() >= deadline:
+                    logger.error("✗ 等待分布式执行超时")
+                    break
+                self._cond.wait(timeout=1)
+
+            # 给Agent留出时间拉取shutdown消息后断开
+            grace = time.monotonic() + 5
+            while any(a['connected'] for a in self.agents.values()) and time.monotonic() < grace:
+                self._cond.wait(timeout=0.5)
+
+        return self._finished() and all(r['success'] for r in self.results)
+
+    def stop(self):
+        """停止协调器并写入汇总"""
+        self._stopped.set()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+        if self._report:
+            self._write_report({'type': 'summary', **self.summary()})
+            self._report.close()
+            self._report = None
+        logger.info(f"分布式执行报告: {self.report_file}")
+
+    def summary(self):
+        """执行结果汇总"""
+        with self._cond:
+            passed = sum(1 for r in self.results if r['success'])
+            return {
+                'total': len(self.results),
+                'passed': passed,
+                'failed': len(self.results) - passed,
+                'agents': {
+                    agent_id: {'host': a['host'], 'completed': a['completed'], 'connected': a['connected']}
+                    for agent_id, a in self.agents.items()
+                },
+            }
+
+    # ==================== Agent会话 ====================
+
+    def serve_agent(self, sock, address):
+        """处理单个Agent连接上的消息"""
+        channel = MessageChannel(sock)
+        agent_id = None
+        try:
+            while not self._stopped.is_set():
+                msg = channel.receive()
+                if msg is None:
+                    break
+                msg_type = msg.get('type')
+
+                if msg_type == 'register':
+                    if not check_token(self.token, msg.get('token')):
+                        logger.warning(f"拒绝Agent注册: {address[0]} 令牌无效")
+                        channel.send('error', message="令牌无效")
+                        break
+                    agent_id = msg.get('agent_id') or f"{address[0]}:{address[1]}"
+                    with self._cond:
+                        self.agents[agent_id] = {
+                            'host': msg.get('host', address[0]),
+                            'completed': 0,
+                            'connected': True,
+                        }
+                    logger.info(f"Agent注册: {agent_id} ({address[0]})")
+                    channel.send('registered', lease_timeout=self.lease_timeout,
+                                 heartbeat_interval=max(1, self.lease_timeout / 3), run_id=self.run_id)
+                elif agent_id is None:
+                    channel.send('error', message="未注册")
+                    break
+                elif msg_type == 'request':
+                    reply_type, fields = self._assign(agent_id)
+                    channel.send(reply_type, **fields)
+                elif msg_type == 'heartbeat':
+                    self._renew(agent_id)
+                elif msg_type == 'log':
+                    self._on_log(agent_id, msg)
+                elif msg_type == 'event':
+                    self._on_event(agent_id, msg)
+                elif msg_type == 'result':
+                    self._on_result(agent_id, msg)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Agent连接异常: {agent_id or address}, {e}")
+        finally:
+            channel.close()
+            if agent_id:
+                self._agent_lost(agent_id)
+
+    def _finished(self):
+        return self._exhausted and not self._retry and not self.leases
+
+    def _next_case(self):
+        if self._retry:
+            return self._retry.popleft()
+        if not self._exhausted:
+            case = next(self._cases, None)
+            if case is not None:
+                return case
+            self._exhausted = True
+        return None
+
+    def _assign(self, agent_id):
+        """为Agent分配下一个用例"""
+        with self._cond:
+            case = self._next_case()
+            if case is None:
+                if self._finished():
+                    return 'shutdown', {}
+                return 'wait', {'retry': 1}
+
+            attempt = self._attempts.get(case, 0) + 1
+            self._attempts[case] = attempt
+            lease_id = uuid.uuid4().hex
+            self.leases[lease_id] = {
+                'case': case,
+                'agent': agent_id,
+                'attempt': attempt,
+                'expires': time.monotonic() + self.lease_timeout,
+            }
+            self._logs[lease_id] = []
+            self._events[lease_id] = []
+
+        logger.info(f"分配用例: {case} -> {agent_id} (第{attempt}次)")
+        return 'assign', {'case': case, 'lease_id': lease_id}
+
+    def _renew(self, agent_id):
+        with self._cond:
+            expires = time.monotonic() + self.lease_timeout
+            for lease in self.leases.values():
+                if lease['agent'] == agent_id:
+                    lease['expires'] = expires
+
+    def _on_log(self, agent_id, msg):
+        lease_id = msg.get('lease_id')
+        record = {
+            'time': msg.get('time'),
+            'level': msg.get('level', 'INFO'),
+            'message': msg.get('message', ''),
+        }
+        with self._cond:
+            if lease_id not in self.leases:
+                return
+            self._logs[lease_id].append(record)
+        level = logging.getLevelName(record['level'])
+        logger.log(level if isinstance(level, int) else logging.INFO, f"[{agent_id}] {record['message']}")
+
+    def _on_event(self, agent_id, msg):
+        """Agent回传的用例/步骤结果事件，按租约暂存，租约被回收重新分配时丢弃"""
+        lease_id = msg.get('lease_id')
+        with self._cond:
+            lease = self.leases.get(lease_id)
+            if lease is None or lease['agent'] != agent_id:
+                return
+            self._events[lease_id].append(msg['event'])
+
+    def _on_result(self, agent_id, msg):
+        lease_id = msg.get('lease_id')
+        with self._cond:
+            lease = self.leases.get(lease_id)
+            if lease is None or lease['agent'] != agent_id:
+                logger.warning(f"忽略过期租约的结果: {msg.get('case')} <- {agent_id}")
+                return
+            del self.leases[lease_id]
+            self.agents[agent_id]['completed'] += 1
+            for event in self._events.pop(lease_id, []):
+                result_sink.emit(event)
+            change_tracker.update(lease['case'], msg.get('trace'))
+            self._record_result(lease, msg.get('success', False), msg.get('duration'),
+                                msg.get('error'), self._logs.pop(lease_id, []))
+            self._cond.notify_all()
+
+    def _record_result(self, lease, success, duration=None, error=None, logs=None):
+        """记录用例结果，调用方需持有锁"""
+        result = {
+            'type': 'result',
+            'case': lease['case'],
+            'success': bool(success),
+            'agent': lease['agent'],
+            'attempt': lease['attempt'],
+            'duration': duration,
+            'error': error,
+            'logs': logs or [],
+        }
+        self.results.append(result)
+        self._write_report(result)
+        status = "✓" if result['success'] else "✗"
+        logger.info(f"{status} 用例完成: {lease['case']} ({lease['agent']})")
+
+    def _write_report(self, record):
+        if self._report:
+            self._report.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+            self._report.flush()
+
+    def _release(self, lease_id, reason):
+        """回收租约，未超过最大尝试次数的用例重新排队，调用方需持有锁"""
+        lease = self.leases.pop(lease_id)
+        logs = self._logs.pop(lease_id, [])
+        # 未完成的执行产生的部分步骤事件不写入结果，避免与重试的事件混在一起
+        self._events.pop(lease_id, None)
+        if lease['attempt'] >= self.max_attempts:
+            logger.error(f"✗ 用例 {lease['case']} {reason}, 已达最大尝试次数")
+            self._record_result(lease, False, error=reason, logs=logs)
+            result_sink.emit({'event': 'case_start', 'case_uid': lease_id, 'case_id': lease['case'],
+                              'name': '', 'file': lease['case'], 'time': time.time()})
+            result_sink.emit({'event': 'case_end', 'case_uid': lease_id, 'status': 'error',
+                              'duration': None, 'error': reason})
+        else:
+            logger.warning(f"用例 {lease['case']} {reason}, 重新分配")
+            self._retry.append(lease['case'])
+        self._cond.notify_all()
+
+    def _agent_lost(self, agent_id):
+        """Agent断开，回收其持有的所有租约"""
+        with self._cond:
+            if agent_id in self.agents:
+                self.agents[agent_id]['connected'] = False
+            for lease_id in [lid for lid, lease in self.leases.items() if lease['agent'] == agent_id]:
+                self._release(lease_id, f"所在Agent {agent_id} 已断开")
+            self._cond.notify_all()
+        logger.info(f"Agent断开: {agent_id}")
+
+    def _reap_leases(self):
+        """定期回收超时未续约的租约"""
+        while not self._stopped.wait(1):
+            now = time.monotonic()
+            with self._cond:
+                for lease_id in [lid for lid, lease in self.leases.items() if lease['expires'] < now]:
+                    self._release(lease_id, f"租约超时(Agent {self.leases[lease_id]['agent']})")
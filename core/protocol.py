@@ -0,0 +1,78 @@
+"""
+分布式执行通信协议 - 基于TCP的换行分隔JSON消息
+"""
+import os
+import json
+import hmac
+import ipaddress
+import threading
+
+DEFAULT_PORT = 9900
+DEFAULT_HOST = '127.0.0.1'
+TOKEN_ENV = "NETAUTOTEST_COORDINATOR_TOKEN"
+
+def auth_token():
+    """协调器与Agent共享的认证令牌，环境变量优先于配置 distributed.token，未设置返回None"""
+    token = os.environ.get(TOKEN_ENV)
+    if token is None:
+        from utils.config_manager import config_manager
+        token = (config_manager.get_config('distributed') or {}).get('token')
+    return str(token) if token else None
+
+def check_token(expected, received):
+    """校验Agent提交的令牌，协调器未设置令牌时不校验"""
+    if expected is None:
+        return True
+    return isinstance(received, str) and hmac.compare_digest(expected.encode('utf-8'), received.encode('utf-8'))
+
+def is_loopback(host):
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+class MessageChannel:
+    """消息通道，封装socket上的JSON消息收发，发送线程安全"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self._reader = sock.makefile('rb')
+        self._writer = sock.makefile('wb')
+        self._lock = threading.Lock()
+
+    def send(self, msg_type, **fields):
+        """发送一条消息"""
+        fields['type'] = msg_type
+        data = json.dumps(fields, ensure_ascii=False, default=str).encode('utf-8') + b'\n'
+        with self._lock:
+            self._writer.write(data)
+            self._writer.flush()
+
+    def receive(self):
+        """接收一条消息，连接关闭时返回None"""
+        line = self._reader.readline()
+        if not line:
+            return None
+        return json.loads(line.decode('utf-8'))
+
+    def close(self):
+        """关闭通道"""
+        for f in (self._reader, self._writer):
+            try:
+                f.close()
+            except Exception:
+                pass
+        try:
+            self.sock.close()
+        except Exception:
+            pass
+
+def parse_address(address, default_host=DEFAULT_HOST):
+    """解析 HOST:PORT / PORT 格式的地址"""
+    address = str(address)
+    if ':' in address:
+        host, port = address.rsplit(':', 1)
+        return host or default_host, int(port)
+    return default_host, int(address)
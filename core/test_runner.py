@@ -3,9 +3,17 @@
 """
 import yaml
 import re
+import time
 import atexit
+from pathlib import Path
 from utils.logger import get_logger
 from utils.connection_pool import connection_pool
+from utils.change_tracker import change_tracker
+from utils.result_store import result_sink, step_status
+from utils.parametrize import ParamSource
+from utils.watchdog import watchdog, StepTimeoutError
+from utils.artifact_store import artifact_store, Artifact
+from framework.call_plan import CallPlan, AWParamError
 
 logger = get_logger()
 
@@ -13,6 +21,9 @@ class TestRunner:
     def __init__(self):
         self.context = {}  # 存储变量
         self.actions = {}  # 存储所有AW
+        self.plans = {}  # AW调用计划，注册时解析签名
+        self._sources = {}  # 参数化用例的参数来源缓存，保留数据文件的读取位置
+        self._compiled = {}  # 预编译的用例步骤缓存 {(路径, 修改时间): (步骤参数, 错误)}
         # 注册退出时清理连接
         atexit.register(self.cleanup)
     
@@ -20,9 +31,11 @@ class TestRunner:
         """清理资源"""
         connection_pool.close_all()
     
-    def register_action(self, name, func):
-        """注册AW"""
+    def register_action(self, name, func, timeout=None):
+        """注册AW，timeout为该AW的执行时限(秒)"""
         self.actions[name] = func
+        self.plans[name] = CallPlan(name, func, timeout)
+        self._compiled.clear()
         logger.debug(f"注册AW: {name}")
     
     def replace_variables(self, value):
@@ -32,47 +45,146 @@ class TestRunner:
             matches = re.findall(pattern, value)
             for var in matches:
                 if var in self.context:
-                    value = value.replace(f'${{{var}}}', str(self.context[var]))
+                    resolved = self.context[var]
+                    if isinstance(resolved, Artifact):
+                        # 大输出只在被引用时从产物存储读取
+                        resolved = resolved.load()
+                    value = value.replace(f'${{{var}}}', str(resolved))
         elif isinstance(value, dict):
             return {k: self.replace_variables(v) for k, v in value.items()}
         elif isinstance(value, list):
             return [self.replace_variables(item) for item in value]
         return value
     
-    def execute_step(self, step):
-        """执行单个步骤"""
+    def compile_steps(self, steps):
+        """预编译用例步骤，检查AW是否存在、参数名和静态参数类型
+        
+        Returns:
+            (每个步骤的预编译参数, 错误信息列表)
+        """
+        compiled, errors = [], []
+        for idx, step in enumerate(steps, 1):
+            action_name = step.get('action')
+            bound = None
+            if action_name not in self.plans:
+                errors.append(f"步骤{idx}: 未找到AW: {action_name}")
+            else:
+                try:
+                    bound = self.plans[action_name].compile(step.get('params'))
+                except AWParamError as e:
+                    errors.append(f"步骤{idx}: {e}")
+            compiled.append(bound)
+        return compiled, errors
+    
+    def get_compiled_steps(self, case_file, steps):
+        """用例步骤的预编译结果，用例文件未修改时复用"""
+        path = Path(case_file).resolve()
+        key = (path, path.stat().st_mtime_ns)
+        if key not in self._compiled:
+            self._compiled = {k: v for k, v in self._compiled.items() if k[0] != path}
+            self._compiled[key] = self.compile_steps(steps)
+        return self._compiled[key]
+    
+    def execute_step(self, step, bound=None):
+        """执行单个步骤，bound为预编译的步骤参数，步骤的timeout优先于AW注册时指定的时限"""
         action_name = step.get('action')
         params = step.get('params', {})
         
         if action_name not in self.actions:
             logger.error(f"✗ 未找到AW: {action_name}")
+            result_sink.record_step(action_name, params, 'error', error="未找到AW")
             return None
         
-        # 替换参数中的变量
-        params = self.replace_variables(params)
+        # 替换参数中的变量，并按AW参数类型转换
+        try:
+            if bound is None:
+                bound = self.plans[action_name].compile(params)
+            params = bound.bind(self.replace_variables)
+        except AWParamError as e:
+            logger.error(f"✗ 参数错误: {e}")
+            result_sink.record_step(action_name, params, 'error', error=str(e))
+            return None
         
         logger.info(f"执行: {action_name}")
+        func = self.actions[action_name]
+        change_tracker.record_aw(action_name, func)
+        start = time.time()
         try:
-            func = self.actions[action_name]
-            result = func(**params)
+            timeout = step.get('timeout')
+            if timeout is None:
+                timeout = self.plans[action_name].timeout
+            result = watchdog.call(action_name, func, params, timeout)
+            # 记录结果时超过阈值的输出保存到产物存储，上下文中只保留句柄；
+            # 未记录结果(直接执行用例文件)时不写产物，上下文保留完整输出
+            if result_sink.recording:
+                result = artifact_store.maybe_store(result)
             self.context['last_result'] = result
+            result_sink.record_step(action_name, params, step_status(result), start, time.time() - start, result)
             return result
+        except StepTimeoutError as e:
+            logger.error(f"✗ 执行超时: {action_name}, {e}")
+            result_sink.record_step(action_name, params, 'timeout', start, time.time() - start, error=str(e))
+            return None
         except Exception as e:
             logger.error(f"✗ 执行失败: {action_name}, 错误: {e}")
+            result_sink.record_step(action_name, params, 'error', start, time.time() - start, error=str(e))
             return None
     
-    def run_case(self, case_file):
-        """运行测试用例"""
+    def load_case(self, case_file):
+        """加载YAML用例，返回test_case部分"""
+        with open(case_file, 'r', encoding='utf-8') as f:
+            case_data = yaml.safe_load(f)
+        return case_data['test_case']
+    
+    def get_param_source(self, case_file, test_case):
+        """参数化用例的参数来源，用例文件未修改时复用"""
+        path = Path(case_file).resolve()
+        key = (path, path.stat().st_mtime_ns)
+        if key not in self._sources:
+            self._sources = {k: v for k, v in self._sources.items() if k[0] != path}
+            self._sources[key] = ParamSource.from_case(test_case, path.parent)
+        return self._sources[key]
+    
+    def run_case(self, case_file, instance=None):
+        """运行测试用例，参数化用例逐个实例执行，指定instance时只执行该序号的实例"""
         try:
-            with open(case_file, 'r', encoding='utf-8') as f:
-                case_data = yaml.safe_load(f)
+            test_case = self.load_case(case_file)
+            source = self.get_param_source(case_file, test_case)
         except Exception as e:
             logger.error(f"✗ 用例文件加载失败: {e}")
             return False
         
-        test_case = case_data['test_case']
+        if source is None:
+            return self._run_instance(case_file, test_case)
+        
+        # 每个实例以相同的初始上下文加上本实例的参数开始执行
+        base_context = dict(self.context)
+        if instance is not None:
+            index = int(instance)
+            try:
+                params = source.get(index)
+            except (IndexError, ValueError, OSError) as e:
+                logger.error(f"✗ 参数化实例加载失败: {e}")
+                return False
+            self.context = {**base_context, **params}
+            return self._run_instance(case_file, test_case, source, source.instance_id(index, params))
+        
+        success = True
+        try:
+            for index, instance_id, params in source.instances():
+                self.context = {**base_context, **params}
+                success = self._run_instance(case_file, test_case, source, instance_id) and success
+        except (ValueError, OSError) as e:
+            logger.error(f"✗ 参数化数据读取失败: {e}")
+            return False
+        return success
+    
+    def _run_instance(self, case_file, test_case, source=None, instance_id=None):
+        """执行用例的一个实例，参数化实例的参数已写入上下文，步骤中以 ${参数名} 引用"""
         case_name = test_case.get('name', 'Unknown')
         case_id = test_case.get('id', 'Unknown')
+        if instance_id is not None:
+            case_id = f"{case_id}[{instance_id}]"
         
         logger.info("=" * 60)
         logger.info(f"开始执行用例: [{case_id}] {case_name}")
@@ -85,11 +197,38 @@ class TestRunner:
             logger.warning("⚠ 用例中没有定义测试步骤")
             return False
         
-        for idx, step in enumerate(steps, 1):
+        # 执行任何步骤前校验全部步骤，参数错误的用例不会在执行到一半时才失败
+        compiled, errors = self.get_compiled_steps(case_file, steps)
+        
+        change_tracker.begin_case(case_file)
+        for data_file in (source.files if source else []):
+            change_tracker.record_file(data_file)
+        result_sink.begin_case(case_id, case_name, str(case_file))
+        watchdog.begin_case(test_case.get('timeout'))
+        if errors:
+            for error in errors:
+                logger.error(f"✗ 用例校验失败: {error}")
+            watchdog.end_case()
+            change_tracker.end_case(False)
+            result_sink.end_case('error', '; '.join(errors))
+            return False
+        
+        expired = False
+        for idx, (step, bound) in enumerate(zip(steps, compiled), 1):
+            if watchdog.expired():
+                # 用例或运行时限已到，剩余步骤不再执行
+                logger.error(f"✗ 用例时限已到，跳过剩余 {len(steps) - idx + 1} 个步骤")
+                failed_count += len(steps) - idx + 1
+                expired = True
+                break
             logger.info(f"步骤 {idx}/{len(steps)}")
-            result = self.execute_step(step)
+            result = self.execute_step(step, bound)
             if result is None or result is False:
                 failed_count += 1
+        timed_out = watchdog.end_case() or expired
+        change_tracker.end_case(failed_count == 0)
+        status = 'passed' if failed_count == 0 else 'timeout' if timed_out else 'failed'
+        result_sink.end_case(status, f"{failed_count}/{len(steps)} 个步骤失败" if failed_count else None)
         
         logger.info("=" * 60)
         if failed_count == 0:
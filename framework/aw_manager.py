@@ -1,39 +1,108 @@
 """
 AW管理器 - 负责AW的注册、管理和调用
 """
+import ast
+import time
 import inspect
+import textwrap
+from functools import lru_cache
 from typing import Dict, Callable, Any
 from utils.logger import get_logger
+from framework.call_plan import CallPlan, AWParamError, find_aw_calls
+from utils.change_tracker import change_tracker
+from utils.result_store import result_sink, step_status, summarize_value, MAX_PARAMS_LENGTH
+from utils.artifact_store import artifact_store
+from utils.watchdog import watchdog, StepTimeoutError
 
 logger = get_logger(__name__)
 
+@lru_cache(maxsize=None)
+def _literal_aw_calls(func):
+    """函数源码中字面量 call_aw 调用: [(文件, 行号, AW名称, 字面量参数, 参数名)]，取不到源码时为空"""
+    try:
+        lines, first = inspect.getsourcelines(func)
+        tree = ast.parse(textwrap.dedent(''.join(lines)))
+        filename = inspect.getsourcefile(func)
+    except (OSError, TypeError, SyntaxError):
+        return []
+    return [(filename, first + node.lineno - 1, name, params, names)
+            for node, name, params, names in find_aw_calls(tree)]
+
 class AWManager:
     """AW管理器"""
     
     def __init__(self):
         self._aws: Dict[str, Callable] = {}
         self._aw_docs: Dict[str, str] = {}
+        self._plans: Dict[str, CallPlan] = {}
     
-    def register_aw(self, name: str, func: Callable, doc: str = None):
-        """注册AW"""
+    def register_aw(self, name: str, func: Callable, doc: str = None, timeout: float = None):
+        """注册AW，同时解析签名生成调用计划，timeout为该AW的执行时限(秒)"""
         self._aws[name] = func
         self._aw_docs[name] = doc or func.__doc__ or "无描述"
+        self._plans[name] = CallPlan(name, func, timeout)
         logger.info(f"注册AW: {name}")
     
     def call_aw(self, name: str, **kwargs) -> Any:
-        """调用AW"""
+        """调用AW，返回AW的完整输出；只有记录结果时大输出才保存为产物，调用方持有的输出不受影响"""
         if name not in self._aws:
             raise ValueError(f"AW '{name}' 未注册")
         
-        logger.info(f"调用AW: {name}, 参数: {kwargs}")
+        # 参数名和类型在调用前校验，字符串参数按类型注解转换
         try:
-            result = self._aws[name](**kwargs)
+            kwargs = self._plans[name].bind(kwargs)
+        except AWParamError as e:
+            logger.error(f"AW参数错误: {e}")
+            result_sink.record_step(name, kwargs, 'error', error=str(e))
+            raise
+        
+        logger.info(f"调用AW: {name}, 参数: {summarize_value(kwargs, MAX_PARAMS_LENGTH)}")
+        change_tracker.record_aw(name, self._aws[name])
+        start = time.time()
+        try:
+            result = watchdog.call(name, self._aws[name], kwargs, self._plans[name].timeout)
             logger.info(f"AW执行成功: {name}")
+            # 用例代码拿到完整结果，结果记录中的大输出保存为产物句柄；未记录结果时不写产物
+            recorded = artifact_store.maybe_store(result) if result_sink.recording else result
+            result_sink.record_step(name, kwargs, step_status(result), start, time.time() - start, recorded)
             return result
+        except StepTimeoutError as e:
+            logger.error(f"AW执行超时: {name}, {e}")
+            result_sink.record_step(name, kwargs, 'timeout', start, time.time() - start, error=str(e))
+            raise
         except Exception as e:
             logger.error(f"AW执行失败: {name}, 错误: {str(e)}")
+            result_sink.record_step(name, kwargs, 'error', start, time.time() - start, error=str(e))
             raise
     
+    def get_plan(self, name: str) -> CallPlan:
+        """获取AW的调用计划，未注册时返回None"""
+        return self._plans.get(name)
+    
+    def check_call(self, name: str, **kwargs):
+        """不执行AW，只校验参数，不通过时抛出AWParamError"""
+        if name not in self._plans:
+            raise AWParamError(f"AW '{name}' 未注册")
+        self._plans[name].compile(kwargs)
+    
+    def check_source(self, func: Callable):
+        """
+        不执行，静态校验函数中AW名称为字面量的 call_aw 调用，不通过时抛出AWParamError
+        
+        检查AW是否注册、参数名和字面量参数的类型；变量参数只检查参数名，含 **kwargs 的调用不检查参数名
+        """
+        for filename, lineno, name, params, names in _literal_aw_calls(inspect.unwrap(func)):
+            try:
+                if name not in self._plans:
+                    raise AWParamError(f"AW '{name}' 未注册")
+                plan = self._plans[name]
+                if names is not None:
+                    plan.check_names(names)
+                for key, value in params.items():
+                    plan.coerce(key, value)
+            except AWParamError as e:
+                raise AWParamError(f"{e} ({filename}:{lineno})") from None
+    
     def get_aw_list(self) -> Dict[str, str]:
         """获取所有AW列表"""
         return self._aw_docs.copy()
@@ -45,9 +114,9 @@ class AWManager:
 # 全局AW管理器实例
 aw_manager = AWManager()
 
-def aw_register(name: str, doc: str = None):
-    """AW注册装饰器"""
+def aw_register(name: str, doc: str = None, timeout: float = None):
+    """AW注册装饰器，timeout为该AW的执行时限(秒)，未指定时使用配置 timeouts.step"""
     def decorator(func):
-        aw_manager.register_aw(name, func, doc)
+        aw_manager.register_aw(name, func, doc, timeout)
         return func
     return decorator
\ No newline at end of file
@@ -3,9 +3,84 @@
 """
 import unittest
 import time
+import inspect
+import functools
 from datetime import datetime
+from pathlib import Path
 from framework.aw_manager import aw_manager
+from framework.call_plan import AWParamError
 from utils.logger import get_logger
+from utils.change_tracker import change_tracker, relative_path
+from utils.result_store import result_sink
+from utils.parametrize import ParamSource
+from utils.watchdog import watchdog
+from utils.config_manager import config_manager
+
+def parametrize(matrix=None, dataset=None, instance_id=None):
+    """
+    用例参数化装饰器，测试方法按参数逐个实例执行，参数以关键字参数传入
+    
+    Args:
+        matrix: {参数名: 取值列表}，按笛卡尔积组合
+        dataset: 字典列表，或CSV/JSONL文件路径(相对用例文件所在目录)
+        instance_id: 实例ID模板，如 "{prefix}"
+    
+    示例:
+        @parametrize(dataset="data/routes.csv")
+        def test_route(self, prefix, nexthop):
+            ...
+    """
+    def decorator(func):
+        source = ParamSource(matrix, dataset, instance_id, Path(inspect.getsourcefile(func)).parent)
+        
+        @functools.wraps(func)
+        def wrapper(self):
+            if self.params is not None:
+                return func(self, **self.params)
+            # 未经ParametrizedTestLoader展开(如直接unittest.main()运行)时，逐个实例作为子测试执行
+            for index, name, params in source.instances():
+                with self.subTest(instance=name):
+                    func(self, **params)
+        
+        wrapper.param_source = source
+        return wrapper
+    return decorator
+
+class _ParametrizedSuite(unittest.TestSuite):
+    """参数化测试方法的实例集合，执行时逐个生成，不预先创建"""
+    
+    def __init__(self, test_class, method_name, source):
+        super().__init__()
+        self.test_class = test_class
+        self.method_name = method_name
+        self.source = source
+    
+    def __iter__(self):
+        for index, instance_id, params in self.source.instances():
+            yield self.test_class(self.method_name, params=params, instance_id=instance_id)
+    
+    def countTestCases(self):
+        return self.source.count()
+    
+    def _removeTestAtIndex(self, index):
+        # 实例未保存在套件中，无需释放
+        pass
+
+class ParametrizedTestLoader(unittest.TestLoader):
+    """将@parametrize测试方法展开为独立实例的用例加载器"""
+    
+    def loadTestsFromTestCase(self, testCaseClass):
+        names = self.getTestCaseNames(testCaseClass)
+        sources = {name: getattr(getattr(testCaseClass, name), 'param_source', None) for name in names}
+        if not any(sources.values()):
+            return super().loadTestsFromTestCase(testCaseClass)
+        suite = self.suiteClass()
+        for name in names:
+            if sources[name]:
+                suite.addTest(_ParametrizedSuite(testCaseClass, name, sources[name]))
+            else:
+                suite.addTest(testCaseClass(name))
+        return suite
 
 class BaseTest(unittest.TestCase):
     """测试基类"""
@@ -16,36 +91,158 @@ class BaseTest(unittest.TestCase):
     author = ""
     create_date = ""
     description = ""
+    # 用例执行时限(秒)，未指定时使用配置 timeouts.case
+    case_timeout = None
+    # 失败时是否自动收集远程日志，未指定时使用配置 log_collection.on_failure
+    collect_logs_on_failure = None
     
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+    def __init__(self, methodName='runTest', params=None, instance_id=None):
+        super().__init__(methodName)
         self.logger = get_logger(self.__class__.__name__)
         self.start_time = None
         self.end_time = None
+        # 参数化实例的参数和实例ID，非参数化用例为None
+        self.params = params
+        self.instance_id = instance_id
+    
+    def id(self):
+        test_id = super().id()
+        return test_id if self.instance_id is None else f"{test_id}[{self.instance_id}]"
+    
+    def __str__(self):
+        text = super().__str__()
+        return text if self.instance_id is None else f"{text} [{self.instance_id}]"
+    
+    def __eq__(self, other):
+        if type(self) is not type(other):
+            return NotImplemented
+        return self._testMethodName == other._testMethodName and self.instance_id == other.instance_id
+    
+    def __hash__(self):
+        return hash((super().__hash__(), self.instance_id))
+    
+    def get_case_id(self):
+        """结果中的用例ID，参数化实例附加实例ID"""
+        case_id = self.case_id or unittest.TestCase.id(self)
+        return case_id if self.instance_id is None else f"{case_id}[{self.instance_id}]"
     
     def setUp(self):
         """测试前准备 - 框架自动调用"""
         self.start_time = datetime.now()
-        self.logger.info(f"开始执行用例: {self.case_id} - {self.case_name}")
+        change_tracker.begin_case(self.get_case_file())
+        result_sink.begin_case(self.get_case_id(), self.case_name, relative_path(self.get_case_file()))
+        watchdog.begin_case(self.case_timeout)
+        source = getattr(getattr(self.__class__, self._testMethodName), 'param_source', None)
+        for data_file in (source.files if source else []):
+            change_tracker.record_file(data_file)
+        self.logger.info(f"开始执行用例: {self.get_case_id()} - {self.case_name}")
         self.logger.info(f"作者: {self.author}, 创建日期: {self.create_date}")
         
+        # 执行任何步骤前校验setup和测试方法中的字面量AW调用，与YAML用例执行前的校验一致
+        try:
+            for func in (getattr(self.__class__, self._testMethodName), self.__class__.setup):
+                aw_manager.check_source(func)
+        except AWParamError as e:
+            self.logger.error(f"AW参数错误: {e}")
+            watchdog.end_case()
+            change_tracker.end_case(False)
+            result_sink.end_case('error', f"AW参数错误: {e}")
+            raise
+        
         # 调用用户自定义的setup
         try:
             self.setup()
+        except unittest.SkipTest as e:
+            # setUp中跳过时unittest同样不会调用tearDown
+            self.logger.info(f"用例跳过: {e}")
+            watchdog.end_case()
+            change_tracker.end_case(False)
+            result_sink.end_case('skipped', str(e))
+            raise
         except Exception as e:
             self.logger.error(f"Setup执行失败: {str(e)}")
+            # setUp失败时unittest不会调用tearDown，在此结束记录
+            timed_out = watchdog.end_case()
+            change_tracker.end_case(False)
+            result_sink.end_case('timeout' if timed_out else 'error', f"Setup执行失败: {e}")
             raise
     
     def tearDown(self):
         """测试后清理 - 框架自动调用"""
+        # 先结束用例计时，用例超时后清理操作仍然执行
+        timed_out = watchdog.end_case()
+        # 在清理操作改变环境之前收集失败现场的日志
+        if self.get_failure_message() is not None and self._should_collect_logs():
+            self.collect_logs()
         try:
             self.teardown()
         except Exception as e:
             self.logger.error(f"Teardown执行失败: {str(e)}")
         
+        failure = self.get_failure_message()
+        skip_reason = self.get_skip_reason() if failure is None else None
+        # 跳过的用例没有验证任何内容，不作为通过记录到变更追踪
+        change_tracker.end_case(failure is None and skip_reason is None)
+        if skip_reason is not None:
+            result_sink.end_case('skipped', skip_reason)
+        else:
+            status = 'passed' if failure is None else 'timeout' if timed_out else 'failed'
+            result_sink.end_case(status, failure)
         self.end_time = datetime.now()
         duration = (self.end_time - self.start_time).total_seconds()
-        self.logger.info(f"用例执行完成: {self.case_id}, 耗时: {duration:.2f}秒")
+        self.logger.info(f"用例执行完成: {self.get_case_id()}, 耗时: {duration:.2f}秒")
+    
+    def get_case_file(self):
+        """用例所在文件路径"""
+        # 以测试方法定位文件，按路径动态加载的用例模块不在sys.modules中
+        method = getattr(self.__class__, self._testMethodName)
+        return inspect.getsourcefile(inspect.unwrap(method))
+    
+    def is_passed(self):
+        """当前用例是否执行通过，在tearDown阶段可用"""
+        return self.get_failure_message() is None
+    
+    def get_failure_message(self):
+        """当前用例的失败信息，未失败返回None，在tearDown阶段可用"""
+        outcome = getattr(self, '_outcome', None)
+        result = getattr(outcome, 'result', None)
+        # Python 3.11及以上版本，失败在发生时即写入result
+        for test, error in (getattr(result, 'failures', []) + getattr(result, 'errors', []))[::-1]:
+            if test is self:
+                return error.strip().splitlines()[-1] if error else "执行失败"
+        # Python 3.10及以下版本，失败暂存在outcome.errors中
+        for test, exc_info in (getattr(outcome, 'errors', None) or [])[::-1]:
+            if test is self and exc_info:
+                return f"{exc_info[0].__name__}: {exc_info[1]}"
+        return None
+    
+    def get_skip_reason(self):
+        """用例被跳过(self.skipTest)时返回跳过原因，否则返回None，在tearDown阶段可用"""
+        outcome = getattr(self, '_outcome', None)
+        result = getattr(outcome, 'result', None)
+        # Python 3.11及以上版本，跳过在发生时即写入result
+        for test, reason in (getattr(result, 'skipped', None) or [])[::-1]:
+            if test is self:
+                return reason or "跳过"
+        # Python 3.10及以下版本，跳过暂存在outcome.skipped中
+        for test, reason in (getattr(outcome, 'skipped', None) or [])[::-1]:
+            if test is self:
+                return reason or "跳过"
+        return None
+    
+    def _should_collect_logs(self):
+        if self.collect_logs_on_failure is not None:
+            return self.collect_logs_on_failure
+        return bool((config_manager.load_config().get('log_collection') or {}).get('on_failure'))
+    
+    def collect_logs(self, servers=None):
+        """收集各服务器的容器日志和系统日志，保存到本次运行的产物目录，收集失败不影响用例结果"""
+        from utils.log_collector import get_log_collector
+        try:
+            return get_log_collector().collect(servers, label=self.get_case_id())
+        except Exception as e:
+            self.logger.error(f"日志收集失败: {e}")
+            return []
     
     def setup(self):
         """用户自定义的测试前准备 - 子类重写"""
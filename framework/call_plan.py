@@ -0,0 +1,222 @@
+"""
+AW调用计划 - 注册时解析AW签名和类型注解，调用前完成参数校验和类型转换
+"""
+import ast
+import types
+import typing
+import difflib
+import inspect
+import yaml
+
+class AWParamError(ValueError):
+    """AW参数错误: 未知参数、缺少必需参数或类型无法转换"""
+
+_TRUE = {'true', 'yes', 'on', '1'}
+_FALSE = {'false', 'no', 'off', '0'}
+
+def _to_bool(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in _TRUE | _FALSE:
+        return value.strip().lower() in _TRUE
+    raise ValueError
+
+def _to_number(target):
+    def convert(value):
+        if isinstance(value, target) and not isinstance(value, bool):
+            return value
+        if isinstance(value, str):
+            return target(value.strip())
+        if target is float and isinstance(value, int) and not isinstance(value, bool):
+            return float(value)
+        raise ValueError
+    return convert
+
+def _to_str(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise ValueError
+
+def _to_container(target):
+    # YAML中的列表/字典经变量替换后可能变成字符串，按YAML重新解析
+    def convert(value):
+        if isinstance(value, str):
+            value = yaml.safe_load(value)
+        if isinstance(value, target):
+            return value
+        if target is tuple and isinstance(value, list):
+            return tuple(value)
+        raise ValueError
+    return convert
+
+def _optional(convert):
+    def wrapper(value):
+        if value is None or (isinstance(value, str) and value.strip().lower() in ('none', 'null')):
+            return None
+        return convert(value)
+    return wrapper
+
+def build_converter(annotation):
+    """按类型注解生成转换函数，无法转换的注解返回None(不转换)"""
+    origin = typing.get_origin(annotation)
+    if origin is typing.Union or (hasattr(types, 'UnionType') and origin is types.UnionType):
+        args = [a for a in typing.get_args(annotation) if a is not type(None)]
+        if len(args) == 1:
+            inner = build_converter(args[0])
+            return _optional(inner) if inner else None
+        return None
+    target = origin or annotation
+    if target is bool:
+        return _to_bool
+    if target in (int, float):
+        return _to_number(target)
+    if target is str:
+        return _to_str
+    if target in (list, dict, tuple):
+        return _to_container(target)
+    return None
+
+def _type_name(annotation):
+    return getattr(annotation, '__name__', None) or str(annotation).replace('typing.', '')
+
+def _is_dynamic(value):
+    """参数值是否包含 ${变量} 引用，需在执行时替换后再转换"""
+    if isinstance(value, str):
+        return '${' in value
+    if isinstance(value, dict):
+        return any(_is_dynamic(v) for v in value.values())
+    if isinstance(value, list):
+        return any(_is_dynamic(v) for v in value)
+    return False
+
+class _Param:
+    __slots__ = ('name', 'required', 'type_name', 'convert')
+
+    def __init__(self, name, required, type_name, convert):
+        self.name = name
+        self.required = required
+        self.type_name = type_name
+        self.convert = convert
+
+class BoundStep:
+    """预编译的步骤参数: 静态参数已转换，含变量引用的参数执行时替换后转换"""
+
+    __slots__ = ('plan', 'static', 'dynamic')
+
+    def __init__(self, plan, static, dynamic):
+        self.plan = plan
+        self.static = static
+        self.dynamic = dynamic
+
+    def bind(self, substitute=None):
+        """返回调用参数，substitute为变量替换函数"""
+        if not self.dynamic:
+            return dict(self.static)
+        params = dict(self.static)
+        for name, template in self.dynamic.items():
+            value = substitute(template) if substitute else template
+            params[name] = self.plan.coerce(name, value)
+        return params
+
+class CallPlan:
+    """单个AW的调用计划，timeout为该AW的默认执行时限(秒)"""
+
+    def __init__(self, name, func, timeout=None):
+        self.name = name
+        self.func = func
+        self.timeout = timeout
+        self.signature = inspect.signature(func)
+        try:
+            hints = typing.get_type_hints(func)
+        except Exception:
+            hints = {}
+
+        self.params = {}
+        self.accepts_any = False
+        for param in self.signature.parameters.values():
+            if param.kind == param.VAR_KEYWORD:
+                self.accepts_any = True
+                continue
+            if param.kind in (param.VAR_POSITIONAL, param.POSITIONAL_ONLY):
+                continue
+            # 没有类型注解时以默认值的类型为准，如 port=5201 按int转换
+            annotation = hints.get(param.name, param.annotation)
+            if annotation is param.empty and param.default not in (param.empty, None):
+                annotation = type(param.default)
+            convert = build_converter(annotation) if annotation is not param.empty else None
+            self.params[param.name] = _Param(param.name, param.default is param.empty,
+                                             _type_name(annotation), convert)
+        self.required = [p.name for p in self.params.values() if p.required]
+
+    def coerce(self, name, value):
+        """按参数类型转换单个参数值"""
+        param = self.params.get(name)
+        if param is None or param.convert is None:
+            return value
+        try:
+            return param.convert(value)
+        except (ValueError, TypeError, yaml.YAMLError):
+            raise AWParamError(f"AW '{self.name}' 参数 {name} 应为 {param.type_name}, 实际值: {value!r}") from None
+
+    def check_names(self, names):
+        """检查参数名: 未知参数和缺少的必需参数"""
+        if not self.accepts_any:
+            for name in names:
+                if name not in self.params:
+                    hint = difflib.get_close_matches(name, self.params, n=1)
+                    suggestion = f"，是否应为 {hint[0]}" if hint else ""
+                    raise AWParamError(f"AW '{self.name}' 没有参数 {name}{suggestion}，签名: {self.signature}")
+        missing = [name for name in self.required if name not in names]
+        if missing:
+            raise AWParamError(f"AW '{self.name}' 缺少必需参数: {', '.join(missing)}，签名: {self.signature}")
+
+    def bind(self, params):
+        """校验并转换一次调用的全部参数"""
+        self.check_names(params)
+        return {name: self.coerce(name, value) for name, value in params.items()}
+
+    def compile(self, params):
+        """预编译步骤参数，参数名和静态参数值在此时校验"""
+        params = params or {}
+        self.check_names(params)
+        static, dynamic = {}, {}
+        for name, value in params.items():
+            if _is_dynamic(value):
+                dynamic[name] = value
+            else:
+                static[name] = self.coerce(name, value)
+        return BoundStep(self, static, dynamic)
+
+def find_aw_calls(tree):
+    """
+    遍历语法树中AW名称为字面量的 call_aw 调用
+
+    Yields:
+        (节点, AW名称, 字面量参数, 全部参数名)，调用中含 **kwargs 时参数名为None
+    """
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                and node.func.attr == 'call_aw' and node.args):
+            continue
+        try:
+            name = ast.literal_eval(node.args[0])
+        except (ValueError, TypeError, SyntaxError):
+            continue
+        if not isinstance(name, str):
+            continue
+        params, names = {}, set()
+        for keyword in node.keywords:
+            if keyword.arg is None:
+                names = None
+                continue
+            if names is not None:
+                names.add(keyword.arg)
+            try:
+                params[keyword.arg] = ast.literal_eval(keyword.value)
+            except (ValueError, TypeError, SyntaxError):
+                pass
+        yield node, name, params, names
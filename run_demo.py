@@ -3,16 +3,10 @@ ADN Demo测试执行器 - 优化版
 """
 import sys
 from core.test_runner import TestRunner
-from actions.basic_actions import (
-    check_server_connectivity,
-    check_database_connectivity, 
-    clear_database_table,
-    restart_adn_containers,
-    call_api,
-    execute_rtnctl_query,
-    execute_iperf_test
-)
+from actions.basic_actions import register_basic_actions
 from utils.logger import get_logger
+from utils.result_store import result_sink
+from utils.circuit_breaker import breakers
 
 logger = get_logger()
 
@@ -24,16 +18,14 @@ def main():
         runner = TestRunner()
         
         # 注册所有AW
-        runner.register_action("检查服务器连通性", check_server_connectivity)
-        runner.register_action("检查数据库连通性", check_database_connectivity)
-        runner.register_action("清理数据库表", clear_database_table)
-        runner.register_action("重启ADN容器", restart_adn_containers)
-        runner.register_action("调用API", call_api)
-        runner.register_action("执行rtnctl查询", execute_rtnctl_query)
-        runner.register_action("执行iperf测试", execute_iperf_test)
+        register_basic_actions(runner)
         
-        # 运行测试用例
-        success = runner.run_case("testcases/adn_demo.yaml")
+        # 运行测试用例，结果写入 reports/
+        result_sink.start_run(meta={'entry': 'run_demo'})
+        try:
+            success = runner.run_case("testcases/adn_demo.yaml")
+        finally:
+            result_sink.end_run(metrics={'circuit_breakers': breakers.metrics()})
         
         if success:
             logger.info("🎉 测试执行成功完成")
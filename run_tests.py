@@ -6,6 +6,7 @@ import sys
 import os
 import unittest
 import argparse
+import subprocess
 import importlib.util
 from pathlib import Path
 
@@ -14,6 +15,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 # 导入所有AW模块以确保AW被注册
 from actions import network_aws
+from framework.base_test import ParametrizedTestLoader
 
 def run_single_test(test_file):
     """运行单个测试用例"""
@@ -27,8 +29,8 @@ def run_single_test(test_file):
     module = importlib.util.module_from_spec(spec)
     spec.loader.exec_module(module)
     
-    # 运行测试
-    loader = unittest.TestLoader()
+    # 运行测试，参数化测试方法展开为逐个实例
+    loader = ParametrizedTestLoader()
     suite = loader.loadTestsFromModule(module)
     runner = unittest.TextTestRunner(verbosity=2)
     result = runner.run(suite)
@@ -37,20 +39,169 @@ def run_single_test(test_file):
 
 def run_batch_tests(pattern="TC_*.py"):
     """批量运行测试用例"""
-    loader = unittest.TestLoader()
+    loader = ParametrizedTestLoader()
     suite = loader.discover('testcases', pattern=pattern)
     runner = unittest.TextTestRunner(verbosity=2)
     result = runner.run(suite)
     
     return result.wasSuccessful()
 
+def run_selected_tests(cases):
+    """执行指定的用例文件列表"""
+    from core.case_executor import load_python_suite, resolve_case_path, run_case_file
+    
+    suite = unittest.TestSuite()
+    yaml_cases = []
+    for case in cases:
+        if case.endswith(('.yaml', '.yml')):
+            yaml_cases.append(case)
+        else:
+            suite.addTests(load_python_suite(resolve_case_path(case)))
+    
+    success = True
+    if suite.countTestCases():
+        runner = unittest.TextTestRunner(verbosity=2)
+        success = runner.run(suite).wasSuccessful()
+    for case in yaml_cases:
+        success = run_case_file(case) and success
+    return success
+
+def selected_cases(args):
+    """按命令行参数确定本次执行的用例文件"""
+    from core.case_executor import discover_cases
+    cases = [args.file] if args.file else discover_cases(args.pattern)
+    if args.changed_only:
+        # 增量模式: 只保留受变更影响的用例
+        from utils.change_tracker import change_tracker
+        cases = change_tracker.select_changed(cases)
+    return cases
+
+def prepare_connections(cases, enabled=True):
+    """执行前并行预建用例引用的连接并报告不可达的目标，配置 prewarm.abort_on_unreachable 时不可达则不执行"""
+    from utils.config_manager import config_manager
+    settings = config_manager.load_config().get('prewarm') or {}
+    if not enabled or not settings.get('enabled', True):
+        return True
+    from core.case_planner import prewarm_cases
+    unreachable = prewarm_cases(cases)
+    if unreachable and settings.get('abort_on_unreachable', False):
+        print(f"{len(unreachable)} 个目标不可达，未执行用例")
+        return False
+    return True
+
+def show_plan(cases):
+    """列出用例引用的连接目标并检查可达性，不执行用例"""
+    from core.case_planner import CasePlanner, prewarm
+    
+    plan = CasePlanner().plan(cases)
+    for error in plan.errors:
+        print(f"无法解析: {error}")
+    unreachable = {(t['kind'], t['name']): t['error'] for t in prewarm(plan)}
+    for kind in ('ssh', 'db', 'api'):
+        for name in plan.names(kind):
+            error = unreachable.get((kind, name))
+            status = f"✗ {error}" if error else "✓"
+            print(f"{kind:<4} {name:<30} {len(plan.targets[kind][name]):>3} 个用例  {status}")
+    return not unreachable
+
+def show_history(flaky=None, slowest=None, runs=20):
+    """查询历史结果: 不稳定用例和最慢步骤"""
+    from utils.result_store import ResultQuery, RESULT_DB
+    
+    if not RESULT_DB.exists():
+        print(f"结果库不存在: {RESULT_DB}")
+        return False
+    
+    query = ResultQuery()
+    try:
+        if flaky:
+            print(f"最近 {runs} 次运行中的不稳定用例:")
+            for row in query.flaky_cases(runs=runs, limit=flaky):
+                print(f"- {row['case_id']}: 执行 {row['runs']} 次, 失败 {row['failed']} 次, 结果变化 {row['flips']} 次")
+        if slowest:
+            print(f"最近 {runs} 次运行中最慢的AW:")
+            for row in query.slowest_steps(runs=runs, limit=slowest):
+                print(f"- {row['aw']}: 调用 {row['calls']} 次, 平均 {row['avg_duration']:.3f}秒, 最长 {row['max_duration']:.3f}秒")
+    finally:
+        query.close()
+    return True
+
+def run_distributed(cases, address, local_agents=0):
+    """以协调器模式运行，将用例分发给各Agent执行"""
+    from core.coordinator import Coordinator
+    from core.protocol import parse_address
+    from utils.config_manager import config_manager
+    
+    from utils.result_store import result_sink
+    
+    settings = config_manager.get_config('distributed') or {}
+    host, port = parse_address(address)
+    try:
+        coordinator = Coordinator(
+            cases,
+            host=host,
+            port=port,
+            lease_timeout=settings.get('lease_timeout', 60),
+            max_attempts=settings.get('max_attempts', 2),
+            run_id=result_sink.run_id
+        )
+    except ValueError as e:
+        print(f"协调器启动失败: {e}")
+        return False
+    coordinator.start()
+    
+    # 本机启动Agent子进程，便于单机验证
+    agents = []
+    for i in range(local_agents):
+        agents.append(subprocess.Popen([
+            sys.executable, os.path.abspath(__file__),
+            '--agent', f"127.0.0.1:{coordinator.port}",
+            '--agent-id', f"local-{i + 1}"
+        ]))
+    
+    try:
+        success = coordinator.wait()
+    finally:
+        coordinator.stop()
+        for proc in agents:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+    
+    summary = coordinator.summary()
+    print(f"分布式执行完成: 共 {summary['total']} 个, 通过 {summary['passed']} 个, 失败 {summary['failed']} 个")
+    return success
+
+def run_agent(address, agent_id=None):
+    """以Agent模式运行，从协调器拉取用例执行"""
+    from core.agent import Agent
+    Agent(address, agent_id=agent_id).run()
+    return True
+
 def main():
     parser = argparse.ArgumentParser(description='ADN自动化测试执行器')
     parser.add_argument('-f', '--file', help='执行单个测试文件')
     parser.add_argument('-p', '--pattern', default='TC_*.py', help='批量执行模式的文件模式')
     parser.add_argument('-l', '--list', action='store_true', help='列出所有测试用例')
+    parser.add_argument('--changed-only', action='store_true', help='只执行受AW模块、用例文件或配置变更影响的用例')
+    parser.add_argument('--flaky', type=int, nargs='?', const=20, metavar='N', help='查询历史结果中最不稳定的N个用例')
+    parser.add_argument('--slowest', type=int, nargs='?', const=20, metavar='N', help='查询历史结果中最慢的N个AW')
+    parser.add_argument('--history-runs', type=int, default=20, help='历史查询覆盖的最近运行次数')
+    parser.add_argument('--coordinator', metavar='[HOST:]PORT', help='以协调器模式运行，将用例分发给Agent执行')
+    parser.add_argument('--local-agents', type=int, default=0, help='协调器模式下在本机启动的Agent数量')
+    parser.add_argument('--agent', metavar='HOST:PORT', help='以Agent模式运行，连接指定协调器')
+    parser.add_argument('--agent-id', help='Agent标识，默认为 主机名-进程号')
+    parser.add_argument('--broker', action='store_true', help='通过常驻的连接代理进程执行远程命令和SQL，复用已建立的连接')
+    parser.add_argument('--run-timeout', type=float, help='整轮运行的时限(秒)，到期后未完成的步骤和用例记为超时')
+    parser.add_argument('--no-prewarm', action='store_true', help='不在执行前并行预建用例引用的连接')
+    parser.add_argument('--plan', action='store_true', help='只列出选中用例引用的服务器、数据库和API并检查可达性')
     
     args = parser.parse_args()
+    if args.broker:
+        from utils.connection_pool import BROKER_ENV
+        # 通过环境变量传递，本机启动的Agent子进程同样使用连接代理
+        os.environ[BROKER_ENV] = '1'
     
     if args.list:
         # 列出所有测试用例
@@ -59,14 +210,57 @@ def main():
             print(f"- {test_file.name}")
         return
     
-    if args.file:
+    if args.plan:
+        # 只规划不执行
+        success = show_plan(selected_cases(args))
+        sys.exit(0 if success else 1)
+    
+    if args.flaky or args.slowest:
+        # 历史结果查询
+        success = show_history(args.flaky, args.slowest, args.history_runs)
+        sys.exit(0 if success else 1)
+    
+    if args.agent:
+        # Agent模式，结果回传给协调器记录
+        success = run_agent(args.agent, args.agent_id)
+        sys.exit(0 if success else 1)
+    
+    # 结果写入 reports/<run_id>/ 和 reports/results.db
+    from utils.result_store import result_sink
+    from utils.watchdog import watchdog
+    from utils.circuit_breaker import breakers
+    result_sink.start_run(meta={'entry': 'run_tests', 'argv': sys.argv[1:]})
+    watchdog.start_run(args.run_timeout)
+    try:
+        success = execute(args)
+    finally:
+        watchdog.end_run()
+        result_sink.end_run(metrics={'circuit_breakers': breakers.metrics()})
+    
+    sys.exit(0 if success else 1)
+
+def execute(args):
+    """按命令行参数执行用例"""
+    if args.coordinator:
+        # 协调器模式，参数化用例按实例惰性展开后分发，连接由各Agent建立
+        from core.case_executor import expand_cases
+        return run_distributed(expand_cases(selected_cases(args)), args.coordinator, args.local_agents)
+    
+    # 用例开始前并行建立所需连接，不可达的目标在执行前报告
+    cases = selected_cases(args)
+    if not prepare_connections(cases, not args.no_prewarm):
+        return False
+    
+    if args.changed_only:
+        success = run_selected_tests(cases)
+    elif args.file:
         # 执行单个测试
         success = run_single_test(args.file)
     else:
         # 批量执行测试
         success = run_batch_tests(args.pattern)
     
-    sys.exit(0 if success else 1)
+    return success
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,3 @@
+"""
+模拟ADN实验室 - 脱离真实环境对框架做并发和规模测试
+"""
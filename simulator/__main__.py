@@ -0,0 +1,57 @@
+"""
+模拟实验室命令行入口
+
+用法:
+    python -m simulator --nodes 1000 --processes 4 --overlay config/simulator.yaml
+    NETAUTOTEST_CONFIG_OVERLAY=config/simulator.yaml python run_tests.py
+"""
+import sys
+import os
+import json
+import time
+import argparse
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simulator.lab import SimulatedLab, run_shard
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m simulator', description='模拟ADN实验室')
+    parser.add_argument('--nodes', type=int, default=10, help='模拟SSH节点数量，默认10')
+    parser.add_argument('--processes', type=int, default=1, help='承载节点的进程数，默认1(当前进程)')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址，默认127.0.0.1')
+    parser.add_argument('--latency', type=float, default=0.0, help='命令和请求的固定延迟(秒)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='随机延迟上限(秒)')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='命令和请求的随机失败率(0~1)')
+    parser.add_argument('--output-size', type=int, default=1024, help='rtnctl输出字节数，默认1024')
+    parser.add_argument('--restart-time', type=float, default=0.0, help='docker restart耗时(秒)')
+    parser.add_argument('--ready-delay', type=float, default=0.0, help='容器重启后变为healthy的时间(秒)')
+    parser.add_argument('--down', type=int, default=0, help='宕机(拒绝连接)的节点数量')
+    parser.add_argument('--seed', type=int, help='随机数种子')
+    parser.add_argument('--overlay', default='config/simulator.yaml', help='生成的配置覆盖文件路径')
+    parser.add_argument('--shard', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.shard:
+        run_shard(json.loads(args.shard))
+        return
+
+    lab = SimulatedLab(
+        nodes=args.nodes, processes=args.processes, host=args.host, latency=args.latency,
+        jitter=args.jitter, failure_rate=args.failure_rate, output_size=args.output_size,
+        restart_time=args.restart_time, ready_delay=args.ready_delay, down=args.down, seed=args.seed,
+    ).start()
+    try:
+        overlay = lab.write_overlay(args.overlay)
+        print(f"\n使用模拟实验室执行用例:\n    NETAUTOTEST_CONFIG_OVERLAY={overlay} python run_tests.py")
+        print("按 Ctrl+C 停止\n")
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        lab.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+模拟ADN REST API - 进程内HTTP服务器，可配置响应延迟和失败率
+"""
+import json
+import time
+import random
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+class _APIHandler(BaseHTTPRequestHandler):
+    """请求交给服务器的responder处理，返回JSON"""
+
+    protocol_version = 'HTTP/1.1'
+    # 响应头和响应体分两次写出，不关闭Nagle算法时每个请求会多等一个延迟确认(约40ms)
+    disable_nagle_algorithm = True
+
+    def _respond(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        status, result = self.server.responder(self.command, self.path, body)
+        data = json.dumps(result, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _respond
+
+    def log_message(self, format, *args):
+        pass
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # 默认监听队列只有5，并发压测时会出现连接被拒
+    request_queue_size = 128
+
+def echo_responder(method, path, body=b''):
+    """默认响应: 任意路径返回成功"""
+    return 200, {'code': 0, 'path': path}
+
+class LocalHTTPServer:
+    """本地HTTP服务器"""
+
+    def __init__(self, host='127.0.0.1', port=0, responder=None):
+        self._server = _HTTPServer((host, port), _APIHandler)
+        self._server.responder = responder or echo_responder
+        self.host, self.port = self._server.server_address
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+class SimulatedAPI:
+    """模拟ADN控制面API
+
+    GET  /api/v1/nodes   返回节点列表
+    POST /api/v1/config  下发配置
+    GET  /health         健康检查
+    其他路径返回404，按failure_rate随机返回503
+    """
+
+    def __init__(self, nodes=None, latency=0.0, jitter=0.0, failure_rate=0.0, seed=None):
+        self.nodes = list(nodes or [])
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.configs = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, method, path, body=b''):
+        delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        if self.failure_rate and self.random.random() < self.failure_rate:
+            return 503, {'code': 503, 'message': 'simulated failure'}
+
+        path = path.split('?', 1)[0]
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        if path == '/api/v1/nodes' and method == 'GET':
+            return 200, {'code': 0, 'data': [{'node_id': name, 'status': 'online'} for name in self.nodes]}
+        if path == '/api/v1/config' and method in ('POST', 'PUT'):
+            try:
+                config = json.loads(body or b'{}')
+            except ValueError:
+                return 400, {'code': 400, 'message': 'invalid json'}
+            with self._lock:
+                self.configs[config.get('node_id', '')] = config
+            return 200, {'code': 0, 'message': 'ok'}
+        return 404, {'code': 404, 'message': f'not found: {path}'}
@@ -0,0 +1,190 @@
+"""
+模拟数据库 - MySQL协议桩，查询由sqlite内存库执行，可预置ADN业务表
+"""
+import time
+import sqlite3
+import struct
+import threading
+import socketserver
+
+# 与 testcases/adn_demo.yaml 清理步骤对应的ADN业务表
+ADN_SCHEMA = """
+CREATE TABLE session_table (id INTEGER PRIMARY KEY, node_id TEXT, status TEXT, create_time TEXT);
+CREATE TABLE log_table (id INTEGER PRIMARY KEY, node_id TEXT, message TEXT, create_time TEXT);
+CREATE TABLE temp_table (id INTEGER PRIMARY KEY, data TEXT);
+"""
+
+CLIENT_LONG_PASSWORD = 0x1
+CLIENT_FOUND_ROWS = 0x2
+CLIENT_LONG_FLAG = 0x4
+CLIENT_CONNECT_WITH_DB = 0x8
+CLIENT_PROTOCOL_41 = 0x200
+CLIENT_TRANSACTIONS = 0x2000
+CLIENT_SECURE_CONNECTION = 0x8000
+CLIENT_MULTI_RESULTS = 0x20000
+CLIENT_PLUGIN_AUTH = 0x80000
+
+SERVER_CAPABILITIES = (CLIENT_LONG_PASSWORD | CLIENT_FOUND_ROWS | CLIENT_LONG_FLAG | CLIENT_CONNECT_WITH_DB |
+                       CLIENT_PROTOCOL_41 | CLIENT_TRANSACTIONS | CLIENT_SECURE_CONNECTION |
+                       CLIENT_MULTI_RESULTS | CLIENT_PLUGIN_AUTH)
+SERVER_STATUS_AUTOCOMMIT = 0x2
+
+COM_QUIT = 0x01
+COM_INIT_DB = 0x02
+COM_QUERY = 0x03
+COM_PING = 0x0e
+
+TYPE_DOUBLE = 0x05
+TYPE_LONGLONG = 0x08
+TYPE_VAR_STRING = 0xfd
+
+def _lenenc_int(value):
+    if value < 251:
+        return bytes([value])
+    if value < 2 ** 16:
+        return b'\xfc' + struct.pack('<H', value)
+    if value < 2 ** 24:
+        return b'\xfd' + struct.pack('<I', value)[:3]
+    return b'\xfe' + struct.pack('<Q', value)
+
+def _lenenc_str(value):
+    data = value.encode('utf-8') if isinstance(value, str) else value
+    return _lenenc_int(len(data)) + data
+
+class _MySQLHandler(socketserver.BaseRequestHandler):
+    """MySQL协议会话: 握手后接受任意账号，查询在sqlite内存库上执行"""
+
+    def setup(self):
+        self.seq = 0
+
+    def _send(self, payload):
+        self.request.sendall(struct.pack('<I', len(payload))[:3] + bytes([self.seq & 0xff]) + payload)
+        self.seq += 1
+
+    def _recv_exact(self, size):
+        data = b''
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def _recv(self):
+        header = self._recv_exact(4)
+        if header is None:
+            return None
+        length = struct.unpack('<I', header[:3] + b'\x00')[0]
+        self.seq = header[3] + 1
+        return self._recv_exact(length)
+
+    def _ok(self, affected_rows=0):
+        self._send(b'\x00' + _lenenc_int(affected_rows) + _lenenc_int(0) +
+                   struct.pack('<HH', SERVER_STATUS_AUTOCOMMIT, 0))
+
+    def _eof(self):
+        self._send(b'\xfe' + struct.pack('<HH', 0, SERVER_STATUS_AUTOCOMMIT))
+
+    def _error(self, message, code=1064):
+        self._send(b'\xff' + struct.pack('<H', code) + b'#42000' + message.encode('utf-8'))
+
+    def handle(self):
+        salt = b'12345678' + b'abcdefghijkl'
+        handshake = (b'\x0a' + b'5.7.0-netautotest-stub\x00' + struct.pack('<I', threading.get_ident() & 0xffffffff) +
+                     salt[:8] + b'\x00' + struct.pack('<H', SERVER_CAPABILITIES & 0xffff) + bytes([33]) +
+                     struct.pack('<H', SERVER_STATUS_AUTOCOMMIT) + struct.pack('<H', SERVER_CAPABILITIES >> 16) +
+                     bytes([21]) + b'\x00' * 10 + salt[8:] + b'\x00' + b'mysql_native_password\x00')
+        self._send(handshake)
+        if self._recv() is None:
+            return
+        self._ok()
+
+        while True:
+            self.seq = 0
+            packet = self._recv()
+            if not packet or packet[0] == COM_QUIT:
+                return
+            command, body = packet[0], packet[1:]
+            if command == COM_QUERY:
+                self._query(body.decode('utf-8', errors='replace'))
+            elif command in (COM_PING, COM_INIT_DB):
+                self._ok()
+            else:
+                self._error(f"不支持的命令: {command}")
+
+    def _query(self, sql):
+        keyword = sql.strip().split(None, 1)[0].upper() if sql.strip() else ''
+        if keyword in ('SET', 'COMMIT', 'ROLLBACK', 'BEGIN', 'START', 'USE'):
+            self._ok()
+            return
+        try:
+            rows, columns, affected = self.server.execute(sql)
+        except Exception as e:
+            self._error(str(e))
+            return
+        if columns is None:
+            self._ok(affected)
+            return
+        self._result_set(columns, rows)
+
+    def _result_set(self, columns, rows):
+        types = []
+        for index in range(len(columns)):
+            sample = next((row[index] for row in rows if row[index] is not None), None)
+            if isinstance(sample, int):
+                types.append(TYPE_LONGLONG)
+            elif isinstance(sample, float):
+                types.append(TYPE_DOUBLE)
+            else:
+                types.append(TYPE_VAR_STRING)
+
+        self._send(_lenenc_int(len(columns)))
+        for name, column_type in zip(columns, types):
+            charset = 63 if column_type != TYPE_VAR_STRING else 33
+            self._send(_lenenc_str('def') + _lenenc_str('') + _lenenc_str('') + _lenenc_str('') +
+                       _lenenc_str(name) + _lenenc_str(name) + b'\x0c' +
+                       struct.pack('<HIBHB', charset, 255, column_type, 0, 0) + b'\x00\x00')
+        self._eof()
+        for row in rows:
+            self._send(b''.join(b'\xfb' if value is None else _lenenc_str(str(value)) for value in row))
+        self._eof()
+
+class _MySQLServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, address, database, latency=0.0):
+        super().__init__(address, _MySQLHandler)
+        self.database = database
+        self.latency = latency
+        self._lock = threading.Lock()
+
+    def execute(self, sql):
+        """在sqlite上执行SQL，返回 (行, 列名或None, 影响行数)"""
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            cursor = self.database.execute(sql)
+            if cursor.description is None:
+                return [], None, max(cursor.rowcount, 0)
+            return cursor.fetchall(), [d[0] for d in cursor.description], 0
+
+class LocalMySQLServer:
+    """MySQL协议桩，查询由sqlite内存库执行，可预先建表"""
+
+    def __init__(self, host='127.0.0.1', port=0, init_sql=None, latency=0.0):
+        self.database = sqlite3.connect(':memory:', check_same_thread=False, isolation_level=None)
+        if init_sql:
+            self.database.executescript(init_sql)
+        self._server = _MySQLServer((host, port), self.database, latency)
+        self.host, self.port = self._server.server_address
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self.database.close()
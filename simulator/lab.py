@@ -0,0 +1,211 @@
+"""
+模拟实验室 - 启动N个模拟SSH节点、ADN API和数据库，并生成对应的配置覆盖文件
+"""
+import sys
+import json
+import socket
+import resource
+import threading
+import subprocess
+from pathlib import Path
+import yaml
+from utils.logger import get_logger
+from simulator.node import SimulatedNode
+from simulator.ssh_server import SSHEndpointGroup
+from simulator.api_server import LocalHTTPServer, SimulatedAPI
+from simulator.db_server import LocalMySQLServer, ADN_SCHEMA
+
+logger = get_logger()
+
+PROJECT_ROOT = Path(__file__).parent.parent
+READY_PREFIX = "SIMULATOR_READY "
+USERNAME = PASSWORD = "sim"
+
+def node_name(index):
+    return f"sim-node-{index:04d}"
+
+def raise_fd_limit(required):
+    """按需提高进程的文件描述符软限制，每个节点需要监听和连接各一个描述符"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != resource.RLIM_INFINITY and soft < required:
+        target = required if hard == resource.RLIM_INFINITY else min(required, hard)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+        if target < required:
+            logger.warning(f"文件描述符上限 {hard} 不足，节点较多时可能无法建立连接")
+
+def _refused_port(host):
+    """取一个当前无人监听的端口，连接会被立即拒绝，用于模拟宕机节点"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+def build_nodes(first, count, options, seed=None):
+    """创建编号从first开始的count个模拟节点处理函数"""
+    handlers = {}
+    for index in range(first, first + count):
+        node_seed = None if seed is None else seed + index
+        handlers[node_name(index)] = SimulatedNode(node_name(index), seed=node_seed, **options)
+    return handlers
+
+class SimulatedLab:
+    """模拟实验室
+
+    Args:
+        nodes: 模拟SSH节点数量
+        processes: 承载SSH节点的进程数，1为在当前进程内运行，大于1时分片到子进程
+        host: 监听地址
+        latency / jitter / failure_rate: 节点命令和API请求的延迟、随机延迟上限和失败率，数据库只使用latency
+        output_size: rtnctl输出的字节数
+        restart_time / ready_delay: docker restart耗时和容器重启后变为healthy的时间
+        down: 宕机节点数量，这些节点的端口拒绝连接
+        api / db: 是否启动模拟API和数据库
+        seed: 随机数种子
+    """
+
+    def __init__(self, nodes=10, processes=1, host='127.0.0.1', latency=0.0, jitter=0.0, failure_rate=0.0,
+                 output_size=1024, restart_time=0.0, ready_delay=0.0, down=0, api=True, db=True, seed=None):
+        if nodes < 1:
+            raise ValueError("节点数量至少为1")
+        self.nodes = nodes
+        self.processes = max(1, processes)
+        self.host = host
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.down = min(max(0, down), nodes)
+        self.seed = seed
+        self.node_options = {
+            'latency': latency,
+            'jitter': jitter,
+            'failure_rate': failure_rate,
+            'output_size': output_size,
+            'restart_time': restart_time,
+            'ready_delay': ready_delay,
+        }
+        self.enable_api = api
+        self.enable_db = db
+        self.endpoints = {}
+        self.api = None
+        self.db = None
+        self._group = None
+        self._shards = []
+
+    @property
+    def node_names(self):
+        return [node_name(i) for i in range(1, self.nodes + 1)]
+
+    def start(self):
+        up = self.nodes - self.down
+        try:
+            if up and self.processes == 1:
+                raise_fd_limit(up * 3 + 256)
+                handlers = build_nodes(1, up, self.node_options, self.seed)
+                self._group = SSHEndpointGroup(handlers, self.host).start()
+                self.endpoints.update(self._group.endpoints)
+            elif up:
+                self._start_shards(up)
+
+            for index in range(up + 1, self.nodes + 1):
+                self.endpoints[node_name(index)] = (self.host, _refused_port(self.host))
+
+            if self.enable_api:
+                responder = SimulatedAPI(self.node_names, self.latency, self.jitter, self.failure_rate, self.seed)
+                self.api = LocalHTTPServer(self.host, responder=responder).start()
+            if self.enable_db:
+                self.db = LocalMySQLServer(self.host, init_sql=ADN_SCHEMA, latency=self.latency).start()
+        except Exception:
+            self.stop()
+            raise
+
+        logger.info(f"模拟实验室已启动: {up} 个节点在线, {self.down} 个宕机, {self.processes} 个进程")
+        return self
+
+    def _start_shards(self, count):
+        """将节点平均分配到子进程，子进程就绪后输出端口列表"""
+        per_shard = -(-count // self.processes)
+        for first in range(1, count + 1, per_shard):
+            spec = {
+                'first': first,
+                'count': min(per_shard, count - first + 1),
+                'host': self.host,
+                'options': self.node_options,
+                'seed': self.seed,
+            }
+            process = subprocess.Popen(
+                [sys.executable, '-m', 'simulator', '--shard', json.dumps(spec)],
+                cwd=PROJECT_ROOT, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, encoding='utf-8'
+            )
+            self._shards.append(process)
+
+        for process in self._shards:
+            for line in process.stdout:
+                if line.startswith(READY_PREFIX):
+                    endpoints = json.loads(line[len(READY_PREFIX):])
+                    self.endpoints.update({name: tuple(address) for name, address in endpoints.items()})
+                    break
+            else:
+                raise RuntimeError(f"模拟节点子进程启动失败, 退出码: {process.wait()}")
+            # 子进程的日志也输出到stdout，持续读取避免管道写满阻塞子进程
+            threading.Thread(target=process.stdout.read, daemon=True).start()
+
+    def config_overlay(self):
+        """生成配置覆盖: 每个节点一个服务器配置，adn_server指向第一个节点，
+        adn_db和apis指向模拟数据库和API"""
+        servers = {}
+        for name in self.node_names:
+            host, port = self.endpoints[name]
+            servers[name] = {'ip': host, 'port': port, 'username': USERNAME, 'password': PASSWORD}
+        overlay = {'servers': {'adn_server': dict(servers[node_name(1)]), **servers}}
+        if self.db:
+            overlay['databases'] = {
+                'adn_db': {'host': self.db.host, 'port': self.db.port, 'username': USERNAME,
+                           'password': PASSWORD, 'database': 'adn'},
+            }
+        if self.api:
+            overlay['apis'] = {'base_url': self.api.base_url}
+        overlay['simulator'] = {'nodes': self.node_names}
+        return overlay
+
+    def write_overlay(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("# 模拟实验室生成的配置覆盖文件，通过环境变量 NETAUTOTEST_CONFIG_OVERLAY 加载\n")
+            yaml.safe_dump(self.config_overlay(), f, allow_unicode=True, sort_keys=False)
+        logger.info(f"配置覆盖文件已生成: {path}")
+        return path
+
+    def stop(self):
+        if self._group:
+            self._group.stop()
+            self._group = None
+        for process in self._shards:
+            try:
+                process.stdin.close()
+                process.wait(timeout=10)
+            except (OSError, subprocess.TimeoutExpired):
+                process.kill()
+        self._shards = []
+        if self.api:
+            self.api.stop()
+            self.api = None
+        if self.db:
+            self.db.stop()
+            self.db = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+def run_shard(spec):
+    """子进程入口: 启动一片模拟节点，输出端口列表后保持运行直到父进程关闭stdin"""
+    raise_fd_limit(spec['count'] * 3 + 256)
+    handlers = build_nodes(spec['first'], spec['count'], spec['options'], spec.get('seed'))
+    group = SSHEndpointGroup(handlers, spec['host']).start()
+    print(READY_PREFIX + json.dumps(group.endpoints), flush=True)
+    try:
+        sys.stdin.read()
+    finally:
+        group.stop()
@@ -0,0 +1,114 @@
+"""
+模拟ADN节点 - SSH命令处理: echo、hostname、docker restart/inspect/ps、rtnctl
+"""
+import time
+import shlex
+import random
+import threading
+from pathlib import PurePosixPath
+
+DEFAULT_CONTAINERS = ('adn-control', 'adn-forward', 'adn-monitor')
+
+def route_table(size):
+    """生成约size字节的路由表输出"""
+    lines = ["Destination        Gateway          Interface  Metric"]
+    total = len(lines[0]) + 1
+    index = 0
+    while total < size:
+        line = f"10.{index // 256 % 256}.{index % 256}.0/24      172.16.0.1       eth0       {index % 100}"
+        lines.append(line)
+        total += len(line) + 1
+        index += 1
+    return '\n'.join(lines) + '\n'
+
+class SimulatedNode:
+    """模拟节点的命令处理函数，可配置延迟、输出大小和失败率
+
+    Args:
+        name: 节点名称，hostname命令返回该名称
+        latency: 每条命令的固定延迟(秒)
+        jitter: 在固定延迟上叠加的随机延迟上限(秒)
+        failure_rate: 命令随机失败(退出码1)的概率
+        output_size: rtnctl输出的字节数
+        restart_time: docker restart的耗时(秒)
+        ready_delay: 重启完成后容器变为healthy所需的时间(秒)
+        containers: 节点上的容器名称
+        seed: 随机数种子，用于复现
+    """
+
+    def __init__(self, name, latency=0.0, jitter=0.0, failure_rate=0.0, output_size=1024,
+                 restart_time=0.0, ready_delay=0.0, containers=DEFAULT_CONTAINERS, seed=None):
+        self.name = name
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.restart_time = restart_time
+        self.ready_delay = ready_delay
+        self.containers = list(containers)
+        self.random = random.Random(seed)
+        self.commands = 0
+        self._routes = route_table(output_size)
+        self._ready_at = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, command):
+        """返回 (stdout, stderr, 退出码)"""
+        with self._lock:
+            self.commands += 1
+        delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+
+        try:
+            args = shlex.split(command)
+        except ValueError:
+            args = command.split()
+        if not args:
+            return '', '', 0
+        if self.failure_rate and self.random.random() < self.failure_rate:
+            return '', f"simulated failure: {command}\n", 1
+
+        program = PurePosixPath(args[0]).name
+        if program == 'echo':
+            return ' '.join(args[1:]) + '\n', '', 0
+        if program == 'hostname':
+            return self.name + '\n', '', 0
+        if program == 'docker':
+            return self._docker(args[1:])
+        if program == 'rtnctl':
+            return self._routes, '', 0
+        return '', f"bash: {args[0]}: command not found\n", 127
+
+    def _docker(self, args):
+        if not args:
+            return '', 'Usage: docker COMMAND\n', 1
+        subcommand, rest = args[0], args[1:]
+
+        if subcommand == 'restart':
+            names = [a for a in rest if not a.startswith('-')]
+            unknown = [n for n in names if n not in self.containers]
+            if unknown:
+                return '', f"Error response from daemon: No such container: {unknown[0]}\n", 1
+            if self.restart_time:
+                time.sleep(self.restart_time)
+            with self._lock:
+                for name in names:
+                    self._ready_at[name] = time.monotonic() + self.ready_delay
+            return ''.join(n + '\n' for n in names), '', 0
+
+        if subcommand == 'inspect':
+            # docker inspect [-f FORMAT] NAME，只模拟健康状态
+            names = [a for i, a in enumerate(rest) if not a.startswith('-') and (i == 0 or rest[i - 1] not in ('-f', '--format'))]
+            output = []
+            for name in names:
+                if name not in self.containers:
+                    return '', f"Error: No such object: {name}\n", 1
+                with self._lock:
+                    ready_at = self._ready_at.get(name, 0)
+                output.append('healthy' if time.monotonic() >= ready_at else 'starting')
+            return ''.join(s + '\n' for s in output), '', 0
+
+        if subcommand == 'ps':
+            return ''.join(n + '\n' for n in self.containers), '', 0
+
+        return '', f"docker: '{subcommand}' is not a docker command.\n", 1
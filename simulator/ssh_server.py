@@ -0,0 +1,202 @@
+"""
+模拟SSH服务 - 进程内的SSH服务器，单个服务器用于基准测试，服务器组用于上千节点的规模测试
+"""
+import shlex
+import socket
+import selectors
+import threading
+import paramiko
+from utils.logger import get_logger
+
+logger = get_logger()
+
+# 命令完成后等待客户端关闭通道的最长时间(秒)
+CHANNEL_CLOSE_WAIT = 5
+
+_host_key = None
+_host_key_lock = threading.Lock()
+
+def get_host_key():
+    """进程内共享的SSH主机密钥，生成较慢，只生成一次"""
+    global _host_key
+    with _host_key_lock:
+        if _host_key is None:
+            _host_key = paramiko.RSAKey.generate(2048)
+        return _host_key
+
+def default_command_handler(command):
+    """默认命令处理: echo返回参数，其他命令成功且无输出，返回 (stdout, stderr, 退出码)"""
+    try:
+        args = shlex.split(command)
+    except ValueError:
+        args = command.split()
+    if args and args[0] == 'echo':
+        return ' '.join(args[1:]) + '\n', '', 0
+    return '', '', 0
+
+def _listen(host, port, backlog=128):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    return sock
+
+class _SSHInterface(paramiko.ServerInterface):
+    """接受任意密码认证，每个exec请求调用命令处理函数"""
+
+    def __init__(self, handler):
+        self.handler = handler
+
+    def get_allowed_auths(self, username):
+        return 'password'
+
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind, chanid):
+        if kind == 'session':
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_exec_request(self, channel, command):
+        command = command.decode('utf-8', errors='replace')
+        threading.Thread(target=self._run, args=(channel, command), daemon=True).start()
+        return True
+
+    def _run(self, channel, command):
+        try:
+            stdout, stderr, exit_code = self.handler(command)
+            if stdout:
+                channel.sendall(stdout.encode('utf-8') if isinstance(stdout, str) else stdout)
+            if stderr:
+                channel.sendall_stderr(stderr.encode('utf-8') if isinstance(stderr, str) else stderr)
+            channel.send_exit_status(exit_code)
+            channel.shutdown_write()
+            # exec的应答由传输线程在本方法返回后发出，先于应答关闭通道会导致客户端报错，
+            # 因此只发送EOF，等待客户端关闭通道
+            channel.status_event.wait(CHANNEL_CLOSE_WAIT)
+        except Exception as e:
+            logger.debug(f"模拟SSH命令执行异常: {command}, {e}")
+        finally:
+            channel.close()
+
+class _SSHService:
+    """SSH连接服务的公共部分: 建立传输层并持有会话通道"""
+
+    def __init__(self):
+        self._transports = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def _serve(self, client, handler):
+        # 与sshd一致关闭Nagle算法，否则小包交互会被延迟确认拖慢
+        client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        transport = paramiko.Transport(client)
+        transport.add_server_key(get_host_key())
+        with self._lock:
+            self._transports.add(transport)
+        try:
+            transport.start_server(server=_SSHInterface(handler))
+            # 传输层只弱引用通道，取走已打开的通道并持有到关闭为止，
+            # 否则通道会在exec请求到达前被回收关闭
+            channels = set()
+            while transport.is_active() and not self._stopped.is_set():
+                channel = transport.accept(timeout=1)
+                channels = {c for c in channels if not c.closed}
+                if channel is not None:
+                    channels.add(channel)
+        except Exception as e:
+            logger.debug(f"模拟SSH会话结束: {e}")
+        finally:
+            transport.close()
+            with self._lock:
+                self._transports.discard(transport)
+
+    def _close_transports(self):
+        with self._lock:
+            transports = list(self._transports)
+        for transport in transports:
+            transport.close()
+
+class LocalSSHServer(_SSHService):
+    """进程内SSH服务器"""
+
+    def __init__(self, host='127.0.0.1', port=0, handler=None):
+        super().__init__()
+        self.handler = handler or default_command_handler
+        self._sock = _listen(host, port)
+        self.host, self.port = self._sock.getsockname()
+
+    def start(self):
+        get_host_key()
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        return self
+
+    def _accept_loop(self):
+        while not self._stopped.is_set():
+            try:
+                client, _ = self._sock.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._serve, args=(client, self.handler), daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+        self._sock.close()
+        self._close_transports()
+
+class SSHEndpointGroup(_SSHService):
+    """一组SSH端点，每个端点独立监听端口并使用各自的命令处理函数，
+    所有端口共用一个接受线程，上千个端点也只占用一个线程"""
+
+    def __init__(self, handlers, host='127.0.0.1'):
+        """handlers: {端点名称: 命令处理函数}"""
+        super().__init__()
+        self.host = host
+        self.endpoints = {}
+        self._selector = selectors.DefaultSelector()
+        self._sockets = []
+        try:
+            for name, handler in handlers.items():
+                sock = _listen(host, 0)
+                sock.setblocking(False)
+                self._sockets.append(sock)
+                self._selector.register(sock, selectors.EVENT_READ, handler)
+                self.endpoints[name] = sock.getsockname()
+        except OSError:
+            self._close_sockets()
+            raise
+
+    def start(self):
+        get_host_key()
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        return self
+
+    def _accept_loop(self):
+        while not self._stopped.is_set():
+            try:
+                events = self._selector.select(timeout=0.5)
+            except OSError:
+                break
+            for key, _ in events:
+                try:
+                    client, _ = key.fileobj.accept()
+                except OSError:
+                    continue
+                client.setblocking(True)
+                threading.Thread(target=self._serve, args=(client, key.data), daemon=True).start()
+
+    def _close_sockets(self):
+        for sock in self._sockets:
+            try:
+                self._selector.unregister(sock)
+            except (KeyError, ValueError):
+                pass
+            sock.close()
+        self._sockets = []
+
+    def stop(self):
+        self._stopped.set()
+        self._close_sockets()
+        self._selector.close()
+        self._close_transports()
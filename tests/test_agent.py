@@ -0,0 +1,32 @@
+"""
+Agent用例执行测试
+"""
+import unittest
+from unittest import mock
+from core.agent import Agent
+
+class TestAgentRunCase(unittest.TestCase):
+
+    def test_yaml_instances_share_runner(self):
+        """同一YAML用例的多个参数化实例(文件#实例键)共用一个TestRunner"""
+        agent = Agent("127.0.0.1:1")
+        runners = []
+        with mock.patch('core.agent.run_case_file', side_effect=lambda case, runner=None: runners.append(runner) or True):
+            for index in range(4):
+                self.assertTrue(agent._run_case(f"testcases/adn_demo.yaml#{index}"))
+            agent._run_case("testcases/adn_demo.yaml")
+
+        self.assertIsNotNone(agent._yaml_runner)
+        self.assertEqual(len(runners), 5)
+        self.assertTrue(all(runner is agent._yaml_runner for runner in runners))
+
+    def test_python_case_without_runner(self):
+        """Python用例不创建YAML runner"""
+        agent = Agent("127.0.0.1:1")
+        with mock.patch('core.agent.run_case_file', return_value=True) as run:
+            agent._run_case("testcases/TC_ADN_001.py#TC_ADN_001.test_TC_ADN_001")
+        run.assert_called_once_with("testcases/TC_ADN_001.py#TC_ADN_001.test_TC_ADN_001", runner=None)
+        self.assertIsNone(agent._yaml_runner)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+"""
+变更追踪测试
+"""
+import tempfile
+import unittest
+from pathlib import Path
+from utils.change_tracker import ChangeTracker
+from actions.basic_actions import restart_adn_containers
+
+CASE_FILE = "testcases/adn_demo.yaml"
+
+class TestChangeTracker(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.tracker = ChangeTracker(Path(self.work_dir.name) / "traces.json")
+        self.tracker.begin_case(CASE_FILE)
+        self.tracker.record_aw("重启ADN容器", restart_adn_containers)
+        self.tracker.end_case(True)
+        self.tracker.save()
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def test_aw_records_imported_modules(self):
+        deps = self.tracker.load()[CASE_FILE]['aws']['重启ADN容器']['deps']
+        self.assertIn('utils/restart_pipeline.py', deps)
+        # 间接导入: restart_pipeline -> connection_pool
+        self.assertIn('utils/connection_pool.py', deps)
+
+    def test_unchanged_case_not_selected(self):
+        self.assertIsNone(self.tracker.change_reason(CASE_FILE))
+
+    def test_dependency_change_selects_case(self):
+        self.tracker._file_hashes['utils/restart_pipeline.py'] = 'changed'
+        reason = self.tracker.change_reason(CASE_FILE)
+        self.assertIn('utils/restart_pipeline.py', reason)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+"""
+熔断器测试
+"""
+import unittest
+from utils.circuit_breaker import BreakerRegistry, HostUnavailableError, CLOSED, OPEN, HALF_OPEN
+
+class TestBreakerGuard(unittest.TestCase):
+
+    def setUp(self):
+        self.breakers = BreakerRegistry()
+        self.breaker = self.breakers.get('ssh', 'dut')
+        self.breaker.failure_threshold = 2
+        self.breaker.backoff = self.breaker._current_backoff = 0
+
+    def _fail(self):
+        with self.assertRaises(OSError):
+            with self.breakers.guard('ssh', 'dut', failures=(OSError,)):
+                raise OSError("connection refused")
+
+    def test_other_exception_does_not_reset_failures(self):
+        self._fail()
+        with self.assertRaises(ValueError):
+            with self.breakers.guard('ssh', 'dut', failures=(OSError,)):
+                raise ValueError("bad banner")
+        self.assertEqual(self.breaker.failures, 1)
+        self._fail()
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_other_exception_keeps_half_open(self):
+        self._fail()
+        self._fail()
+        self.assertEqual(self.breaker.state, OPEN)
+        with self.assertRaises(ValueError):
+            with self.breakers.guard('ssh', 'dut', failures=(OSError,)):
+                raise ValueError("bad banner")
+        # 探测名额已归还，仍为半开，下一次调用继续作为探测放行
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        with self.breakers.guard('ssh', 'dut', failures=(OSError,)):
+            pass
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_open_rejects(self):
+        self.breaker.backoff = self.breaker._current_backoff = 60
+        self._fail()
+        self._fail()
+        with self.assertRaises(HostUnavailableError):
+            with self.breakers.guard('ssh', 'dut'):
+                pass
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+"""
+分布式协调器测试
+"""
+import socket
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+from core.coordinator import Coordinator
+from core.protocol import MessageChannel
+
+class TestCoordinator(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.sink = mock.patch('core.coordinator.result_sink').start()
+        self.coordinator = Coordinator(['case.yaml'], port=0, token='secret', max_attempts=2,
+                                       report_file=Path(self.work_dir.name) / 'report.jsonl')
+        self.coordinator.start()
+        self.channels = []
+
+    def tearDown(self):
+        for channel in self.channels:
+            channel.close()
+        self.coordinator.stop()
+        mock.patch.stopall()
+        self.work_dir.cleanup()
+
+    def _register(self, agent_id, token='secret'):
+        channel = MessageChannel(socket.create_connection(('127.0.0.1', self.coordinator.port)))
+        self.channels.append(channel)
+        channel.send('register', agent_id=agent_id, token=token)
+        return channel, channel.receive()
+
+    def test_default_host_is_loopback(self):
+        self.assertEqual(self.coordinator.host, '127.0.0.1')
+        with mock.patch.dict('os.environ', {}, clear=True), \
+             mock.patch('core.protocol.auth_token', return_value=None), \
+             mock.patch('core.coordinator.auth_token', return_value=None):
+            with self.assertRaises(ValueError):
+                Coordinator([], host='0.0.0.0', report_file=Path(self.work_dir.name) / 'other.jsonl')
+
+    def test_invalid_token_rejected(self):
+        _, reply = self._register('intruder', token='wrong')
+        self.assertEqual(reply['type'], 'error')
+        self.assertNotIn('intruder', self.coordinator.agents)
+
+    def test_reassigned_lease_drops_partial_events(self):
+        first, reply = self._register('agent-1')
+        self.assertEqual(reply['type'], 'registered')
+        first.send('request')
+        lease_id = first.receive()['lease_id']
+        first.send('event', lease_id=lease_id, event={'event': 'step', 'aw': '第一次'})
+        first.send('heartbeat')
+        first.close()
+
+        second, _ = self._register('agent-2')
+        second.send('request')
+        assignment = second.receive()
+        while assignment['type'] == 'wait':
+            second.send('request')
+            assignment = second.receive()
+        self.assertEqual(assignment['case'], 'case.yaml')
+        second.send('event', lease_id=assignment['lease_id'], event={'event': 'step', 'aw': '重试'})
+        second.send('result', case='case.yaml', lease_id=assignment['lease_id'], success=True)
+        second.send('request')
+        self.assertEqual(second.receive()['type'], 'shutdown')
+        second.close()
+        self.assertTrue(self.coordinator.wait(timeout=5))
+
+        emitted = [call.args[0].get('aw') for call in self.sink.emit.call_args_list]
+        self.assertEqual(emitted, ['重试'])
+
+if __name__ == '__main__':
+    unittest.main()
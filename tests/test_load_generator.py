@@ -0,0 +1,28 @@
+"""
+API压测测试
+"""
+import unittest
+from framework.call_plan import CallPlan
+from actions.basic_actions import run_api_load
+from simulator.api_server import LocalHTTPServer
+from utils.load_generator import LoadGenerator
+
+class TestLoadGenerator(unittest.TestCase):
+
+    def test_max_requests(self):
+        server = LocalHTTPServer().start()
+        try:
+            report = LoadGenerator(f"{server.base_url}/api/v1/nodes", concurrency=4, max_requests=20).run()
+        finally:
+            server.stop()
+        self.assertEqual(report['requests'], 20)
+
+    def test_yaml_params_converted(self):
+        plan = CallPlan("API压测", run_api_load)
+        params = plan.bind({'endpoint': '/x', 'rate': '200', 'max_requests': '100', 'background': 'false'})
+        self.assertEqual(params['rate'], 200.0)
+        self.assertEqual(params['max_requests'], 100)
+        self.assertIs(params['background'], False)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+"""
+远程日志收集时限测试
+"""
+import time
+import threading
+import unittest
+from unittest import mock
+from utils.log_collector import LogCollector
+from utils.connection_pool import connection_pool
+
+class _HungStream:
+    """远端卡住的输出，连接关闭后才返回"""
+
+    def __init__(self, closed):
+        self.closed = closed
+        self.channel = mock.Mock()
+
+    def read(self, size=-1):
+        self.closed.wait()
+        raise OSError("连接已关闭")
+
+class _HungSSH:
+
+    def __init__(self):
+        self.closed = threading.Event()
+        self.timeouts = []
+
+    def exec_command(self, command, timeout=None):
+        self.timeouts.append(timeout)
+        return mock.Mock(), _HungStream(self.closed), _HungStream(self.closed)
+
+class TestLogCollectorTimeout(unittest.TestCase):
+
+    def test_hung_server_does_not_block(self):
+        ssh = _HungSSH()
+        collector = LogCollector({'timeout': 0.3, 'read_timeout': 5}, [{'container_name': 'adn-api'}])
+        with mock.patch.object(connection_pool, 'get_ssh_connection', return_value=ssh), \
+             mock.patch.object(connection_pool, 'discard', side_effect=lambda kind, name: ssh.closed.set()) as discard:
+            start = time.monotonic()
+            reports = collector.collect(['hung'], label='test')
+            elapsed = time.monotonic() - start
+
+        self.assertLess(elapsed, 2)
+        discard.assert_called_once_with('ssh', 'hung')
+        self.assertEqual(len(reports), 1)
+        self.assertIn('超时', reports[0]['error'])
+        self.assertEqual(ssh.timeouts, [5])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+"""
+重启ADN容器AW的服务器选择测试
+"""
+import unittest
+from unittest import mock
+from actions import basic_actions
+
+CONFIG = {
+    'adn_services': [{'container_name': 'adn-api'}],
+    'adn_restart': {'servers': ['adn_server', 'adn_server_2'], 'rolling': False},
+}
+
+def _report(server):
+    return {'server': server, 'container': 'adn-api', 'success': True, 'restart_time': 1.0, 'ready_time': 2.0, 'error': None}
+
+class TestRestartServers(unittest.TestCase):
+
+    def _restart(self, **kwargs):
+        with mock.patch.object(basic_actions.config_manager, 'get_config', side_effect=CONFIG.get), \
+             mock.patch.object(basic_actions, 'RestartPipeline') as pipeline:
+            pipeline.return_value.run.side_effect = lambda servers, rolling: [_report(s) for s in servers]
+            result = basic_actions.restart_adn_containers(**kwargs)
+        return result, pipeline.return_value.run.call_args.args[0]
+
+    def test_server_name_overrides_config(self):
+        result, servers = self._restart(server_name="other")
+        self.assertTrue(result)
+        self.assertEqual(servers, ["other"])
+
+    def test_servers_argument(self):
+        _, servers = self._restart(servers="a, b")
+        self.assertEqual(servers, ["a", "b"])
+
+    def test_default_uses_config(self):
+        _, servers = self._restart()
+        self.assertEqual(servers, ["adn_server", "adn_server_2"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+"""
+看门狗时限测试
+"""
+import time
+import threading
+import unittest
+from utils.watchdog import Watchdog, StepTimeoutError
+
+class TestWatchdog(unittest.TestCase):
+
+    def setUp(self):
+        self.watchdog = Watchdog()
+
+    def tearDown(self):
+        self.watchdog.end_case()
+
+    def test_worker_threads_reused(self):
+        names = set()
+        for _ in range(20):
+            names.add(self.watchdog.call('线程', lambda: threading.get_ident(), {}, 5))
+        self.assertEqual(len(names), 1)
+
+    def test_nested_call_keeps_case_deadline(self):
+        """AW中嵌套调用的AW在工作线程中仍受用例时限约束"""
+        self.watchdog.begin_case(0.3)
+        limits = []
+
+        def outer():
+            limits.append(self.watchdog.step_limit(60))
+            return 'done'
+
+        self.assertEqual(self.watchdog.call('外层', outer, {}, 60), 'done')
+        self.assertLessEqual(limits[0], 0.3)
+
+    def test_nested_timeout_marks_case(self):
+        """嵌套AW超时被外层AW处理时，用例仍记为有步骤超时"""
+        self.watchdog.begin_case(60)
+
+        def outer():
+            try:
+                self.watchdog.call('内层', lambda: time.sleep(1), {}, 0.1)
+            except StepTimeoutError:
+                return 'handled'
+
+        self.assertEqual(self.watchdog.call('外层', outer, {}, 5), 'handled')
+        self.assertTrue(self.watchdog.end_case())
+
+    def test_zero_timeout_disables_step_limit(self):
+        self.assertIsNone(self.watchdog.step_limit(0))
+        self.assertEqual(self.watchdog.step_limit(5), 5)
+
+if __name__ == '__main__':
+    unittest.main()
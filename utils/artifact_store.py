@@ -0,0 +1,195 @@
+"""
+产物存储 - 超过阈值的AW输出按内容哈希压缩保存到 reports/artifacts/，上下文和日志中只保留句柄
+
+reports/artifacts/objects/<哈希前2位>/<sha256>.gz   gzip压缩的内容，相同内容只保存一份
+reports/artifacts/runs/<run_id>.txt                 每次运行引用的内容哈希，按运行保留
+reports/artifacts/runs/<run_id>/                    每次运行的其他产物，如收集的远程日志
+
+AW输出只在记录结果(result_sink.recording)时转为句柄，未记录结果时YAML上下文保留完整输出；
+BaseTest.call_aw 总是返回完整输出，句柄只写入结果记录
+"""
+import os
+import gzip
+import json
+import shutil
+import hashlib
+import threading
+from utils.logger import get_logger
+from utils.config_manager import config_manager
+from utils.result_store import REPORT_DIR, result_sink
+
+logger = get_logger()
+
+ARTIFACT_DIR = REPORT_DIR / "artifacts"
+DEFAULT_THRESHOLD = 64 * 1024
+DEFAULT_KEEP_RUNS = 20
+
+def _format_size(size):
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:.0f}{unit}" if unit == 'B' else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
+
+class Artifact:
+    """产物句柄，内容在读取时才从磁盘解压，不常驻内存
+
+    kind: text(字符串)、json(字典/列表)、bytes
+    """
+
+    __slots__ = ('digest', 'size', 'kind', 'path')
+
+    def __init__(self, digest, size, kind, path):
+        self.digest = digest
+        self.size = size
+        self.kind = kind
+        self.path = path
+
+    def open(self):
+        """以二进制流方式读取，适合逐行处理大输出"""
+        return gzip.open(self.path, 'rb')
+
+    def read_bytes(self):
+        with self.open() as f:
+            return f.read()
+
+    def text(self):
+        return self.read_bytes().decode('utf-8')
+
+    def load(self):
+        """按保存时的类型还原内容"""
+        if self.kind == 'bytes':
+            return self.read_bytes()
+        if self.kind == 'json':
+            return json.loads(self.read_bytes())
+        return self.text()
+
+    def __str__(self):
+        return f"artifact:sha256:{self.digest[:16]} ({self.kind}, {_format_size(self.size)})"
+
+    __repr__ = __str__
+
+    def __eq__(self, other):
+        return isinstance(other, Artifact) and other.digest == self.digest
+
+    def __hash__(self):
+        return hash(self.digest)
+
+class ArtifactStore:
+    """内容寻址的产物存储"""
+
+    def __init__(self, root=ARTIFACT_DIR):
+        self.root = root
+        self._runs = {}
+        self._lock = threading.Lock()
+
+    def _settings(self):
+        return config_manager.load_config().get('artifacts') or {}
+
+    @property
+    def threshold(self):
+        return self._settings().get('threshold', DEFAULT_THRESHOLD)
+
+    def _object_path(self, digest):
+        return self.root / "objects" / digest[:2] / f"{digest}.gz"
+
+    def _encode(self, value):
+        if isinstance(value, str):
+            return 'text', value.encode('utf-8')
+        if isinstance(value, (bytes, bytearray)):
+            return 'bytes', bytes(value)
+        return 'json', json.dumps(value, ensure_ascii=False, default=str).encode('utf-8')
+
+    def put(self, value, run_id=None):
+        """保存内容并返回句柄，相同内容只写一次"""
+        kind, data = self._encode(value)
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        # 先登记到运行清单再写内容，清理时不会删除正在写入的产物
+        self._reference(run_id or result_sink.run_id or 'adhoc', digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp, 'wb') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6, mtime=0) as f:
+                    f.write(data)
+            os.replace(tmp, path)
+        return Artifact(digest, len(data), kind, path)
+
+    def maybe_store(self, value):
+        """超过阈值的字符串、字节、字典和列表转为句柄，其他值原样返回"""
+        threshold = self.threshold
+        if not threshold:
+            return value
+        if isinstance(value, (str, bytes, bytearray)):
+            size = len(value)
+        elif isinstance(value, (dict, list)):
+            try:
+                size = len(json.dumps(value, ensure_ascii=False, default=str))
+            except (TypeError, ValueError):
+                return value
+        else:
+            return value
+        return self.put(value) if size >= threshold else value
+
+    def get(self, digest, kind='text'):
+        """按内容哈希取句柄"""
+        path = self._object_path(digest)
+        if not path.exists():
+            raise FileNotFoundError(f"产物不存在: {digest}")
+        return Artifact(digest, None, kind, path)
+
+    def run_dir(self, run_id=None):
+        """运行的产物目录(如收集的日志)，与该运行引用的产物一起按保留策略清理"""
+        run_id = run_id or result_sink.run_id or 'adhoc'
+        self._reference(run_id)
+        return self.root / "runs" / run_id
+
+    def _reference(self, run_id, digest=None):
+        """登记运行引用的产物，运行首次登记时创建清单并清理过期运行"""
+        with self._lock:
+            digests = self._runs.get(run_id)
+            first = digests is None
+            if first:
+                digests = self._runs[run_id] = set()
+            new = digest is not None and digest not in digests
+            if first or new:
+                manifest = self.root / "runs" / f"{run_id}.txt"
+                manifest.parent.mkdir(parents=True, exist_ok=True)
+                with open(manifest, 'a', encoding='utf-8') as f:
+                    if new:
+                        digests.add(digest)
+                        f.write(digest + '\n')
+        if first:
+            self.prune()
+
+    def prune(self, keep_runs=None):
+        """只保留最近keep_runs次运行引用的产物，返回删除的文件数"""
+        keep_runs = keep_runs if keep_runs is not None else self._settings().get('keep_runs', DEFAULT_KEEP_RUNS)
+        runs_dir = self.root / "runs"
+        if not keep_runs or not runs_dir.exists():
+            return 0
+        manifests = sorted(runs_dir.glob('*.txt'), key=lambda p: p.stat().st_mtime)
+        expired, kept = manifests[:-keep_runs], manifests[-keep_runs:]
+        if not expired:
+            return 0
+        for manifest in expired:
+            manifest.unlink(missing_ok=True)
+            shutil.rmtree(manifest.with_suffix(''), ignore_errors=True)
+        referenced = set()
+        for manifest in kept:
+            referenced.update(manifest.read_text(encoding='utf-8').split())
+        with self._lock:
+            for digests in self._runs.values():
+                referenced.update(digests)
+        removed = 0
+        for path in (self.root / "objects").glob('*/*.gz'):
+            if path.name[:-3] not in referenced:
+                path.unlink(missing_ok=True)
+                removed += 1
+        if removed:
+            logger.info(f"已清理 {removed} 个过期产物，保留最近 {keep_runs} 次运行")
+        return removed
+
+# 全局产物存储实例
+artifact_store = ArtifactStore()
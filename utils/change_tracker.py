@@ -0,0 +1,263 @@
+"""
+变更追踪器 - 记录每个用例实际调用的AW和读取的配置，按源码变更筛选受影响的用例
+"""
+import ast
+import json
+import atexit
+import inspect
+import hashlib
+import threading
+from pathlib import Path
+import yaml
+from utils.logger import get_logger
+from utils.parametrize import split_case_ref
+
+logger = get_logger()
+
+PROJECT_ROOT = Path(__file__).parent.parent
+TRACE_FILE = PROJECT_ROOT / "reports" / "case_traces.json"
+
+def relative_path(path):
+    """转换为相对项目根目录的路径，项目外的文件保持绝对路径"""
+    path = Path(path).resolve()
+    try:
+        return path.relative_to(PROJECT_ROOT.resolve()).as_posix()
+    except ValueError:
+        return path.as_posix()
+
+def case_key(case):
+    """用例的追踪键，参数化实例按所在文件合并记录"""
+    return relative_path(split_case_ref(case)[0])
+
+class ChangeTracker:
+    """用例调用追踪和变更筛选"""
+
+    def __init__(self, trace_file=TRACE_FILE):
+        self.trace_file = Path(trace_file)
+        self._traces = None
+        self._session = {}      # 本次运行产生的追踪记录
+        self._current = None
+        self._file_hashes = {}
+        self._module_deps = {}
+        self._lock = threading.Lock()
+        self._atexit_registered = False
+
+    # ==================== 哈希 ====================
+
+    def file_hash(self, path):
+        """文件内容哈希，同一进程内缓存"""
+        path = relative_path(path)
+        if path not in self._file_hashes:
+            full_path = PROJECT_ROOT / path
+            try:
+                self._file_hashes[path] = hashlib.sha256(full_path.read_bytes()).hexdigest()
+            except OSError:
+                self._file_hashes[path] = None
+        return self._file_hashes[path]
+
+    def _module_file(self, module):
+        """项目内模块名对应的源文件，项目外的模块返回None"""
+        base = PROJECT_ROOT.joinpath(*module.split('.'))
+        for path in (base.with_suffix('.py'), base / '__init__.py'):
+            if path.is_file():
+                return path
+        return None
+
+    def _imports(self, path):
+        """文件中导入的项目内模块文件(含函数内的延迟导入)"""
+        full_path = PROJECT_ROOT / path
+        try:
+            tree = ast.parse(full_path.read_bytes(), filename=str(full_path))
+        except (OSError, SyntaxError, ValueError):
+            return set()
+        package = list(Path(path).parent.parts)
+        modules = []
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                modules += [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom):
+                parts = package[:len(package) - node.level + 1] if node.level else []
+                base = '.'.join(parts + ([node.module] if node.module else []))
+                if base:
+                    modules.append(base)
+                # from pkg import module 导入的可能是子模块
+                modules += [f"{base}.{alias.name}" if base else alias.name for alias in node.names]
+        files = {self._module_file(module) for module in modules if module}
+        return {relative_path(f) for f in files if f is not None} - {path}
+
+    def module_deps(self, path):
+        """文件直接和间接导入的项目内模块，同一进程内缓存"""
+        path = relative_path(path)
+        if path not in self._module_deps:
+            deps, pending = set(), [path]
+            while pending:
+                for dep in self._imports(pending.pop()):
+                    if dep not in deps and dep != path:
+                        deps.add(dep)
+                        pending.append(dep)
+            self._module_deps[path] = sorted(deps)
+        return self._module_deps[path]
+
+    def config_hash(self, key):
+        """配置段哈希，key形如 servers.adn_server / apis / *"""
+        from utils.config_manager import config_manager
+
+        value = config_manager.load_config()
+        if key != '*':
+            for part in key.split('.'):
+                value = value.get(part) if isinstance(value, dict) else None
+        data = yaml.safe_dump(value, sort_keys=True, allow_unicode=True)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    # ==================== 记录 ====================
+
+    def begin_case(self, case_file):
+        """开始记录用例，同一文件中的多个测试方法和参数化实例合并记录"""
+        case = case_key(case_file)
+        with self._lock:
+            self._current = case
+            self._session.setdefault(case, {
+                'case_hash': self.file_hash(case),
+                'aws': {},
+                'config': {},
+                'files': {},
+                'passed': True,
+            })
+            if not self._atexit_registered:
+                atexit.register(self.save)
+                self._atexit_registered = True
+
+    def end_case(self, success):
+        """结束当前用例记录"""
+        with self._lock:
+            if self._current in self._session:
+                self._session[self._current]['passed'] &= bool(success)
+            self._current = None
+
+    def record_aw(self, aw_name, func):
+        """记录当前用例调用的AW、其源文件及源文件直接和间接导入的项目内模块"""
+        if self._current is None:
+            return
+        try:
+            source = inspect.getsourcefile(inspect.unwrap(func))
+        except TypeError:
+            source = None
+        with self._lock:
+            trace = self._session.get(self._current)
+            if trace is not None and aw_name not in trace['aws']:
+                path = relative_path(source) if source else None
+                trace['aws'][aw_name] = {
+                    'file': path,
+                    'hash': self.file_hash(path) if path else None,
+                    'deps': {dep: self.file_hash(dep) for dep in self.module_deps(path)} if path else {},
+                }
+
+    def record_file(self, path):
+        """记录当前用例依赖的数据文件"""
+        if self._current is None:
+            return
+        path = relative_path(path)
+        with self._lock:
+            trace = self._session.get(self._current)
+            if trace is not None and path not in trace.setdefault('files', {}):
+                trace['files'][path] = self.file_hash(path)
+
+    def record_config(self, key):
+        """记录当前用例读取的配置段"""
+        if self._current is None:
+            return
+        with self._lock:
+            trace = self._session.get(self._current)
+            if trace is not None and key not in trace['config']:
+                trace['config'][key] = self.config_hash(key)
+
+    def pop_trace(self, case_file):
+        """取出本次运行中某个用例的追踪记录，用于回传给协调器"""
+        with self._lock:
+            return self._session.pop(case_key(case_file), None)
+
+    def update(self, case_file, trace):
+        """合并外部（如分布式Agent）回传的追踪记录"""
+        if trace:
+            with self._lock:
+                existing = self._session.get(case_key(case_file))
+                if existing is not None:
+                    # 同一文件的多个实例可能由不同Agent执行，合并调用记录和结果
+                    for field in ('aws', 'config', 'files'):
+                        trace[field] = {**existing.get(field, {}), **trace.get(field, {})}
+                    trace['passed'] = existing.get('passed', False) and trace.get('passed', False)
+                self._session[case_key(case_file)] = trace
+                if not self._atexit_registered:
+                    atexit.register(self.save)
+                    self._atexit_registered = True
+
+    # ==================== 存储 ====================
+
+    def load(self):
+        """加载历史追踪记录"""
+        if self._traces is None:
+            try:
+                with open(self.trace_file, 'r', encoding='utf-8') as f:
+                    self._traces = json.load(f)
+            except FileNotFoundError:
+                self._traces = {}
+            except Exception as e:
+                logger.warning(f"用例追踪记录加载失败, 将执行全部用例: {e}")
+                self._traces = {}
+        return self._traces
+
+    def save(self):
+        """将本次运行的追踪记录合并保存"""
+        with self._lock:
+            if not self._session:
+                return
+            traces = self.load()
+            traces.update(self._session)
+            self._session = {}
+        self.trace_file.parent.mkdir(exist_ok=True)
+        tmp_file = self.trace_file.with_suffix('.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(traces, f, ensure_ascii=False, indent=1, sort_keys=True)
+        tmp_file.replace(self.trace_file)
+
+    # ==================== 筛选 ====================
+
+    def change_reason(self, case_file):
+        """判断用例是否受变更影响，返回原因，未受影响返回None"""
+        case = case_key(case_file)
+        trace = self.load().get(case)
+        if trace is None:
+            return "无历史追踪记录"
+        if not trace.get('passed', False):
+            return "上次执行失败"
+        if trace.get('case_hash') != self.file_hash(case):
+            return "用例文件已修改"
+        for aw_name, aw in trace.get('aws', {}).items():
+            if aw.get('file') is None or aw.get('hash') != self.file_hash(aw['file']):
+                return f"AW '{aw_name}' 所在模块 {aw.get('file')} 已修改"
+            if 'deps' not in aw:
+                return f"AW '{aw_name}' 的追踪记录没有依赖模块"
+            for path, digest in aw['deps'].items():
+                if digest != self.file_hash(path):
+                    return f"AW '{aw_name}' 依赖的模块 {path} 已修改"
+        for path, digest in trace.get('files', {}).items():
+            if digest != self.file_hash(path):
+                return f"数据文件 {path} 已修改"
+        for key, digest in trace.get('config', {}).items():
+            if digest != self.config_hash(key):
+                return f"配置 {key} 已修改"
+        return None
+
+    def select_changed(self, case_files):
+        """筛选受变更影响的用例"""
+        selected = []
+        for case_file in case_files:
+            reason = self.change_reason(case_file)
+            if reason:
+                logger.info(f"选中用例: {case_file} ({reason})")
+                selected.append(case_file)
+        logger.info(f"增量筛选: {len(selected)}/{len(case_files)} 个用例受变更影响")
+        return selected
+
+# 全局变更追踪器实例
+change_tracker = ChangeTracker()
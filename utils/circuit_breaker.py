@@ -0,0 +1,160 @@
+"""
+熔断器 - 按主机记录连接失败，连续失败后快速失败，避免每次调用都等待完整的连接超时
+
+closed: 正常连接；连续失败达到阈值后进入open
+open: 直接抛出HostUnavailableError，退避时间到后进入half_open
+half_open: 放行一次探测连接，成功则恢复closed，失败则以加倍的退避时间重新open
+"""
+import time
+import threading
+from contextlib import contextmanager
+from utils.logger import get_logger
+from utils.config_manager import config_manager
+
+logger = get_logger()
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+class HostUnavailableError(ConnectionError):
+    """目标主机处于熔断状态，调用被快速拒绝"""
+
+class CircuitBreaker:
+    """单个主机的熔断器
+
+    Args:
+        name: 主机标识，如 ssh:adn_server
+        failure_threshold: 连续失败多少次后熔断
+        backoff: 首次熔断的退避时间(秒)，之后每次重新熔断加倍
+        max_backoff: 退避时间上限(秒)
+    """
+
+    def __init__(self, name, failure_threshold=3, backoff=5.0, max_backoff=300.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.state = CLOSED
+        self.failures = 0
+        self.opened = 0
+        self.rejected = 0
+        self.last_error = None
+        self._retry_at = 0.0
+        self._current_backoff = backoff
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """调用前检查，熔断中抛出HostUnavailableError"""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            now = time.monotonic()
+            if self.state == OPEN and now >= self._retry_at:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN and not self._probing:
+                # 半开状态只放行一个探测调用，其余调用继续快速失败
+                self._probing = True
+                logger.info(f"熔断器半开，探测连接: {self.name}")
+                return
+            self.rejected += 1
+            retry_in = max(0.0, self._retry_at - now)
+            raise HostUnavailableError(f"主机不可用: {self.name} 连续连接失败已熔断，"
+                                       f"{retry_in:.0f}秒后重试，最近错误: {self.last_error}")
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"熔断器恢复: {self.name}")
+            self.state = CLOSED
+            self.failures = 0
+            self._probing = False
+            self._current_backoff = self.backoff
+
+    def release_probe(self):
+        """探测调用未能判断连通性时归还探测名额，不改变熔断状态和失败计数"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self, error):
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error)
+            if self.state == HALF_OPEN:
+                self._current_backoff = min(self._current_backoff * 2, self.max_backoff)
+                self._open()
+            elif self.state == CLOSED and self.failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened += 1
+        self._probing = False
+        self._retry_at = time.monotonic() + self._current_backoff
+        logger.warning(f"熔断器打开: {self.name}, 连续失败 {self.failures} 次, {self._current_backoff:.0f}秒后重试")
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'failures': self.failures,
+                'opened': self.opened,
+                'rejected': self.rejected,
+                'retry_in': round(max(0.0, self._retry_at - time.monotonic()), 1) if self.state != CLOSED else 0,
+                'last_error': self.last_error,
+            }
+
+class BreakerRegistry:
+    """熔断器集合，按 类型:名称 区分主机，参数取自配置 circuit_breaker"""
+
+    def __init__(self):
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, kind, name):
+        key = f"{kind}:{name}"
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(key)
+                if breaker is None:
+                    settings = config_manager.load_config().get('circuit_breaker') or {}
+                    breaker = CircuitBreaker(
+                        key,
+                        failure_threshold=settings.get('failure_threshold', 3),
+                        backoff=settings.get('backoff', 5),
+                        max_backoff=settings.get('max_backoff', 300)
+                    )
+                    self._breakers[key] = breaker
+        return breaker
+
+    @contextmanager
+    def guard(self, kind, name, failures=(Exception,)):
+        """包裹一次连接操作，failures中的异常计为连接失败"""
+        breaker = self.get(kind, name)
+        breaker.before_call()
+        try:
+            yield breaker
+        except failures as e:
+            breaker.record_failure(e)
+            raise
+        except BaseException:
+            # 非连接类异常不能证明连接正常，不改变熔断状态，只归还半开状态的探测名额
+            breaker.release_probe()
+            raise
+        else:
+            breaker.record_success()
+
+    def metrics(self):
+        """出现过连接失败的主机的熔断状态，写入运行结果的metrics"""
+        with self._lock:
+            breakers = list(self._breakers.values())
+        snapshots = {b.name: b.snapshot() for b in breakers}
+        return {name: s for name, s in snapshots.items() if s['opened'] or s['failures']}
+
+    def reset(self):
+        with self._lock:
+            self._breakers.clear()
+
+# 全局熔断器实例
+breakers = BreakerRegistry()
@@ -1,12 +1,27 @@
 """
 配置管理器 - 统一管理配置加载
 """
+import os
 import yaml
 from pathlib import Path
 from utils.logger import get_logger
+from utils.change_tracker import change_tracker
 
 logger = get_logger()
 
+# 覆盖配置文件路径，加载时合并到 config.yaml 之上（如模拟实验室生成的配置）
+OVERLAY_ENV = "NETAUTOTEST_CONFIG_OVERLAY"
+
+def merge_config(base, overlay):
+    """递归合并配置，字典逐键合并，其他类型以overlay为准"""
+    merged = dict(base or {})
+    for key, value in (overlay or {}).items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_config(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
 class ConfigManager:
     _instance = None
     _config = None
@@ -22,16 +37,33 @@ class ConfigManager:
             config_file = Path(__file__).parent.parent / "config" / "config.yaml"
             try:
                 with open(config_file, 'r', encoding='utf-8') as f:
-                    self._config = yaml.safe_load(f)
+                    config = yaml.safe_load(f)
+                overlay_file = os.environ.get(OVERLAY_ENV)
+                if overlay_file:
+                    with open(overlay_file, 'r', encoding='utf-8') as f:
+                        config = merge_config(config, yaml.safe_load(f))
+                    logger.info(f"已合并覆盖配置: {overlay_file}")
+                self._config = config
                 logger.info("配置文件加载成功")
             except Exception as e:
                 logger.error(f"配置文件加载失败: {e}")
                 raise
         return self._config
     
+    def apply_overlay(self, overlay):
+        """将覆盖配置合并到当前配置之上"""
+        self._config = merge_config(self.load_config(), overlay)
+        logger.info("已合并覆盖配置")
+    
+    def use_config(self, config):
+        """替换当前配置，用于基准测试等本地替身环境"""
+        self._config = config
+        logger.info("已切换为指定配置")
+    
     def get_server_config(self, server_name):
         """获取服务器配置"""
         config = self.load_config()
+        change_tracker.record_config(f"servers.{server_name}")
         if server_name not in config.get('servers', {}):
             raise ValueError(f"未找到服务器配置: {server_name}")
         return config['servers'][server_name]
@@ -39,6 +71,7 @@ class ConfigManager:
     def get_database_config(self, db_name):
         """获取数据库配置"""
         config = self.load_config()
+        change_tracker.record_config(f"databases.{db_name}")
         if db_name not in config.get('databases', {}):
             raise ValueError(f"未找到数据库配置: {db_name}")
         return config['databases'][db_name]
@@ -46,6 +79,7 @@ class ConfigManager:
     def get_config(self, section=None):
         """获取配置"""
         config = self.load_config()
+        change_tracker.record_config(section or '*')
         return config.get(section) if section else config
 
 # 全局配置管理器实例
@@ -1,77 +1,215 @@
 """
 连接池管理器 - 复用SSH和数据库连接
 """
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import paramiko
 import pymysql
 from utils.logger import get_logger
 from utils.config_manager import config_manager
+from utils.circuit_breaker import breakers
 
 logger = get_logger()
 
+BROKER_ENV = "NETAUTOTEST_BROKER"
+
+def broker_settings():
+    """连接代理配置，环境变量 NETAUTOTEST_BROKER=1 可在不修改配置文件的情况下启用"""
+    settings = config_manager.load_config().get('broker') or {}
+    enabled = settings.get('enabled', False)
+    if os.environ.get(BROKER_ENV):
+        enabled = os.environ[BROKER_ENV].lower() not in ('0', 'false', 'no', 'off')
+    return {
+        'enabled': bool(enabled),
+        'socket': settings.get('socket') or None,
+        'auto_start': settings.get('auto_start', True),
+        'idle_timeout': settings.get('idle_timeout', 1800),
+    }
+
 class ConnectionPool:
+    """SSH和数据库连接池，可在多个线程中使用，同一连接只建立一次"""
+
     def __init__(self):
         self.ssh_connections = {}
         self.db_connections = {}
+        self._local = threading.local()
+        self._broker_client = None
+        self._lock = threading.Lock()
+        self._connect_locks = {}
     
-    def get_ssh_connection(self, server_name):
-        """获取SSH连接"""
-        if server_name not in self.ssh_connections:
+    def _connect_lock(self, kind, name):
+        """每个连接一把锁，不同连接可并行建立，同一连接的并发请求等待首个请求的结果"""
+        with self._lock:
+            return self._connect_locks.setdefault((kind, name), threading.Lock())
+    
+    def track(self, used):
+        """将当前线程获取的连接记录到used集合，元素为 (类型, 名称)，None停止记录"""
+        self._local.used = used
+    
+    def tracking(self):
+        """当前线程的连接记录集合，工作线程中调用track(集合)以继续记录到发起线程的集合"""
+        return getattr(self._local, 'used', None)
+    
+    def _record_use(self, kind, name):
+        used = getattr(self._local, 'used', None)
+        if used is not None:
+            used.add((kind, name))
+    
+    def connect_ssh(self, server_name, server_config=None):
+        """新建SSH连接，不放入连接池"""
+        if server_config is None:
             server_config = config_manager.get_server_config(server_name)
-            try:
-                ssh = paramiko.SSHClient()
-                ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-                ssh.connect(
-                    hostname=server_config['ip'],
-                    port=server_config.get('port', 22),
-                    username=server_config['username'],
-                    password=server_config['password'],
-                    timeout=10
-                )
-                self.ssh_connections[server_name] = ssh
-                logger.debug(f"SSH连接已建立: {server_name}")
-            except Exception as e:
-                logger.error(f"SSH连接失败: {server_name}, {e}")
-                raise
-        return self.ssh_connections[server_name]
+        # 主机连续连接失败时熔断，直接失败而不再等待连接超时
+        with breakers.guard('ssh', server_name):
+            ssh = paramiko.SSHClient()
+            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            ssh.connect(
+                hostname=server_config['ip'],
+                port=server_config.get('port', 22),
+                username=server_config['username'],
+                password=server_config['password'],
+                timeout=10
+            )
+        return ssh
     
-    def get_db_connection(self, db_name):
-        """获取数据库连接"""
-        if db_name not in self.db_connections:
+    def connect_db(self, db_name, db_config=None):
+        """新建数据库连接，不放入连接池"""
+        if db_config is None:
             db_config = config_manager.get_database_config(db_name)
+        with breakers.guard('db', db_name):
+            return pymysql.connect(
+                host=db_config['host'],
+                port=db_config.get('port', 3306),
+                user=db_config['username'],
+                password=db_config['password'],
+                database=db_config['database'],
+                connect_timeout=10
+            )
+    
+    def _broker(self):
+        """启用连接代理时返回代理客户端，否则返回None"""
+        settings = broker_settings()
+        if not settings['enabled']:
+            return None
+        with self._lock:
+            if self._broker_client is None:
+                from core.broker import BrokerClient
+                self._broker_client = BrokerClient(settings['socket'], settings['auto_start'], settings['idle_timeout'])
+            return self._broker_client
+    
+    def get_ssh_connection(self, server_name):
+        """获取SSH连接，启用连接代理时返回由代理进程执行命令的代理对象"""
+        self._record_use('ssh', server_name)
+        ssh = self.ssh_connections.get(server_name)
+        if ssh is not None:
+            return ssh
+        with self._connect_lock('ssh', server_name):
+            if server_name not in self.ssh_connections:
+                server_config = config_manager.get_server_config(server_name)
+                try:
+                    broker = self._broker()
+                    if broker is not None:
+                        self.ssh_connections[server_name] = broker.ssh_client(server_name, server_config)
+                    else:
+                        self.ssh_connections[server_name] = self.connect_ssh(server_name, server_config)
+                    logger.debug(f"SSH连接已建立: {server_name}")
+                except Exception as e:
+                    logger.error(f"SSH连接失败: {server_name}, {e}")
+                    raise
+            return self.ssh_connections[server_name]
+    
+    def get_db_connection(self, db_name):
+        """获取数据库连接，启用连接代理时返回由代理进程执行SQL的代理对象"""
+        self._record_use('db', db_name)
+        conn = self.db_connections.get(db_name)
+        if conn is not None:
+            return conn
+        with self._connect_lock('db', db_name):
+            if db_name not in self.db_connections:
+                db_config = config_manager.get_database_config(db_name)
+                try:
+                    broker = self._broker()
+                    if broker is not None:
+                        self.db_connections[db_name] = broker.db_connection(db_name, db_config)
+                    else:
+                        self.db_connections[db_name] = self.connect_db(db_name, db_config)
+                    logger.debug(f"数据库连接已建立: {db_name}")
+                except Exception as e:
+                    logger.error(f"数据库连接失败: {db_name}, {e}")
+                    raise
+            return self.db_connections[db_name]
+    
+    def _warm(self, kind, name):
+        if kind == 'ssh':
+            conn = self.get_ssh_connection(name)
+            if not isinstance(conn, paramiko.SSHClient):
+                # 代理对象在首次使用时才由代理进程建立连接
+                stdin, stdout, stderr = conn.exec_command(':')
+                stdout.channel.recv_exit_status()
+        else:
+            conn = self.get_db_connection(name)
+            if not isinstance(conn, pymysql.connections.Connection):
+                cursor = conn.cursor()
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+    
+    def prewarm(self, ssh=(), db=(), max_workers=16):
+        """
+        并行建立并认证SSH和数据库连接
+        
+        Returns:
+            dict: {(类型, 名称): 错误信息}，成功的连接为None
+        """
+        targets = [('ssh', name) for name in ssh] + [('db', name) for name in db]
+        if not targets:
+            return {}
+        
+        def warm(target):
             try:
-                conn = pymysql.connect(
-                    host=db_config['host'],
-                    port=db_config.get('port', 3306),
-                    user=db_config['username'],
-                    password=db_config['password'],
-                    database=db_config['database'],
-                    connect_timeout=10
-                )
-                self.db_connections[db_name] = conn
-                logger.debug(f"数据库连接已建立: {db_name}")
+                self._warm(*target)
+                return None
             except Exception as e:
-                logger.error(f"数据库连接失败: {db_name}, {e}")
-                raise
-        return self.db_connections[db_name]
+                return str(e) or type(e).__name__
+        
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(targets))) as executor:
+            return dict(zip(targets, executor.map(warm, targets)))
+    
+    def discard(self, kind, name):
+        """关闭并移除指定连接，阻塞在该连接上的操作随之返回，下次获取时重新建立"""
+        connections = self.ssh_connections if kind == 'ssh' else self.db_connections
+        with self._lock:
+            conn = connections.pop(name, None)
+        if conn is None:
+            return
+        try:
+            conn.close()
+            logger.debug(f"连接已关闭: {kind} {name}")
+        except Exception:
+            pass
     
     def close_all(self):
         """关闭所有连接"""
-        for name, ssh in self.ssh_connections.items():
+        with self._lock:
+            ssh_connections, self.ssh_connections = self.ssh_connections, {}
+            db_connections, self.db_connections = self.db_connections, {}
+        for name, ssh in ssh_connections.items():
             try:
                 ssh.close()
                 logger.debug(f"SSH连接已关闭: {name}")
             except:
                 pass
         
-        for name, conn in self.db_connections.items():
+        for name, conn in db_connections.items():
             try:
                 conn.close()
                 logger.debug(f"数据库连接已关闭: {name}")
             except:
                 pass
         
-        self.ssh_connections.clear()
-        self.db_connections.clear()
+        if self._broker_client is not None:
+            # 只断开与代理进程的通道，代理进程中的连接保持可用
+            self._broker_client.close()
 
 # 全局连接池实例
 connection_pool = ConnectionPool()
\ No newline at end of file
@@ -0,0 +1,363 @@
+"""
+iperf结果分析 - 将多次iperf3 JSON结果转为NumPy数组，统计吞吐量百分位、重传率、抖动/丢包和区间稳定性，
+并与按组网(topology)保存的基线比较，给出可解释的通过/失败结论
+
+每次分析的结果按组网记录到 reports/results.db 的 iperf_runs 表，只保存指标和区间吞吐量，
+历史趋势和基线计算不需要重新解析原始JSON。
+
+用法:
+    python -m utils.iperf_analytics -t 2node-10g                  # 最近的运行与基线比较，退化时返回非0
+    python -m utils.iperf_analytics -t 2node-10g --save-baseline  # 用最近的历史运行生成基线
+"""
+import sys
+import json
+import time
+import sqlite3
+import argparse
+from pathlib import Path
+import numpy as np
+from utils.logger import get_logger
+from utils.config_manager import config_manager
+from utils.result_store import RESULT_DB, result_sink
+
+logger = get_logger()
+
+PROJECT_DIR = Path(__file__).parent.parent
+DEFAULT_BASELINE_FILE = "config/iperf_baseline.json"
+DEFAULT_MSS = 1448
+METRICS = ('throughput', 'retransmits', 'retransmit_rate', 'jitter_ms', 'lost_percent', 'cv')
+PERCENTILES = (5, 50, 95, 99)
+
+# 基线比较项: (指标, 统计量, 方向)，方向1表示越大越好，-1表示越小越好
+CHECKS = (
+    ('throughput', 'p50', 1),
+    ('throughput', 'p5', 1),
+    ('retransmit_rate', 'p95', -1),
+    ('jitter_ms', 'p95', -1),
+    ('lost_percent', 'p95', -1),
+    ('cv', 'p95', -1),
+)
+DEFAULT_TOLERANCE = {'throughput': 0.1, 'retransmit_rate': 0.5, 'jitter_ms': 0.5, 'lost_percent': 0.5, 'cv': 0.5}
+# 越小越好的指标在基线接近0时，相对容差没有意义，另加绝对余量
+DEFAULT_SLACK = {'retransmit_rate': 0.01, 'jitter_ms': 0.05, 'lost_percent': 0.1, 'cv': 0.02}
+
+METRIC_NAMES = {
+    'throughput': '吞吐量', 'retransmits': '重传次数', 'retransmit_rate': '重传率(%)',
+    'jitter_ms': '抖动(ms)', 'lost_percent': '丢包率(%)', 'cv': '区间吞吐量变异系数',
+}
+
+def _settings():
+    return config_manager.load_config().get('iperf_analytics') or {}
+
+def format_value(metric, value):
+    if value is None:
+        return '-'
+    if metric == 'throughput':
+        for unit, scale in (('Gbps', 1e9), ('Mbps', 1e6), ('Kbps', 1e3)):
+            if abs(value) >= scale:
+                return f"{value / scale:.2f}{unit}"
+        return f"{value:.0f}bps"
+    return f"{value:.4g}"
+
+def parse_iperf(result):
+    """
+    解析单次iperf3 -J 的输出
+
+    Args:
+        result: JSON字符串、字典或产物句柄
+
+    Returns:
+        (指标字典, 区间吞吐量列表)，iperf报错时抛出ValueError
+    """
+    if hasattr(result, 'load'):
+        result = result.load()
+    data = json.loads(result) if isinstance(result, (str, bytes)) else result
+    if not isinstance(data, dict):
+        raise ValueError("iperf结果不是JSON对象")
+    if data.get('error'):
+        raise ValueError(f"iperf报错: {data['error']}")
+    start, end = data.get('start') or {}, data.get('end') or {}
+    udp = (start.get('test_start') or {}).get('protocol') == 'UDP' or 'jitter_ms' in (end.get('sum') or {})
+    nan = float('nan')
+    if udp:
+        total = end.get('sum_received') or end.get('sum') or {}
+        udp_sum = end.get('sum') or {}
+        row = {'protocol': 'UDP', 'throughput': total.get('bits_per_second', nan), 'retransmits': nan,
+               'retransmit_rate': nan, 'jitter_ms': udp_sum.get('jitter_ms', nan),
+               'lost_percent': udp_sum.get('lost_percent', nan)}
+    else:
+        sent = end.get('sum_sent') or {}
+        received = end.get('sum_received') or sent
+        retransmits = sent.get('retransmits', nan)
+        mss = start.get('tcp_mss') or start.get('tcp_mss_default') or DEFAULT_MSS
+        segments = (sent.get('bytes') or 0) / mss
+        row = {'protocol': 'TCP', 'throughput': received.get('bits_per_second', nan), 'retransmits': retransmits,
+               'retransmit_rate': 100.0 * retransmits / segments if segments else nan,
+               'jitter_ms': nan, 'lost_percent': nan}
+    intervals = [i['sum']['bits_per_second'] for i in data.get('intervals') or []
+                 if i.get('sum') and not i['sum'].get('omitted')]
+    return row, intervals
+
+class IperfRuns:
+    """多次iperf运行的指标数组，每个指标为长度n的float64数组，缺失值为NaN
+
+    intervals为 (n, 最大区间数) 的二维数组，区间数不足的运行以NaN补齐
+    """
+
+    COLUMNS = ('throughput', 'retransmits', 'retransmit_rate', 'jitter_ms', 'lost_percent')
+
+    def __init__(self, columns, intervals, times=None, protocols=None):
+        self.columns = {name: np.asarray(columns[name], dtype=float) for name in self.COLUMNS}
+        self.intervals = intervals
+        self.times = np.asarray(times if times is not None else [np.nan] * len(self), dtype=float)
+        self.protocols = list(protocols or [])
+
+    def __len__(self):
+        return len(self.columns['throughput'])
+
+    @staticmethod
+    def _pad(interval_lists):
+        width = max((len(x) for x in interval_lists), default=0)
+        matrix = np.full((len(interval_lists), width), np.nan)
+        for i, values in enumerate(interval_lists):
+            matrix[i, :len(values)] = values
+        return matrix
+
+    @classmethod
+    def from_rows(cls, rows, interval_lists, times=None):
+        columns = {name: [row.get(name, np.nan) for row in rows] for name in cls.COLUMNS}
+        return cls(columns, cls._pad(interval_lists), times, [row.get('protocol') for row in rows])
+
+    @classmethod
+    def from_results(cls, results):
+        """解析多次iperf结果，报错的结果跳过，返回 (IperfRuns, 错误列表)"""
+        rows, interval_lists, errors = [], [], []
+        for index, result in enumerate(results):
+            try:
+                row, intervals = parse_iperf(result)
+            except (ValueError, TypeError, KeyError) as e:
+                errors.append(f"第{index + 1}个结果: {e}")
+                continue
+            rows.append(row)
+            interval_lists.append(intervals)
+        return cls.from_rows(rows, interval_lists), errors
+
+    @property
+    def cv(self):
+        """每次运行区间吞吐量的变异系数(标准差/均值)，越大越不稳定"""
+        values = self.intervals
+        counts = np.sum(~np.isnan(values), axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.nansum(values, axis=1) / counts
+            std = np.sqrt(np.nansum((values - mean[:, None]) ** 2, axis=1) / counts)
+            cv = std / mean
+        cv[counts < 2] = np.nan
+        return cv
+
+    def metric(self, name):
+        return self.cv if name == 'cv' else self.columns[name]
+
+    def summary(self):
+        """各指标的统计: 样本数、均值、标准差、最小/最大值和百分位"""
+        result = {'runs': len(self)}
+        for name in METRICS:
+            values = self.metric(name)
+            values = values[~np.isnan(values)]
+            if not len(values):
+                continue
+            stats = {'count': int(len(values)), 'mean': float(values.mean()), 'std': float(values.std()),
+                     'min': float(values.min()), 'max': float(values.max())}
+            for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+                stats[f'p{p}'] = float(value)
+            result[name] = stats
+        return result
+
+class IperfHistory:
+    """按组网保存的iperf历史指标，存放在结果库的 iperf_runs 表"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS iperf_runs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, topology TEXT, run_id TEXT, time REAL, protocol TEXT,
+        throughput REAL, retransmits REAL, retransmit_rate REAL, jitter_ms REAL, lost_percent REAL,
+        intervals BLOB
+    );
+    CREATE INDEX IF NOT EXISTS idx_iperf_topology ON iperf_runs(topology, time);
+    """
+
+    def __init__(self, path=RESULT_DB):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self.SCHEMA)
+
+    def record(self, topology, runs, run_id=None):
+        """记录一批运行的指标"""
+        now = time.time()
+        rows = []
+        for i in range(len(runs)):
+            intervals = runs.intervals[i]
+            intervals = intervals[~np.isnan(intervals)]
+            rows.append((topology, run_id or result_sink.run_id, now, runs.protocols[i] if runs.protocols else None,
+                         *(None if np.isnan(runs.columns[name][i]) else float(runs.columns[name][i])
+                           for name in IperfRuns.COLUMNS),
+                         intervals.astype('<f8').tobytes()))
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO iperf_runs (topology, run_id, time, protocol, throughput, retransmits, retransmit_rate, "
+                "jitter_ms, lost_percent, intervals) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def load(self, topology, limit=None, since=None):
+        """加载组网最近limit次(或since之后)的运行，按时间先后排列"""
+        sql = ("SELECT time, protocol, throughput, retransmits, retransmit_rate, jitter_ms, lost_percent, intervals "
+               "FROM iperf_runs WHERE topology = ?")
+        args = [topology]
+        if since is not None:
+            sql += " AND time >= ?"
+            args.append(since)
+        sql += " ORDER BY time DESC, id DESC"
+        if limit:
+            sql += " LIMIT ?"
+            args.append(int(limit))
+        rows = self._conn.execute(sql, args).fetchall()[::-1]
+        numeric = np.array([row[2:7] for row in rows], dtype=float).reshape(len(rows), len(IperfRuns.COLUMNS))
+        columns = {name: numeric[:, i] for i, name in enumerate(IperfRuns.COLUMNS)}
+        intervals = IperfRuns._pad([np.frombuffer(row[7] or b'', dtype='<f8') for row in rows])
+        return IperfRuns(columns, intervals, [row[0] for row in rows], [row[1] for row in rows])
+
+    def topologies(self):
+        return [row[0] for row in self._conn.execute(
+            "SELECT topology, COUNT(*) FROM iperf_runs GROUP BY topology ORDER BY topology")]
+
+    def close(self):
+        self._conn.close()
+
+def baseline_path(path=None):
+    path = Path(path or _settings().get('baseline_file') or DEFAULT_BASELINE_FILE)
+    return path if path.is_absolute() else PROJECT_DIR / path
+
+def load_baseline(topology, path=None):
+    """读取组网的基线统计，不存在时返回None"""
+    try:
+        with open(baseline_path(path), 'r', encoding='utf-8') as f:
+            return json.load(f).get(topology)
+    except FileNotFoundError:
+        return None
+
+def save_baseline(topology, runs, path=None):
+    """将一批运行的统计保存为组网的基线"""
+    path = baseline_path(path)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            baselines = json.load(f)
+    except FileNotFoundError:
+        baselines = {}
+    summary = runs.summary()
+    summary['created'] = time.strftime('%Y-%m-%d %H:%M:%S')
+    baselines[topology] = summary
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baselines, f, ensure_ascii=False, indent=2, sort_keys=True)
+    return summary
+
+def evaluate(runs, baseline, tolerance=None, slack=None):
+    """
+    与基线比较
+
+    Args:
+        runs: 本次的IperfRuns
+        baseline: 基线统计(IperfRuns.summary的结果)，None表示没有基线
+        tolerance: 各指标的相对容差，默认读取 iperf_analytics.tolerance
+        slack: 越小越好的指标的绝对余量，默认读取 iperf_analytics.slack
+
+    Returns:
+        dict: passed、每个比较项的基线值/当前值/界限以及结论说明
+    """
+    settings = _settings()
+    tolerance = {**DEFAULT_TOLERANCE, **(settings.get('tolerance') or {}), **(tolerance or {})}
+    slack = {**DEFAULT_SLACK, **(settings.get('slack') or {}), **(slack or {})}
+    current = runs.summary()
+    verdict = {'passed': True, 'runs': len(runs), 'summary': current, 'checks': [], 'reasons': []}
+    if not len(runs):
+        verdict['passed'] = False
+        verdict['reasons'].append("没有可分析的iperf结果")
+        return verdict
+    if not baseline:
+        verdict['reasons'].append("没有基线，未比较")
+        return verdict
+
+    for metric, stat, direction in CHECKS:
+        base = (baseline.get(metric) or {}).get(stat)
+        value = (current.get(metric) or {}).get(stat)
+        if base is None or value is None:
+            continue
+        tol = tolerance.get(metric, 0)
+        if direction > 0:
+            limit = base * (1 - tol)
+            passed = value >= limit
+        else:
+            limit = base * (1 + tol) + slack.get(metric, 0)
+            passed = value <= limit
+        check = {'metric': metric, 'stat': stat, 'baseline': base, 'value': value, 'limit': limit,
+                 'change': (value - base) / base if base else None, 'passed': passed}
+        verdict['checks'].append(check)
+        if not passed:
+            verdict['passed'] = False
+            relation = "低于下限" if direction > 0 else "超过上限"
+            verdict['reasons'].append(
+                f"{METRIC_NAMES[metric]} {stat} {format_value(metric, value)} {relation} {format_value(metric, limit)}"
+                f"(基线 {format_value(metric, base)}, 容差 {tol:.0%})")
+    if verdict['passed']:
+        verdict['reasons'].append(f"{len(verdict['checks'])} 项指标均在基线容差范围内")
+    return verdict
+
+def log_verdict(topology, verdict):
+    current = verdict['summary']
+    throughput = current.get('throughput') or {}
+    logger.info(f"iperf分析 [{topology}]: {verdict['runs']} 次运行, 吞吐量 p5 {format_value('throughput', throughput.get('p5'))} "
+                f"p50 {format_value('throughput', throughput.get('p50'))} p95 {format_value('throughput', throughput.get('p95'))}")
+    for check in verdict['checks']:
+        mark = "✓" if check['passed'] else "✗"
+        change = f"{check['change']:+.1%}" if check['change'] is not None else '-'
+        logger.info(f"  {mark} {METRIC_NAMES[check['metric']]} {check['stat']}: {format_value(check['metric'], check['value'])} "
+                    f"(基线 {format_value(check['metric'], check['baseline'])}, {change}, "
+                    f"界限 {format_value(check['metric'], check['limit'])})")
+    for reason in verdict['reasons']:
+        (logger.info if verdict['passed'] else logger.error)(f"  {reason}")
+
+def main():
+    parser = argparse.ArgumentParser(description='iperf结果趋势分析和基线比较')
+    parser.add_argument('-t', '--topology', help='组网名称，默认读取 iperf_analytics.topology')
+    parser.add_argument('-n', '--window', type=int, default=None, help='与基线比较的最近运行次数，默认20')
+    parser.add_argument('--save-baseline', action='store_true', help='用最近 --baseline-runs 次运行生成基线')
+    parser.add_argument('--baseline-runs', type=int, default=None, help='生成基线使用的运行次数，默认100')
+    parser.add_argument('--baseline', help='基线文件路径')
+    parser.add_argument('--list', action='store_true', help='列出有历史记录的组网')
+    args = parser.parse_args()
+
+    settings = _settings()
+    history = IperfHistory()
+    try:
+        if args.list:
+            for name in history.topologies():
+                print(name)
+            return
+        topology = args.topology or settings.get('topology') or 'default'
+        if args.save_baseline:
+            runs = history.load(topology, args.baseline_runs or settings.get('baseline_runs', 100))
+            if not len(runs):
+                print(f"组网 {topology} 没有历史记录")
+                sys.exit(1)
+            save_baseline(topology, runs, args.baseline)
+            print(f"基线已保存: {topology}, {len(runs)} 次运行 -> {baseline_path(args.baseline)}")
+            return
+        runs = history.load(topology, args.window or settings.get('window', 20))
+        verdict = evaluate(runs, load_baseline(topology, args.baseline))
+        log_verdict(topology, verdict)
+        sys.exit(0 if verdict['passed'] else 1)
+    finally:
+        history.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,297 @@
+"""
+API压测 - 按目标速率(令牌桶)或固定并发驱动HTTP请求，统计延迟分布、吞吐量和错误
+"""
+import json
+import time
+import threading
+import requests
+from utils.logger import get_logger
+
+logger = get_logger()
+
+PERCENTILES = (50, 75, 90, 95, 99, 99.9, 99.99)
+
+class LatencyHistogram:
+    """HDR风格的对数线性直方图，单位微秒
+
+    每个2的幂区间再均分为 2^(significant_bits-1) 个桶，相对误差不超过 1/2^(significant_bits-1)，
+    内存只与数值范围的对数相关，可以合并
+    """
+
+    def __init__(self, significant_bits=7):
+        self.sub_bits = significant_bits
+        self.sub_count = 1 << significant_bits
+        self.half = self.sub_count >> 1
+        self.counts = {}
+        self.total = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    def _index(self, value):
+        if value < self.sub_count:
+            return value
+        shift = value.bit_length() - self.sub_bits
+        return shift * self.half + (value >> shift)
+
+    def _bounds(self, index):
+        """桶对应的取值范围 [下界, 上界)"""
+        if index < self.sub_count:
+            return index, index + 1
+        shift = index // self.half - 1
+        low = (index - shift * self.half) << shift
+        return low, low + (1 << shift)
+
+    def record(self, seconds):
+        value = max(0, int(seconds * 1_000_000))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self.sum += other.sum
+        if other.total:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def percentile(self, percent):
+        """返回百分位延迟(微秒)，取所在桶的上界，不超过实际最大值"""
+        if not self.total:
+            return 0
+        target = max(1, -(-self.total * percent // 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self._bounds(index)[1] - 1, self.max)
+        return self.max
+
+    def summary(self):
+        """延迟统计(毫秒)"""
+        if not self.total:
+            return {}
+        result = {'min': self.min / 1000, 'mean': round(self.sum / self.total / 1000, 3)}
+        for percent in PERCENTILES:
+            result[f"p{percent:g}"] = self.percentile(percent) / 1000
+        result['max'] = self.max / 1000
+        return result
+
+    def buckets(self):
+        """非空桶列表 [[上界毫秒, 次数], ...]"""
+        return [[self._bounds(index)[1] / 1000, self.counts[index]] for index in sorted(self.counts)]
+
+class TokenBucket:
+    """令牌桶限速，空闲时最多积累burst个令牌"""
+
+    def __init__(self, rate, burst=1):
+        if rate <= 0:
+            raise ValueError("速率必须大于0")
+        self.interval = 1.0 / rate
+        self.burst = max(1, burst)
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, stop_event):
+        """等待下一个令牌，返回该请求的计划发送时间，收到停止信号时返回None"""
+        with self._lock:
+            now = time.monotonic()
+            earliest = now - (self.burst - 1) * self.interval
+            if self._next < earliest:
+                self._next = earliest
+            scheduled = self._next
+            self._next += self.interval
+        wait = scheduled - now
+        if wait > 0 and stop_event.wait(wait):
+            return None
+        return scheduled
+
+def render_template(value, seq):
+    """将模板中的 {{seq}} 替换为请求序号"""
+    if isinstance(value, str):
+        return value.replace('{{seq}}', str(seq))
+    if isinstance(value, dict):
+        return {k: render_template(v, seq) for k, v in value.items()}
+    if isinstance(value, list):
+        return [render_template(item, seq) for item in value]
+    return value
+
+class LoadGenerator:
+    """API压测
+
+    Args:
+        url: 请求URL，可包含 {{seq}}
+        method: HTTP方法
+        json_data: 请求体模板，字符串中的 {{seq}} 替换为请求序号
+        rate: 目标速率(次/秒)，为空时按固定并发尽可能快地发送
+        concurrency: 并发数，指定rate时为最大在途请求数
+        duration: 持续时间(秒)
+        max_requests: 请求总数，与duration同时指定时先到者结束
+        timeout: 单个请求超时(秒)
+        burst: 令牌桶容量
+    """
+
+    def __init__(self, url, method="GET", json_data=None, rate=None, concurrency=10,
+                 duration=None, max_requests=None, timeout=30, burst=1, headers=None):
+        if duration is None and max_requests is None:
+            raise ValueError("必须指定duration或max_requests")
+        self.url = url
+        self.method = method.upper()
+        self.json_data = json_data
+        self.rate = rate
+        self.concurrency = max(1, int(concurrency))
+        self.duration = duration
+        self.max_requests = max_requests
+        self.timeout = timeout
+        self.headers = headers
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self._templated = '{{seq}}' in url or '{{seq}}' in json.dumps(json_data, ensure_ascii=False)
+
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._issued = 0
+        self._threads = []
+        self._workers = []
+        self._start = None
+        self._end = None
+        self._deadline = None
+
+    def start(self):
+        """在后台启动压测，返回自身"""
+        self._start = time.monotonic()
+        if self.duration is not None:
+            self._deadline = self._start + self.duration
+        for index in range(self.concurrency):
+            stats = {'latency': LatencyHistogram(), 'schedule': LatencyHistogram(),
+                     'status_codes': {}, 'errors': {}, 'success': 0, 'failed': 0}
+            thread = threading.Thread(target=self._worker, args=(stats,), name=f"load-{index}", daemon=True)
+            self._workers.append(stats)
+            self._threads.append(thread)
+            thread.start()
+        logger.info(f"API压测开始: {self.method} {self.url}, "
+                    f"{'速率 %s次/秒' % self.rate if self.rate else '并发 %d' % self.concurrency}, "
+                    f"{'时长 %s秒' % self.duration if self.duration is not None else '请求数 %s' % self.max_requests}")
+        return self
+
+    def _claim(self):
+        """领取下一个请求序号，达到结束条件时返回None"""
+        if self._stop.is_set() or (self._deadline is not None and time.monotonic() >= self._deadline):
+            return None
+        with self._lock:
+            if self.max_requests is not None and self._issued >= self.max_requests:
+                return None
+            self._issued += 1
+            return self._issued
+
+    def _worker(self, stats):
+        session = requests.Session()
+        try:
+            while True:
+                seq = self._claim()
+                if seq is None:
+                    return
+                scheduled = None
+                if self.bucket:
+                    scheduled = self.bucket.acquire(self._stop)
+                    if scheduled is None:
+                        return
+                    if self._deadline is not None and scheduled >= self._deadline:
+                        return
+                self._send(session, seq, scheduled, stats)
+        finally:
+            session.close()
+
+    def _send(self, session, seq, scheduled, stats):
+        url, body = self.url, self.json_data
+        if self._templated:
+            url, body = render_template(url, seq), render_template(body, seq)
+        start = time.monotonic()
+        try:
+            response = session.request(self.method, url, json=body, headers=self.headers, timeout=self.timeout)
+            response.content  # 读取完整响应体，计入延迟
+            code = str(response.status_code)
+            stats['status_codes'][code] = stats['status_codes'].get(code, 0) + 1
+            if response.status_code < 400:
+                stats['success'] += 1
+            else:
+                stats['failed'] += 1
+                key = f"HTTP {code}"
+                stats['errors'][key] = stats['errors'].get(key, 0) + 1
+        except requests.RequestException as e:
+            stats['failed'] += 1
+            key = type(e).__name__
+            stats['errors'][key] = stats['errors'].get(key, 0) + 1
+        end = time.monotonic()
+        stats['latency'].record(end - start)
+        if scheduled is not None:
+            # 从计划发送时间计算，包含排队等待，避免并发不足时低估延迟(协调遗漏)
+            stats['schedule'].record(end - scheduled)
+
+    def stop(self):
+        """提前结束压测"""
+        self._stop.set()
+        return self
+
+    def wait(self, timeout=None):
+        """等待压测结束，返回是否已结束"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(0, deadline - time.monotonic()))
+        done = not self.running
+        if done and self._end is None:
+            self._end = time.monotonic()
+        return done
+
+    @property
+    def running(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    def report(self):
+        """汇总各工作线程的统计"""
+        latency, schedule = LatencyHistogram(), LatencyHistogram()
+        status_codes, errors = {}, {}
+        success = failed = 0
+        for stats in self._workers:
+            latency.merge(stats['latency'])
+            schedule.merge(stats['schedule'])
+            for key, count in stats['status_codes'].items():
+                status_codes[key] = status_codes.get(key, 0) + count
+            for key, count in stats['errors'].items():
+                errors[key] = errors.get(key, 0) + count
+            success += stats['success']
+            failed += stats['failed']
+
+        elapsed = ((self._end or time.monotonic()) - self._start) if self._start else 0
+        total = success + failed
+        report = {
+            'url': self.url,
+            'method': self.method,
+            'mode': 'rate' if self.rate else 'concurrency',
+            'target_rate': self.rate,
+            'concurrency': self.concurrency,
+            'requests': total,
+            'success': success,
+            'failed': failed,
+            'error_rate': round(failed / total, 4) if total else 0,
+            'duration': round(elapsed, 3),
+            'throughput': round(total / elapsed, 2) if elapsed else 0,
+            'status_codes': status_codes,
+            'errors': errors,
+            'latency_ms': latency.summary(),
+            'histogram': latency.buckets(),
+        }
+        if self.rate:
+            report['scheduled_latency_ms'] = schedule.summary()
+        return report
+
+    def run(self):
+        """前台执行压测并返回报告"""
+        self.start()
+        self.wait()
+        return self.report()
@@ -0,0 +1,227 @@
+"""
+远程日志收集 - 并发从多台服务器拉取容器日志和系统日志，增量传输，远端压缩后写入运行的产物目录
+
+容器日志按远端时间窗口 (docker logs --since 上次结束时间 --until 本次开始时间) 收集，
+系统日志文件按字节偏移收集，文件被轮转(变小)时从头开始。收集位置按运行记录，同一运行内只传输新增部分
+"""
+import re
+import time
+import gzip
+import shlex
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from utils.logger import get_logger
+from utils.config_manager import config_manager
+from utils.connection_pool import connection_pool
+from utils.result_store import result_sink
+from utils.artifact_store import artifact_store
+
+logger = get_logger()
+
+CHUNK_SIZE = 64 * 1024
+# 空输入经gzip压缩后的大小上限，用于跳过没有新日志的文件
+EMPTY_GZIP_SIZE = 32
+
+def _safe_name(text):
+    return re.sub(r'[^\w.\-\[\]]+', '_', str(text)).strip('_') or 'unnamed'
+
+class LogCollector:
+    """远程日志收集器
+
+    Args:
+        settings: 收集配置，默认读取 log_collection
+        containers: 容器列表，默认读取 adn_services
+    """
+
+    def __init__(self, settings=None, containers=None):
+        if settings is None:
+            settings = config_manager.get_config('log_collection') or {}
+        if containers is None:
+            containers = config_manager.get_config('adn_services') or []
+        self.settings = settings
+        self.containers = [c['container_name'] for c in containers]
+        self.files = settings.get('files') or []
+        self.max_workers = settings.get('max_workers', 16)
+        self.initial_since = settings.get('initial_since', '10m')
+        self.initial_bytes = settings.get('initial_bytes', 1024 * 1024)
+        # 单个日志源无输出的最长等待时间和整次收集的时限(秒)，远端卡住时不阻塞用例执行
+        self.read_timeout = settings.get('read_timeout', 60)
+        self.timeout = settings.get('timeout', 300)
+        self._positions = {}
+        self._run_id = None
+        self._lock = threading.Lock()
+
+    def default_servers(self):
+        servers = self.settings.get('servers')
+        if servers:
+            return list(servers)
+        return list((config_manager.get_config('adn_restart') or {}).get('servers') or ['adn_server'])
+
+    def _position(self, server, source):
+        with self._lock:
+            # 收集位置按运行记录，新的运行从初始位置开始
+            if self._run_id != result_sink.run_id:
+                self._run_id = result_sink.run_id
+                self._positions = {}
+            return self._positions.get((server, source))
+
+    def _save_position(self, server, source, position):
+        with self._lock:
+            self._positions[(server, source)] = position
+
+    def _stream(self, ssh, command, path):
+        """执行命令，将stdout(gzip数据)分块写入文件，返回 (退出码, 写入字节数, stderr)"""
+        stdin, stdout, stderr = ssh.exec_command(command, timeout=self.read_timeout or None)
+        stdin.close()
+        written = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'wb') as f:
+            while True:
+                chunk = stdout.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                f.write(chunk)
+                written += len(chunk)
+        exit_code = stdout.channel.recv_exit_status()
+        return exit_code, written, stderr.read().decode(errors='replace').strip()
+
+    def _finish(self, path, written):
+        """没有新内容时删除文件，返回文件路径或None"""
+        if written <= EMPTY_GZIP_SIZE:
+            try:
+                if written == 0 or not gzip.decompress(path.read_bytes()):
+                    path.unlink()
+                    return None
+            except (OSError, EOFError):
+                pass
+        return path
+
+    def _collect_container(self, ssh, server, container, out_dir):
+        source = f"docker:{container}"
+        since = self._position(server, source) or self.initial_since
+        # stderr第一行为远端当前时间，作为本次窗口终点和下次的起点；
+        # 管道的退出码是gzip的，docker logs的退出码单独写到stderr最后一行
+        command = (f"now=$(date +%s.%N); echo $now >&2; "
+                   f"{{ docker logs --timestamps --since {shlex.quote(str(since))} --until $now "
+                   f"{shlex.quote(container)} 2>&1; echo \"docker_exit=$?\" >&2; }} | gzip -c")
+        path = out_dir / f"{_safe_name(container)}.log.gz"
+        exit_code, written, err = self._stream(ssh, command, path)
+        lines = err.splitlines()
+        until = lines[0].strip() if lines else ''
+        status = lines[-1].strip() if len(lines) > 1 else ''
+        if exit_code == 0 and status != 'docker_exit=0':
+            exit_code = status.partition('=')[2] or '未知'
+        if exit_code != 0 or not until:
+            path.unlink(missing_ok=True)
+            raise RuntimeError(f"docker logs 失败(退出码 {exit_code}): {err}")
+        self._save_position(server, source, until)
+        return self._finish(path, written), written
+
+    def _collect_file(self, ssh, server, log_file, out_dir):
+        source = f"file:{log_file}"
+        offset = self._position(server, source)
+        quoted = shlex.quote(log_file)
+        start = (f"off={int(offset)}; [ $size -lt $off ] && off=0" if offset is not None
+                 else f"off=$(( size > {int(self.initial_bytes)} ? size - {int(self.initial_bytes)} : 0 ))")
+        # stderr为文件当前大小，只传输偏移之后、本次大小之前的内容
+        command = (f"size=$(stat -c %s {quoted}) || exit 3; {start}; echo $size >&2; "
+                   f"[ $size -eq $off ] && exit 0; "
+                   f"tail -c +$((off + 1)) {quoted} | head -c $((size - off)) | gzip -c")
+        path = out_dir / f"{_safe_name(log_file)}.gz"
+        exit_code, written, err = self._stream(ssh, command, path)
+        size = err.splitlines()[-1].strip() if err else ''
+        if exit_code != 0 or not size.isdigit():
+            path.unlink(missing_ok=True)
+            raise RuntimeError(f"读取 {log_file} 失败(退出码 {exit_code}): {err}")
+        self._save_position(server, source, int(size))
+        return self._finish(path, written), written
+
+    def _collect_server(self, server, out_dir, used=None):
+        """在工作线程中建立连接并收集一台服务器的日志，连接失败时记为该服务器的一条失败结果
+
+        used为发起线程的连接记录，步骤超时时看门狗据此关闭这些连接
+        """
+        adopt = used is not None and connection_pool.tracking() is not used
+        if adopt:
+            connection_pool.track(used)
+        try:
+            try:
+                ssh = connection_pool.get_ssh_connection(server)
+            except Exception as e:
+                logger.warning(f"日志收集失败: {server} SSH连接失败, {e}")
+                return [{'server': server, 'source': None, 'kind': 'ssh', 'path': None,
+                         'bytes': 0, 'error': f"SSH连接失败: {e}"}]
+            return self._collect_sources(server, ssh, out_dir)
+        finally:
+            if adopt:
+                connection_pool.track(None)
+
+    def _collect_sources(self, server, ssh, out_dir):
+        reports = []
+        server_dir = out_dir / _safe_name(server)
+        sources = [('container', c, self._collect_container) for c in self.containers]
+        sources += [('file', f, self._collect_file) for f in self.files]
+        for kind, name, collect in sources:
+            report = {'server': server, 'source': name, 'kind': kind, 'path': None, 'bytes': 0, 'error': None}
+            try:
+                path, written = collect(ssh, server, name, server_dir)
+                report['path'] = str(path) if path else None
+                report['bytes'] = written if path else 0
+            except Exception as e:
+                report['error'] = str(e)
+                logger.warning(f"日志收集失败: {server} {name}, {e}")
+            reports.append(report)
+        return reports
+
+    def collect(self, servers=None, label=None):
+        """
+        收集日志到 reports/artifacts/runs/<run_id>/logs/<label>/<服务器>/
+
+        Args:
+            servers: 服务器名称列表，默认读取 log_collection.servers 或 adn_restart.servers
+            label: 本次收集的标识，如用例ID，默认为 manual-时分秒
+
+        Returns:
+            list: 每个服务器每个日志源的收集结果
+        """
+        servers = servers or self.default_servers()
+        label = label or f"manual-{datetime.now():%H%M%S}"
+        out_dir = artifact_store.run_dir() / "logs" / _safe_name(label)
+
+        used = connection_pool.tracking()
+        reports = []
+        if servers:
+            deadline = time.monotonic() + self.timeout if self.timeout else None
+            executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(servers)))
+            try:
+                futures = {name: executor.submit(self._collect_server, name, out_dir, used) for name in servers}
+                for name, future in futures.items():
+                    remaining = None if deadline is None else max(0, deadline - time.monotonic())
+                    try:
+                        reports.extend(future.result(timeout=remaining))
+                    except FutureTimeoutError:
+                        # 关闭仍在收集的服务器的连接，阻塞的读取随之返回，不等待其结束
+                        if not future.cancel():
+                            connection_pool.discard('ssh', name)
+                        logger.warning(f"日志收集失败: {name} 超过时限 {self.timeout} 秒")
+                        reports.append({'server': name, 'source': None, 'kind': 'ssh', 'path': None,
+                                        'bytes': 0, 'error': f"收集超时({self.timeout}秒)"})
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+        collected = sum(1 for r in reports if r['path'])
+        failed = sum(1 for r in reports if r['error'])
+        total = sum(r['bytes'] for r in reports)
+        logger.info(f"日志收集完成: {len(servers)} 台服务器, {collected} 个日志文件, "
+                    f"共 {total / 1024:.1f}KB(压缩后), {failed} 个失败, 目录 {out_dir}")
+        return reports
+
+_collector = None
+
+def get_log_collector():
+    """全局日志收集器，保留同一运行内各日志源的收集位置"""
+    global _collector
+    if _collector is None:
+        _collector = LogCollector()
+    return _collector
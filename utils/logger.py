@@ -18,5 +18,6 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
-def get_logger():
-    return logger
\ No newline at end of file
+def get_logger(name=None):
+    """获取日志器，指定name时返回同样输出到上述handler的子日志器"""
+    return logging.getLogger(name) if name else logger
\ No newline at end of file
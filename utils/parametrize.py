@@ -0,0 +1,160 @@
+"""
+用例参数化 - 按matrix(笛卡尔积)和dataset(内联列表、CSV、JSONL文件)将一个用例惰性展开为多个实例
+"""
+import csv
+import json
+import itertools
+import threading
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# 用例引用: 文件路径#实例键，分布式执行时以此分发单个参数化实例
+INSTANCE_SEP = '#'
+# 自动生成的实例ID超过该长度时改用序号
+MAX_ID_LENGTH = 64
+
+def case_ref(path, key):
+    return f"{path}{INSTANCE_SEP}{key}"
+
+def split_case_ref(ref):
+    """拆分用例引用，返回 (文件路径, 实例键或None)"""
+    path, _, key = str(ref).partition(INSTANCE_SEP)
+    return path, key or None
+
+def _resolve(path, base_dir):
+    """数据文件路径，相对路径先相对用例所在目录，再相对项目根目录"""
+    path = Path(path)
+    if path.is_absolute():
+        return path
+    if base_dir is not None and (Path(base_dir) / path).exists():
+        return Path(base_dir) / path
+    return PROJECT_ROOT / path
+
+def _read_csv(path):
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        yield from csv.DictReader(f)
+
+def _read_jsonl(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            if not isinstance(row, dict):
+                raise ValueError(f"{path} 第{line_no}行不是JSON对象")
+            yield row
+
+class ParamSource:
+    """参数来源，逐条生成参数字典，不在内存中展开全部实例
+
+    Args:
+        matrix: {参数名: 取值列表}，按笛卡尔积组合
+        dataset: 行数据，可以是字典列表、CSV/JSONL文件路径或 {'file': 路径}
+        instance_id: 实例ID模板，如 "{prefix}-{nexthop}"，默认取数据行的id列或参数值拼接
+        base_dir: 数据文件相对路径的基准目录
+    """
+
+    def __init__(self, matrix=None, dataset=None, instance_id=None, base_dir=None):
+        if not matrix and not dataset:
+            raise ValueError("matrix和dataset至少指定一个")
+        self.matrix = {name: values if isinstance(values, list) else [values]
+                       for name, values in (matrix or {}).items()}
+        for name, values in self.matrix.items():
+            if not values:
+                raise ValueError(f"matrix参数 {name} 的取值列表为空")
+        self.instance_id_format = instance_id
+        self.base_dir = base_dir
+        self.dataset = dataset
+        self.dataset_file = None
+        if isinstance(dataset, dict):
+            dataset = dataset.get('file')
+            if not dataset:
+                raise ValueError("dataset需要指定file")
+        if isinstance(dataset, str):
+            self.dataset_file = _resolve(dataset, base_dir)
+            if self.dataset_file.suffix.lower() not in ('.csv', '.jsonl'):
+                raise ValueError(f"不支持的数据文件格式: {dataset}，仅支持CSV和JSONL")
+        elif dataset is not None and not isinstance(dataset, list):
+            raise ValueError("dataset必须是列表或数据文件路径")
+
+        self._cursor = None
+        self._position = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_case(cls, test_case, base_dir=None):
+        """从YAML用例的matrix/dataset段创建，未参数化的用例返回None"""
+        if not test_case.get('matrix') and not test_case.get('dataset'):
+            return None
+        return cls(test_case.get('matrix'), test_case.get('dataset'), test_case.get('instance_id'), base_dir)
+
+    @property
+    def files(self):
+        """依赖的数据文件"""
+        return [self.dataset_file] if self.dataset_file else []
+
+    def _rows(self):
+        if self.dataset_file is not None:
+            if self.dataset_file.suffix.lower() == '.csv':
+                return _read_csv(self.dataset_file)
+            return _read_jsonl(self.dataset_file)
+        if self.dataset is not None:
+            return (row if isinstance(row, dict) else {'value': row} for row in self.dataset)
+        return iter([{}])
+
+    def __iter__(self):
+        names = list(self.matrix)
+        for row in self._rows():
+            for values in itertools.product(*self.matrix.values()):
+                yield {**row, **dict(zip(names, values))}
+
+    def instance_id(self, index, params):
+        if self.instance_id_format:
+            return self.instance_id_format.format(index=index, **params)
+        if 'id' in params:
+            return str(params['id'])
+        text = '-'.join(str(value) for value in params.values())
+        return text if text and len(text) <= MAX_ID_LENGTH else str(index)
+
+    def instances(self):
+        """逐个生成 (序号, 实例ID, 参数)"""
+        for index, params in enumerate(self):
+            yield index, self.instance_id(index, params), params
+
+    def count(self):
+        """实例数量，数据文件需要完整读取一遍"""
+        return sum(1 for _ in self)
+
+    def get(self, index):
+        """按序号取参数
+
+        只有matrix时直接按序号计算；有dataset时顺序读取，
+        递增访问(如Agent依次领取的实例)沿用上次的读取位置，无需从头读取
+        """
+        if index < 0:
+            raise IndexError(index)
+        if self.dataset is None:
+            return self._matrix_at(index)
+        with self._lock:
+            if self._cursor is None or index < self._position:
+                self._cursor = iter(self)
+                self._position = 0
+            params = next(itertools.islice(self._cursor, index - self._position, None), None)
+            if params is None:
+                self._cursor = None
+                raise IndexError(f"参数化实例序号超出范围: {index}")
+            self._position = index + 1
+            return params
+
+    def _matrix_at(self, index):
+        params = {}
+        remaining = index
+        for name in reversed(list(self.matrix)):
+            values = self.matrix[name]
+            remaining, offset = divmod(remaining, len(values))
+            params[name] = values[offset]
+        if remaining:
+            raise IndexError(f"参数化实例序号超出范围: {index}")
+        return {name: params[name] for name in self.matrix}
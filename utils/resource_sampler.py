@@ -0,0 +1,349 @@
+"""
+资源采样 - 在打流、压测等步骤期间后台采集服务器的CPU、内存、网卡计数和容器资源，按步骤时间窗口汇总
+
+每台服务器使用一条独立的SSH连接，远端循环脚本按固定间隔输出 /proc 和 docker stats，
+不会每次采样都新建命令。采样数据保存在定长的数组环形缓冲区中，内存占用与运行时长无关
+"""
+import math
+import time
+import bisect
+import shlex
+import threading
+from array import array
+from collections import deque
+from utils.logger import get_logger
+from utils.config_manager import config_manager
+from utils.connection_pool import connection_pool
+from utils.result_store import result_sink
+
+logger = get_logger()
+
+DEFAULT_INTERVAL = 1.0
+DEFAULT_CAPACITY = 3600
+# 计数类指标，汇总时按相邻采样计算速率
+COUNTER_SUFFIXES = ('rx_bytes', 'tx_bytes', 'rx_packets', 'tx_packets')
+
+SIZE_UNITS = {'b': 1, 'kb': 1e3, 'mb': 1e6, 'gb': 1e9, 'tb': 1e12,
+              'kib': 1024, 'mib': 1024 ** 2, 'gib': 1024 ** 3, 'tib': 1024 ** 4}
+
+# 远端采样脚本，每次采样以 "@@ 时间戳" 开始、"@@end" 结束
+SAMPLE_SCRIPT = """\
+while :; do
+  echo "@@ $(date +%s.%N)"
+  head -n 1 /proc/stat
+  echo "load $(cut -d' ' -f1 /proc/loadavg)"
+  awk '/^MemTotal:/ {t=$2} /^MemAvailable:/ {a=$2} END {print "mem", t, a}' /proc/meminfo
+  awk 'NR > 2 {sub(":", " "); print "net", $1, $2, $3, $10, $11}' /proc/net/dev
+  [ -n "$containers" ] && docker stats --no-stream --format 'ctr {{.Name}} {{.CPUPerc}} {{.MemUsage}}' $containers 2>/dev/null
+  echo "@@end"
+  sleep $interval
+done
+"""
+
+def _parse_size(text):
+    """解析 docker stats 的内存大小，如 12.5MiB"""
+    text = text.strip()
+    for i, ch in enumerate(text):
+        if not (ch.isdigit() or ch == '.'):
+            return float(text[:i]) * SIZE_UNITS[text[i:].lower()]
+    return float(text)
+
+def _percentile(values, percent):
+    """线性插值百分位，与 numpy.percentile 的默认方法一致，values需已排序"""
+    if len(values) == 1:
+        return values[0]
+    rank = (len(values) - 1) * percent / 100
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+def _is_counter(metric):
+    return metric.endswith(COUNTER_SUFFIXES)
+
+def summarize_series(metric, times, values):
+    """汇总一段采样：普通指标为均值、p99和峰值，计数类指标为每秒速率的均值、p99和峰值"""
+    if _is_counter(metric):
+        points = []
+        prev_t = prev_v = None
+        for t, v in zip(times, values):
+            if math.isnan(v):
+                continue
+            # 计数器回绕或网卡重置时跳过该区间
+            if prev_t is not None and t > prev_t and v >= prev_v:
+                points.append((v - prev_v) / (t - prev_t))
+            prev_t, prev_v = t, v
+        if not points:
+            return None
+        points.sort()
+        return {'samples': len(points), 'mean_rate': round(sum(points) / len(points), 3),
+                'p99_rate': round(_percentile(points, 99), 3), 'peak_rate': round(points[-1], 3)}
+    points = sorted(v for v in values if not math.isnan(v))
+    if not points:
+        return None
+    return {'samples': len(points), 'mean': round(sum(points) / len(points), 3),
+            'p99': round(_percentile(points, 99), 3), 'max': round(points[-1], 3)}
+
+class RingBuffer:
+    """定长环形缓冲区，按列保存：一个时间戳列，每个指标一列，缺失值为NaN
+
+    列为 array('d')，支持缓冲区协议，可直接用 numpy.asarray / numpy.frombuffer 转换
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.times = array('d', bytes(8 * capacity))
+        self.columns = {}
+        self.head = 0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.count
+
+    def append(self, timestamp, values):
+        with self._lock:
+            index = self.head
+            self.times[index] = timestamp
+            for metric, value in values.items():
+                column = self.columns.get(metric)
+                if column is None:
+                    column = self.columns[metric] = array('d', [math.nan]) * self.capacity
+                column[index] = value
+            # 本次没有采到的指标(如容器不存在)记为NaN，避免沿用被覆盖前的旧值
+            for metric, column in self.columns.items():
+                if metric not in values:
+                    column[index] = math.nan
+            self.head = (index + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+
+    def _ordered(self, column):
+        if self.count < self.capacity:
+            return column[:self.count]
+        return column[self.head:] + column[:self.head]
+
+    def window(self, start=None, end=None, offset=0.0):
+        """按时间先后返回 [start, end] 内的采样：(时间戳数组, {指标: 数组})，时间戳加上offset"""
+        with self._lock:
+            times = self._ordered(self.times)
+            columns = {metric: self._ordered(column) for metric, column in self.columns.items()}
+        if offset:
+            times = array('d', (t + offset for t in times))
+        low = 0 if start is None else bisect.bisect_left(times, start)
+        high = len(times) if end is None else bisect.bisect_right(times, end)
+        return times[low:high], {metric: column[low:high] for metric, column in columns.items()}
+
+class _HostSampler:
+    """单台服务器的采样通道和缓冲区"""
+
+    def __init__(self, server, capacity):
+        self.server = server
+        self.buffer = RingBuffer(capacity)
+        # 远端时钟换算为本地时间的偏移，取观察到的最小接收延迟
+        self.offset = None
+        self.error = None
+        self.ssh = None
+        self.thread = None
+        self._closing = False
+        self._cpu = None
+
+    def open(self, interval, containers):
+        # 独立连接，不占用连接池中供AW使用的连接，停止时关闭即结束远端脚本
+        self.ssh = connection_pool.connect_ssh(self.server)
+        command = (f"interval={shlex.quote(str(interval))}; "
+                   f"containers={shlex.quote(' '.join(containers))}; {SAMPLE_SCRIPT}")
+        stdin, stdout, stderr = self.ssh.exec_command(command)
+        stdin.close()
+        self.thread = threading.Thread(target=self._read, args=(stdout,), name=f"sampler-{self.server}", daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self._closing = True
+        if self.ssh is not None:
+            try:
+                self.ssh.close()
+            except Exception:
+                pass
+        if self.thread is not None:
+            self.thread.join(5)
+
+    def _read(self, stdout):
+        timestamp, values = None, {}
+        try:
+            for line in stdout:
+                parts = line.split()
+                if not parts:
+                    continue
+                tag = parts[0]
+                if tag == '@@':
+                    received = time.time()
+                    try:
+                        timestamp = float(parts[1])
+                    except (IndexError, ValueError):
+                        timestamp = received - (self.offset or 0.0)
+                    delay = received - timestamp
+                    self.offset = delay if self.offset is None else min(self.offset, delay)
+                    values = {}
+                elif tag == '@@end':
+                    if timestamp is not None:
+                        self.buffer.append(timestamp, values)
+                    timestamp = None
+                elif timestamp is not None:
+                    try:
+                        self._parse(tag, parts, values)
+                    except (IndexError, ValueError, KeyError, ZeroDivisionError):
+                        logger.debug(f"无法解析采样数据: {self.server}, {line.strip()}")
+        except Exception as e:
+            if not self._closing:
+                self.error = str(e)
+                logger.warning(f"资源采样中断: {self.server}, {e}")
+            return
+        if not self._closing:
+            self.error = "远端采样脚本已退出"
+            logger.warning(f"资源采样中断: {self.server}, 远端采样脚本已退出")
+
+    def _parse(self, tag, parts, values):
+        if tag == 'cpu':
+            fields = [int(x) for x in parts[1:9]]
+            total, idle = sum(fields), fields[3] + fields[4]
+            if self._cpu is not None and total > self._cpu[0]:
+                values['cpu.util'] = 100.0 * (1 - (idle - self._cpu[1]) / (total - self._cpu[0]))
+            self._cpu = (total, idle)
+        elif tag == 'load':
+            values['cpu.load1'] = float(parts[1])
+        elif tag == 'mem':
+            total, available = float(parts[1]), float(parts[2])
+            values['mem.used_pct'] = 100.0 * (1 - available / total)
+            values['mem.available'] = available * 1024
+        elif tag == 'net':
+            name = parts[1]
+            values[f'net.{name}.rx_bytes'] = float(parts[2])
+            values[f'net.{name}.rx_packets'] = float(parts[3])
+            values[f'net.{name}.tx_bytes'] = float(parts[4])
+            values[f'net.{name}.tx_packets'] = float(parts[5])
+        elif tag == 'ctr':
+            name = parts[1]
+            values[f'ctr.{name}.cpu'] = float(parts[2].rstrip('%'))
+            values[f'ctr.{name}.mem'] = _parse_size(parts[3])
+
+class ResourceSampler:
+    """后台资源采样器，可用 start/stop 或 with 语句使用
+
+    Args:
+        servers: 服务器名称列表，默认读取 resource_sampler.servers 或 adn_restart.servers
+        interval: 采样间隔(秒)
+        containers: 采集docker stats的容器列表，默认为 adn_services 中的容器
+        capacity: 每台服务器保留的采样数，超出后覆盖最早的采样
+        interfaces: 采集的网卡列表，默认为除lo外的所有网卡
+    """
+
+    def __init__(self, servers=None, interval=None, containers=None, capacity=None, interfaces=None):
+        settings = config_manager.load_config().get('resource_sampler') or {}
+        if not servers:
+            servers = settings.get('servers') or \
+                (config_manager.load_config().get('adn_restart') or {}).get('servers') or ['adn_server']
+        if containers is None:
+            containers = settings.get('containers')
+            if containers is None:
+                containers = [s['container_name'] for s in config_manager.load_config().get('adn_services') or []]
+        self.servers = list(servers)
+        self.interval = float(interval or settings.get('interval', DEFAULT_INTERVAL))
+        self.containers = list(containers)
+        self.capacity = int(capacity or settings.get('capacity', DEFAULT_CAPACITY))
+        self.interfaces = interfaces if interfaces is not None else settings.get('interfaces') or []
+        self.hosts = {}
+        self.steps = deque(maxlen=self.capacity)
+        self.started = None
+        self.stopped = None
+
+    @property
+    def running(self):
+        return self.started is not None and self.stopped is None
+
+    def _on_step(self, event):
+        if event.get('start') is not None and event.get('duration') is not None:
+            self.steps.append({'index': event['index'], 'aw': event['aw'], 'status': event['status'],
+                               'start': event['start'], 'end': event['start'] + event['duration']})
+
+    def start(self):
+        """为每台服务器建立采样通道，连接失败的服务器记录错误后跳过"""
+        self.started, self.stopped = time.time(), None
+        for server in self.servers:
+            host = self.hosts[server] = _HostSampler(server, self.capacity)
+            try:
+                host.open(self.interval, self.containers)
+            except Exception as e:
+                host.error = str(e)
+                logger.warning(f"资源采样通道建立失败: {server}, {e}")
+        result_sink.add_listener(self._on_step)
+        active = sum(1 for h in self.hosts.values() if h.error is None)
+        logger.info(f"资源采样已启动: {active}/{len(self.servers)} 台服务器, 间隔 {self.interval}s")
+        return self
+
+    def stop(self):
+        """停止采样并返回汇总"""
+        if self.running:
+            result_sink.remove_listener(self._on_step)
+            for host in self.hosts.values():
+                host.close()
+            self.stopped = time.time()
+        return self.summary()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _wanted(self, metric):
+        if self.interfaces and metric.startswith('net.'):
+            return metric.split('.')[1] in self.interfaces
+        return not metric.startswith('net.lo.')
+
+    def series(self, server, metric, start=None, end=None):
+        """返回单个指标的 (本地时间戳数组, 数值数组)，可直接用 numpy.asarray 转换"""
+        host = self.hosts[server]
+        times, columns = host.buffer.window(start, end, host.offset or 0.0)
+        return times, columns.get(metric, array('d', [math.nan]) * len(times))
+
+    def _summarize_window(self, host, start, end):
+        offset = host.offset or 0.0
+        # 计数类指标需要窗口开始前的一个采样才能计算第一个区间的速率
+        lead = None if start is None else start - self.interval
+        times, columns = host.buffer.window(lead, end, offset)
+        cut = 0 if start is None else bisect.bisect_left(times, start)
+        metrics = {}
+        for metric, values in sorted(columns.items()):
+            if not self._wanted(metric):
+                continue
+            if _is_counter(metric):
+                stats = summarize_series(metric, times, values)
+            else:
+                stats = summarize_series(metric, times[cut:], values[cut:])
+            if stats is not None:
+                metrics[metric] = stats
+        return metrics
+
+    def summary(self, steps=None):
+        """
+        按整个采样期间和每个步骤的时间窗口汇总
+
+        Args:
+            steps: 步骤时间窗口列表 [{'aw', 'start', 'end'}]，默认为采样期间执行的步骤
+
+        Returns:
+            dict: hosts为每台服务器整体的汇总，steps为每个步骤窗口内各服务器的汇总
+        """
+        steps = list(self.steps) if steps is None else steps
+        hosts = {}
+        for server, host in self.hosts.items():
+            hosts[server] = {'samples': len(host.buffer), 'error': host.error,
+                             'clock_offset': round(host.offset, 3) if host.offset is not None else None,
+                             'metrics': self._summarize_window(host, None, None)}
+        windows = []
+        for step in steps:
+            window = dict(step)
+            window['hosts'] = {server: self._summarize_window(host, step['start'], step['end'])
+                               for server, host in self.hosts.items() if len(host.buffer)}
+            windows.append(window)
+        return {'interval': self.interval, 'start': self.started, 'end': self.stopped or time.time(),
+                'hosts': hosts, 'steps': windows}
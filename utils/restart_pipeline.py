@@ -0,0 +1,191 @@
+"""
+容器重启流水线 - 按依赖分层并发重启容器，并等待服务就绪
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils.logger import get_logger
+from utils.config_manager import config_manager
+from utils.connection_pool import connection_pool
+
+logger = get_logger()
+
+# 未配置健康检查的容器以运行状态作为就绪判断
+INSPECT_FORMAT = "{{if .State.Health}}{{.State.Health.Status}}{{else}}{{.State.Status}}{{end}}"
+
+def build_restart_layers(containers):
+    """按depends_on将容器分层，同一层内的容器互不依赖，可并发重启"""
+    names = [c['container_name'] for c in containers]
+    deps = {c['container_name']: set(c.get('depends_on') or []) for c in containers}
+
+    for name, required in deps.items():
+        unknown = required - set(names)
+        if unknown:
+            raise ValueError(f"容器 {name} 依赖未配置的容器: {', '.join(sorted(unknown))}")
+
+    layers = []
+    done = set()
+    while len(done) < len(names):
+        layer = [n for n in names if n not in done and deps[n] <= done]
+        if not layer:
+            pending = [n for n in names if n not in done]
+            raise ValueError(f"容器依赖存在循环: {', '.join(pending)}")
+        layers.append(layer)
+        done.update(layer)
+    return layers
+
+class RestartPipeline:
+    """ADN容器重启流水线"""
+
+    def __init__(self, containers=None, settings=None):
+        if containers is None:
+            containers = config_manager.get_config('adn_services') or []
+        if settings is None:
+            settings = config_manager.get_config('adn_restart') or {}
+        self.containers = containers
+        self.max_workers = settings.get('max_workers', 4)
+        self.ready_timeout = settings.get('ready_timeout', 120)
+        self.poll_interval = settings.get('poll_interval', 1)
+        self._by_name = {c['container_name']: c for c in self.containers}
+
+    def _exec(self, ssh, command, timeout=None):
+        """执行远程命令，返回 (退出码, 输出, 错误)"""
+        stdin, stdout, stderr = ssh.exec_command(command, timeout=timeout)
+        exit_code = stdout.channel.recv_exit_status()
+        return exit_code, stdout.read().decode().strip(), stderr.read().decode().strip()
+
+    def _is_ready(self, ssh, container):
+        """判断容器是否就绪: 优先使用配置的ready_probe，否则使用docker inspect健康状态"""
+        name = container['container_name']
+        probe = container.get('ready_probe')
+        if probe:
+            exit_code, _, _ = self._exec(ssh, probe.replace('{container}', name), timeout=self.poll_interval + 10)
+            return exit_code == 0
+
+        exit_code, status, _ = self._exec(ssh, f"docker inspect -f '{INSPECT_FORMAT}' {name}", timeout=30)
+        return exit_code == 0 and status in ('healthy', 'running')
+
+    def _restart_one(self, server_name, ssh, name):
+        """重启单个容器并等待就绪"""
+        container = self._by_name[name]
+        ready_timeout = container.get('ready_timeout', self.ready_timeout)
+        report = {
+            'server': server_name,
+            'container': name,
+            'success': False,
+            'restart_time': None,
+            'ready_time': None,
+            'error': None,
+        }
+
+        start = time.monotonic()
+        logger.info(f"[{server_name}] 重启容器: {name}")
+        try:
+            exit_code, _, error = self._exec(ssh, f"docker restart {name}")
+            report['restart_time'] = round(time.monotonic() - start, 3)
+            if exit_code != 0:
+                report['error'] = error or f"docker restart 退出码 {exit_code}"
+                logger.error(f"✗ [{server_name}] 容器 {name} 重启失败: {report['error']}")
+                return report
+
+            deadline = start + ready_timeout
+            while True:
+                if self._is_ready(ssh, container):
+                    report['ready_time'] = round(time.monotonic() - start, 3)
+                    report['success'] = True
+                    logger.info(f"✓ [{server_name}] 容器 {name} 已就绪, 重启 {report['restart_time']:.2f}秒, 就绪 {report['ready_time']:.2f}秒")
+                    return report
+                if time.monotonic() >= deadline:
+                    report['error'] = f"等待就绪超时({ready_timeout}秒)"
+                    logger.error(f"✗ [{server_name}] 容器 {name} {report['error']}")
+                    return report
+                time.sleep(self.poll_interval)
+        except Exception as e:
+            report['error'] = str(e)
+            logger.error(f"✗ [{server_name}] 容器 {name} 重启失败: {e}")
+            return report
+
+    def restart_server(self, server_name, ssh=None):
+        """在单台服务器上按依赖分层并发重启所有容器"""
+        ssh = ssh or connection_pool.get_ssh_connection(server_name)
+        layers = build_restart_layers(self.containers)
+        reports = []
+        failed = set()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for layer in layers:
+                runnable = []
+                for name in layer:
+                    blocked = set(self._by_name[name].get('depends_on') or []) & failed
+                    if blocked:
+                        failed.add(name)
+                        reports.append({
+                            'server': server_name,
+                            'container': name,
+                            'success': False,
+                            'restart_time': None,
+                            'ready_time': None,
+                            'error': f"依赖容器未就绪: {', '.join(sorted(blocked))}",
+                        })
+                        logger.error(f"✗ [{server_name}] 跳过容器 {name}, 依赖容器未就绪")
+                    else:
+                        runnable.append(name)
+
+                futures = [executor.submit(self._restart_one, server_name, ssh, name) for name in runnable]
+                for future in futures:
+                    report = future.result()
+                    reports.append(report)
+                    if not report['success']:
+                        failed.add(report['container'])
+        return reports
+
+    def run(self, servers, rolling=False):
+        """
+        重启多台服务器上的容器
+
+        Args:
+            servers: 服务器名称列表
+            rolling: 滚动模式，逐台重启，上一台全部就绪后才继续下一台
+
+        Returns:
+            list: 每个容器的重启报告
+        """
+        used = connection_pool.tracking()
+        if rolling:
+            reports = []
+            for server_name in servers:
+                server_reports = self._restart_server_safe(server_name, used)
+                reports.extend(server_reports)
+                if not all(r['success'] for r in server_reports):
+                    logger.error(f"✗ 滚动重启在服务器 {server_name} 失败, 停止后续服务器")
+                    break
+            return reports
+
+        with ThreadPoolExecutor(max_workers=len(servers) or 1) as executor:
+            futures = [executor.submit(self._restart_server_safe, name, used) for name in servers]
+            return [report for future in futures for report in future.result()]
+
+    def _restart_server_safe(self, server_name, used=None):
+        """在工作线程中建立连接并重启，连接失败时该服务器的每个容器记为失败，不影响其他服务器
+
+        used为发起线程的连接记录，步骤超时时看门狗据此关闭这些连接
+        """
+        adopt = used is not None and connection_pool.tracking() is not used
+        if adopt:
+            connection_pool.track(used)
+        try:
+            try:
+                ssh = connection_pool.get_ssh_connection(server_name)
+            except Exception as e:
+                logger.error(f"✗ [{server_name}] SSH连接失败, 跳过该服务器: {e}")
+                return [{
+                    'server': server_name,
+                    'container': c['container_name'],
+                    'success': False,
+                    'restart_time': None,
+                    'ready_time': None,
+                    'error': f"SSH连接失败: {e}",
+                } for c in self.containers]
+            return self.restart_server(server_name, ssh)
+        finally:
+            if adopt:
+                connection_pool.track(None)
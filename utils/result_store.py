@@ -0,0 +1,440 @@
+"""
+结果存储 - 用例和步骤结果边执行边写入 JUnit XML / JSON Lines / SQLite
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from xml.sax.saxutils import escape, quoteattr
+from utils.logger import get_logger
+
+logger = get_logger()
+
+REPORT_DIR = Path(__file__).parent.parent / "reports"
+RESULT_DB = REPORT_DIR / "results.db"
+
+MAX_PARAMS_LENGTH = 2000
+MAX_RESULT_LENGTH = 500
+
+def new_run_id():
+    """生成运行ID: 时间戳 + 进程号"""
+    return f"{datetime.now():%Y%m%d_%H%M%S}_{os.getpid()}"
+
+def summarize_value(value, limit=MAX_RESULT_LENGTH):
+    """将参数或结果转换为截断后的字符串，避免大输出进入报告"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        text = value
+    else:
+        try:
+            text = json.dumps(value, ensure_ascii=False, default=str)
+        except Exception:
+            text = repr(value)
+    if len(text) > limit:
+        text = f"{text[:limit]}...(共{len(text)}字符)"
+    return text
+
+def step_status(result):
+    """按TestRunner的约定判断步骤结果: None/False视为失败"""
+    return 'failed' if result is None or result is False else 'passed'
+
+# ==================== 写入器 ====================
+
+class JSONLinesWriter:
+    """JSON Lines写入器，每个事件一行"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def write(self, event):
+        self._file.write(json.dumps(event, ensure_ascii=False, default=str) + '\n')
+        if event['event'] in ('case_end', 'run_end'):
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+class JUnitXMLWriter:
+    """
+    JUnit XML写入器
+
+    每个用例结束时立即写入testcase节点，汇总计数使用定宽占位符，结束时原地回填。
+    进程中途退出时文件缺少结尾标签，但已完成的用例仍可读取。
+    """
+
+    COUNT_WIDTH = 10
+
+    def __init__(self, path, suite_name='NetAutoTest'):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._cases = {}
+        self._counts = {'tests': 0, 'failures': 0, 'errors': 0, 'skipped': 0}
+        self._total_time = 0.0
+        self._suite_name = suite_name
+        self._header_offset = None
+
+    def _placeholder(self, value):
+        return str(value).rjust(self.COUNT_WIDTH)
+
+    def _write_header(self, run_id):
+        self._file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        self._file.write(f'<testsuites name={quoteattr(self._suite_name)}>\n')
+        self._header_offset = self._file.tell()
+        self._file.write(self._suite_tag(run_id))
+        self._file.flush()
+
+    def _suite_tag(self, run_id):
+        counts = ' '.join(f'{k}="{self._placeholder(v)}"' for k, v in self._counts.items())
+        duration = self._placeholder(f"{self._total_time:.3f}")
+        return f'  <testsuite name={quoteattr(run_id)} {counts} time="{duration}">\n'
+
+    def write(self, event):
+        kind = event['event']
+        if kind == 'run_start':
+            self._run_id = event['run_id']
+            self._write_header(self._run_id)
+        elif kind == 'case_start':
+            self._cases[event['case_uid']] = {'start': event, 'steps': []}
+        elif kind == 'step':
+            case = self._cases.get(event['case_uid'])
+            if case is not None:
+                case['steps'].append(event)
+        elif kind == 'case_end':
+            case = self._cases.pop(event['case_uid'], None)
+            if case is not None:
+                self._write_case(case['start'], case['steps'], event)
+        elif kind == 'run_end':
+            self._finish()
+
+    def _write_case(self, start, steps, end):
+        status = end['status']
+        duration = end.get('duration') or 0.0
+        self._counts['tests'] += 1
+        if status == 'failed':
+            self._counts['failures'] += 1
+        elif status in ('error', 'timeout'):
+            self._counts['errors'] += 1
+        elif status == 'skipped':
+            self._counts['skipped'] += 1
+        self._total_time += duration
+
+        classname = start.get('file') or start.get('case_id') or ''
+        lines = [f'    <testcase classname={quoteattr(classname)} name={quoteattr(start.get("case_id") or "")} time="{duration:.3f}">']
+        message = end.get('error') or status
+        if status == 'failed':
+            lines.append(f'      <failure message={quoteattr(message)}/>')
+        elif status in ('error', 'timeout'):
+            lines.append(f'      <error type={quoteattr(status)} message={quoteattr(message)}/>')
+        elif status == 'skipped':
+            lines.append(f'      <skipped message={quoteattr(message)}/>')
+        if steps:
+            step_lines = [
+                f"[{s['index']}] {s['aw']} {s['status']} {s.get('duration') or 0:.3f}s {s.get('error') or ''}".rstrip()
+                for s in steps
+            ]
+            lines.append(f"      <system-out>{escape(chr(10).join(step_lines))}</system-out>")
+        lines.append('    </testcase>\n')
+        self._file.write('\n'.join(lines))
+        self._file.flush()
+
+    def _finish(self):
+        self._file.write('  </testsuite>\n</testsuites>\n')
+        if self._header_offset is not None:
+            self._file.seek(self._header_offset)
+            self._file.write(self._suite_tag(self._run_id))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+class SQLiteWriter:
+    """SQLite写入器，多次运行的结果累积在同一个库中，便于历史查询"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS runs (
+        run_id TEXT PRIMARY KEY, start_time REAL, end_time REAL,
+        total INTEGER, passed INTEGER, failed INTEGER, meta TEXT, metrics TEXT
+    );
+    CREATE TABLE IF NOT EXISTS cases (
+        case_uid TEXT PRIMARY KEY, run_id TEXT, case_id TEXT, name TEXT, file TEXT,
+        status TEXT, start_time REAL, duration REAL, error TEXT
+    );
+    CREATE TABLE IF NOT EXISTS steps (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, case_uid TEXT, run_id TEXT, step_index INTEGER,
+        aw TEXT, params TEXT, status TEXT, start_time REAL, duration REAL, result TEXT, error TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_runs_start ON runs(start_time);
+    CREATE INDEX IF NOT EXISTS idx_cases_run ON cases(run_id);
+    CREATE INDEX IF NOT EXISTS idx_cases_case_id ON cases(case_id, start_time);
+    CREATE INDEX IF NOT EXISTS idx_steps_run ON steps(run_id);
+    CREATE INDEX IF NOT EXISTS idx_steps_case ON steps(case_uid);
+    CREATE INDEX IF NOT EXISTS idx_steps_aw ON steps(aw, duration);
+    """
+
+    COMMIT_INTERVAL = 100
+
+    def __init__(self, path=RESULT_DB):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._pending = 0
+        self._run_id = None
+
+    def write(self, event):
+        kind = event['event']
+        if kind == 'run_start':
+            self._run_id = event['run_id']
+            self._conn.execute(
+                "INSERT OR REPLACE INTO runs (run_id, start_time, meta) VALUES (?, ?, ?)",
+                (self._run_id, event['time'], json.dumps(event.get('meta') or {}, ensure_ascii=False, default=str))
+            )
+            self._commit()
+        elif kind == 'case_start':
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cases (case_uid, run_id, case_id, name, file, status, start_time) "
+                "VALUES (?, ?, ?, ?, ?, 'running', ?)",
+                (event['case_uid'], self._run_id, event.get('case_id'), event.get('name'),
+                 event.get('file'), event['time'])
+            )
+            self._maybe_commit()
+        elif kind == 'step':
+            self._conn.execute(
+                "INSERT INTO steps (case_uid, run_id, step_index, aw, params, status, start_time, duration, result, error) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (event['case_uid'], self._run_id, event['index'], event['aw'], event.get('params'),
+                 event['status'], event.get('start'), event.get('duration'), event.get('result'), event.get('error'))
+            )
+            self._maybe_commit()
+        elif kind == 'case_end':
+            self._conn.execute(
+                "UPDATE cases SET status = ?, duration = ?, error = ? WHERE case_uid = ?",
+                (event['status'], event.get('duration'), event.get('error'), event['case_uid'])
+            )
+            self._commit()
+        elif kind == 'run_end':
+            summary = event.get('summary') or {}
+            self._conn.execute(
+                "UPDATE runs SET end_time = ?, total = ?, passed = ?, failed = ?, metrics = ? WHERE run_id = ?",
+                (event['time'], summary.get('total'), summary.get('passed'), summary.get('failed'),
+                 json.dumps(event.get('metrics') or {}, ensure_ascii=False, default=str), self._run_id)
+            )
+            self._commit()
+
+    def _maybe_commit(self):
+        self._pending += 1
+        if self._pending >= self.COMMIT_INTERVAL:
+            self._commit()
+
+    def _commit(self):
+        self._conn.commit()
+        self._pending = 0
+
+    def close(self):
+        self._commit()
+        self._conn.close()
+
+# ==================== 结果汇集 ====================
+
+class ResultSink:
+    """
+    结果汇集器
+
+    用例和步骤结果以事件形式逐条分发给各写入器，未启动时所有记录调用均为空操作。
+    当前用例按线程记录，并发执行的用例互不干扰。
+    """
+
+    def __init__(self):
+        self.run_id = None
+        self._writers = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._summary = {'total': 0, 'passed': 0, 'failed': 0}
+        self._listeners = []
+
+    @property
+    def active(self):
+        return self.run_id is not None
+
+    @property
+    def recording(self):
+        """当前线程是否在运行中的用例内，步骤会写入结果记录"""
+        return self.active and getattr(self._local, 'case_uid', None) is not None
+
+    def start_run(self, run_id=None, writers=None, meta=None):
+        """开始一次运行，默认写入 reports/<run_id>/ 和 reports/results.db"""
+        if self.active:
+            self.end_run()
+        self.run_id = run_id or new_run_id()
+        if writers is None:
+            run_dir = REPORT_DIR / self.run_id
+            writers = [
+                JUnitXMLWriter(run_dir / "junit.xml"),
+                JSONLinesWriter(run_dir / "results.jsonl"),
+                SQLiteWriter(RESULT_DB),
+            ]
+        self._writers = writers
+        self._summary = {'total': 0, 'passed': 0, 'failed': 0}
+        self.emit({'event': 'run_start', 'run_id': self.run_id, 'time': time.time(), 'meta': meta or {}})
+        logger.info(f"结果记录已启动: {self.run_id}")
+        return self.run_id
+
+    def end_run(self, metrics=None):
+        """结束运行并关闭写入器"""
+        if not self.active:
+            return
+        self.emit({'event': 'run_end', 'run_id': self.run_id, 'time': time.time(),
+                   'summary': dict(self._summary), 'metrics': metrics or {}})
+        with self._lock:
+            for writer in self._writers:
+                try:
+                    writer.close()
+                except Exception as e:
+                    logger.warning(f"结果写入器关闭失败: {e}")
+            self._writers = []
+        logger.info(f"结果记录完成: {self.run_id}, 共 {self._summary['total']} 个用例, 失败 {self._summary['failed']} 个")
+        self.run_id = None
+
+    def emit(self, event):
+        """分发事件给所有写入器，写入失败不影响用例执行"""
+        with self._lock:
+            if event['event'] == 'case_end':
+                self._summary['total'] += 1
+                # 跳过的用例只计入总数
+                if event['status'] == 'passed':
+                    self._summary['passed'] += 1
+                elif event['status'] != 'skipped':
+                    self._summary['failed'] += 1
+            for writer in self._writers:
+                try:
+                    writer.write(event)
+                except Exception as e:
+                    logger.warning(f"结果写入失败({type(writer).__name__}): {e}")
+
+    def begin_case(self, case_id, name='', file=None):
+        """开始记录用例，返回用例记录ID"""
+        if not self.active:
+            return None
+        case_uid = uuid.uuid4().hex
+        self._local.case_uid = case_uid
+        self._local.step_index = 0
+        self._local.start = time.time()
+        self.emit({'event': 'case_start', 'case_uid': case_uid, 'case_id': case_id,
+                   'name': name, 'file': file, 'time': self._local.start})
+        return case_uid
+
+    def add_listener(self, listener):
+        """注册步骤监听器，未启动结果记录时也会收到步骤事件，如资源采样按步骤时间窗口汇总"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def record_step(self, aw, params=None, status='passed', start=None, duration=None, result=None, error=None):
+        """记录当前线程所执行用例的一个步骤"""
+        case_uid = getattr(self._local, 'case_uid', None)
+        recording = self.active and case_uid is not None
+        if not recording and not self._listeners:
+            return
+        if recording:
+            self._local.step_index += 1
+        event = {
+            'event': 'step',
+            'case_uid': case_uid,
+            'index': getattr(self._local, 'step_index', 0),
+            'aw': aw,
+            'params': summarize_value(params, MAX_PARAMS_LENGTH),
+            'status': status,
+            'start': start,
+            'duration': round(duration, 6) if duration is not None else None,
+            'result': summarize_value(result),
+            'error': error,
+        }
+        for listener in list(self._listeners):
+            try:
+                listener(event)
+            except Exception as e:
+                logger.warning(f"步骤监听器执行失败: {e}")
+        if recording:
+            self.emit(event)
+
+    def end_case(self, status, error=None):
+        """结束当前线程的用例记录"""
+        case_uid = getattr(self._local, 'case_uid', None)
+        if not self.active or case_uid is None:
+            return
+        self._local.case_uid = None
+        self.emit({'event': 'case_end', 'case_uid': case_uid, 'status': status,
+                   'duration': round(time.time() - self._local.start, 6), 'error': error})
+
+# ==================== 历史查询 ====================
+
+class ResultQuery:
+    """基于SQLite结果库的历史查询"""
+
+    def __init__(self, path=RESULT_DB):
+        self.path = Path(path)
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.row_factory = sqlite3.Row
+
+    def _recent_runs(self):
+        return "SELECT run_id FROM runs ORDER BY start_time DESC LIMIT :runs"
+
+    def flaky_cases(self, runs=20, limit=20):
+        """最近N次运行中结果在通过和失败之间反复变化的用例，按变化次数排序"""
+        sql = f"""
+        SELECT case_id, COUNT(*) AS runs, SUM(status = 'passed') AS passed,
+               SUM(status != 'passed') AS failed, SUM(flip) AS flips
+        FROM (
+            SELECT case_id, status,
+                   COALESCE(status != LAG(status) OVER (PARTITION BY case_id ORDER BY start_time), 0) AS flip
+            FROM cases
+            WHERE run_id IN ({self._recent_runs()}) AND status != 'running'
+        )
+        GROUP BY case_id
+        HAVING passed > 0 AND failed > 0
+        ORDER BY flips DESC, failed DESC
+        LIMIT :limit
+        """
+        return [dict(row) for row in self._conn.execute(sql, {'runs': runs, 'limit': limit})]
+
+    def slowest_steps(self, runs=20, limit=20, group_by_aw=True):
+        """最近N次运行中最慢的步骤，默认按AW聚合"""
+        if group_by_aw:
+            sql = f"""
+            SELECT aw, COUNT(*) AS calls, AVG(duration) AS avg_duration,
+                   MAX(duration) AS max_duration, SUM(duration) AS total_duration
+            FROM steps
+            WHERE run_id IN ({self._recent_runs()}) AND duration IS NOT NULL
+            GROUP BY aw
+            ORDER BY avg_duration DESC
+            LIMIT :limit
+            """
+        else:
+            sql = f"""
+            SELECT s.run_id, c.case_id, s.step_index, s.aw, s.params, s.status, s.duration
+            FROM steps s JOIN cases c ON c.case_uid = s.case_uid
+            WHERE s.run_id IN ({self._recent_runs()}) AND s.duration IS NOT NULL
+            ORDER BY s.duration DESC
+            LIMIT :limit
+            """
+        return [dict(row) for row in self._conn.execute(sql, {'runs': runs, 'limit': limit})]
+
+    def close(self):
+        self._conn.close()
+
+# 全局结果汇集器实例
+result_sink = ResultSink()
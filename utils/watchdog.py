@@ -0,0 +1,189 @@
+"""
+执行时限 - 步骤、用例和整轮运行的超时控制
+
+设置了时限的AW在复用的工作线程中执行，超时后放弃该线程，关闭它使用的连接池连接
+（使阻塞在连接上的操作尽快返回），执行AW登记的清理（如停止步骤启动的后台压测、采样），
+调用方立即得到超时结果继续执行。时限为0表示不限制
+"""
+import time
+import queue
+import threading
+import contextvars
+from utils.logger import get_logger
+from utils.config_manager import config_manager
+from utils.connection_pool import connection_pool
+
+logger = get_logger()
+
+class StepTimeoutError(TimeoutError):
+    """步骤执行超时"""
+
+# 保留的空闲工作线程数上限，超出的线程执行完当前AW后退出
+MAX_IDLE_WORKERS = 16
+
+def _deadline(seconds):
+    return time.monotonic() + seconds if seconds else None
+
+class _WorkerPool:
+    """AW执行线程池: 复用空闲线程，避免每次调用创建线程；被放弃的线程执行完AW后同样回到空闲列表"""
+
+    def __init__(self, max_idle=MAX_IDLE_WORKERS):
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def submit(self, task):
+        with self._lock:
+            tasks = self._idle.pop() if self._idle else None
+        if tasks is None:
+            tasks = queue.SimpleQueue()
+            threading.Thread(target=self._loop, args=(tasks,), name="aw-worker", daemon=True).start()
+        tasks.put(task)
+
+    def _loop(self, tasks):
+        while True:
+            tasks.get()()
+            with self._lock:
+                if len(self._idle) >= self.max_idle:
+                    return
+                self._idle.append(tasks)
+
+class _StepCleanup:
+    """步骤登记的清理，步骤被放弃时执行；放弃之后才登记的清理立即执行"""
+
+    def __init__(self, name):
+        self.name = name
+        self.callbacks = []
+        self.abandoned = False
+        self._lock = threading.Lock()
+
+    def add(self, callback):
+        with self._lock:
+            if not self.abandoned:
+                self.callbacks.append(callback)
+                return
+        self._run(callback)
+
+    def abandon(self):
+        with self._lock:
+            self.abandoned = True
+            callbacks, self.callbacks = self.callbacks, []
+        for callback in reversed(callbacks):
+            self._run(callback)
+
+    def _run(self, callback):
+        try:
+            callback()
+        except Exception as e:
+            logger.warning(f"AW '{self.name}' 超时清理失败: {e}")
+
+class Watchdog:
+    """时限管理，用例时限按线程记录，运行时限全局生效"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._run_deadline = None
+        self._pool = _WorkerPool()
+
+    def _default(self, key):
+        # 直接读取配置，不作为用例的配置依赖记录
+        return (config_manager.load_config().get('timeouts') or {}).get(key)
+
+    def start_run(self, seconds=None):
+        """开始整轮运行的计时，未指定时使用配置 timeouts.run"""
+        self._run_deadline = _deadline(seconds if seconds is not None else self._default('run'))
+
+    def end_run(self):
+        self._run_deadline = None
+
+    def begin_case(self, seconds=None):
+        """开始用例计时，未指定时使用配置 timeouts.case"""
+        self._local.deadline = _deadline(seconds if seconds is not None else self._default('case'))
+        self._local.timed_out = False
+
+    def end_case(self):
+        """结束用例计时，返回用例中是否有步骤超时"""
+        timed_out = getattr(self._local, 'timed_out', False)
+        self._local.deadline = None
+        self._local.timed_out = False
+        return timed_out
+
+    def remaining(self):
+        """用例和运行时限中较早者的剩余时间(秒)，没有时限返回None"""
+        deadlines = [d for d in (getattr(self._local, 'deadline', None), self._run_deadline) if d is not None]
+        return min(deadlines) - time.monotonic() if deadlines else None
+
+    def expired(self):
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def step_limit(self, timeout=None):
+        """步骤的实际时限: 步骤时限(未指定时使用配置 timeouts.step，0表示不限制)与用例、运行剩余时间的较小值"""
+        if timeout is None:
+            timeout = self._default('step')
+        limits = [t for t in (timeout or None, self.remaining()) if t is not None]
+        return min(limits) if limits else None
+
+    def on_abandon(self, callback):
+        """登记当前步骤超时被放弃时执行的清理，如停止步骤启动的后台任务；不在限时执行的步骤中时忽略"""
+        cleanup = getattr(self._local, 'cleanup', None)
+        if cleanup is not None:
+            cleanup.add(callback)
+
+    def call(self, name, func, kwargs, timeout=None):
+        """在时限内执行AW，超时抛出StepTimeoutError"""
+        limit = self.step_limit(timeout)
+        if limit is None:
+            return func(**kwargs)
+        if limit <= 0:
+            self._local.timed_out = True
+            raise StepTimeoutError(f"AW '{name}' 未执行: 用例或运行时限已到")
+
+        outcome = {}
+        used = set()
+        cleanup = _StepCleanup(name)
+        # 以锁作为完成信号，比Event少一层Condition的开销
+        done = threading.Lock()
+        done.acquire()
+        # 用例时限按线程记录，传给工作线程，AW中嵌套调用的AW仍受用例时限约束
+        deadline = getattr(self._local, 'deadline', None)
+
+        def target():
+            thread = threading.current_thread()
+            thread.name = f"aw-{name}"
+            connection_pool.track(used)
+            self._local.cleanup = cleanup
+            self._local.deadline = deadline
+            self._local.timed_out = False
+            try:
+                outcome['result'] = func(**kwargs)
+            except BaseException as e:
+                outcome['error'] = e
+            finally:
+                outcome['timed_out'] = self._local.timed_out
+                self._local.cleanup = None
+                self._local.deadline = None
+                connection_pool.track(None)
+                thread.name = "aw-worker"
+                done.release()
+
+        context = contextvars.copy_context()
+        self._pool.submit(lambda: context.run(target))
+        if not done.acquire(timeout=limit):
+            # 线程无法强制结束，关闭其使用的连接并停止其启动的后台任务后放弃，连接池下次使用时重新建立
+            self._local.timed_out = True
+            for kind, key in list(used):
+                connection_pool.discard(kind, key)
+            logger.error(f"✗ AW执行超时: {name}, 时限 {limit:.1f} 秒, 已关闭连接: "
+                         f"{', '.join(key for _, key in sorted(used)) or '无'}")
+            cleanup.abandon()
+            raise StepTimeoutError(f"AW '{name}' 执行超过 {limit:.1f} 秒，已放弃")
+        # 嵌套调用的AW超时同样计入当前用例
+        if outcome['timed_out']:
+            self._local.timed_out = True
+        if 'error' in outcome:
+            raise outcome['error']
+        return outcome['result']
+
+# 全局时限管理实例
+watchdog = Watchdog()